@@ -0,0 +1,460 @@
+# 계약서 분석 작업 큐 (작업 ID 발급, 제한된 워커 풀, 키별 요청 제한, 교체 가능한 상태 저장소)
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+ANALYSIS_MAX_WORKERS = int(os.environ.get("ANALYSIS_MAX_WORKERS", "4"))
+ANALYSIS_MAX_PENDING_JOBS = int(os.environ.get("ANALYSIS_MAX_PENDING_JOBS", "32"))
+ANALYSIS_RATE_LIMIT = int(os.environ.get("ANALYSIS_RATE_LIMIT", "5"))
+ANALYSIS_RATE_LIMIT_WINDOW_SECONDS = float(os.environ.get("ANALYSIS_RATE_LIMIT_WINDOW_SECONDS", "60"))
+ANALYSIS_JOB_TTL_SECONDS = float(os.environ.get("ANALYSIS_JOB_TTL_SECONDS", str(60 * 60)))
+# 워커가 살아 있는 동안 대기/실행 중인 작업의 updated_at을 이 간격으로 갱신 (하트비트)
+ANALYSIS_JOB_HEARTBEAT_SECONDS = float(os.environ.get("ANALYSIS_JOB_HEARTBEAT_SECONDS", "15"))
+# 대기/실행 중인데 이 시간 동안 갱신이 없으면 워커가 죽은 것(재시작 등)으로 보고 실패 처리
+ANALYSIS_JOB_STALE_SECONDS = float(os.environ.get("ANALYSIS_JOB_STALE_SECONDS", "120"))
+# UI가 작업 하나를 기다리는 최대 시간
+ANALYSIS_WAIT_DEADLINE_SECONDS = float(os.environ.get("ANALYSIS_WAIT_DEADLINE_SECONDS", "300"))
+# 비워두면 프로세스 메모리에 저장, 경로를 지정하면 SQLite에 저장 (여러 인스턴스가 같은 디스크를 공유할 때)
+ANALYSIS_JOB_STORE_PATH = os.environ.get("ANALYSIS_JOB_STORE_PATH", "")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED_STATUSES = (DONE, FAILED)
+UNFINISHED_STATUSES = (QUEUED, RUNNING)
+
+STALE_JOB_ERROR = "분석이 중간에 멈췄어요 (서버 재시작 등). 다시 시도해주세요!"
+
+
+class JobRejected(Exception):
+    """대기열이 가득 찼거나 요청 제한에 걸려 작업을 받지 않은 경우."""
+
+
+# ============================================================
+# 작업 상태 저장소
+# ============================================================
+# 작업 레코드는 JSON으로 직렬화 가능한 dict입니다 (업로드한 파일 바이트는 저장하지 않음).
+#   job_id, key, status, phase, phases[(단계, 경과초)], extracted_text,
+#   clauses[AnalysisItem dict], result(ContractAnalysisResult dict), error,
+#   version(갱신할 때마다 +1), created_at, updated_at(갱신 또는 하트비트 시각)
+#
+# 저장소 공통 메서드: create, get, update, touch(하트비트, version은 그대로), fail_stale, purge
+
+class InMemoryJobStore:
+    """프로세스 메모리 저장소 (기본값, 단일 인스턴스용)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: dict[str, dict] = {}
+
+    def create(self, job: dict) -> None:
+        with self._lock:
+            self._jobs[job["job_id"]] = dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(fields)
+            job["version"] += 1
+            job["updated_at"] = time.time()
+            return dict(job)
+
+    def touch(self, job_ids: list[str]) -> None:
+        now = time.time()
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job["updated_at"] = now
+
+    def fail_stale(self, older_than: float) -> int:
+        """updated_at이 older_than보다 오래된 대기/실행 중 작업을 실패로 바꿉니다."""
+        with self._lock:
+            stale = [
+                job for job in self._jobs.values()
+                if job["status"] in UNFINISHED_STATUSES and job["updated_at"] < older_than
+            ]
+            for job in stale:
+                job.update(status=FAILED, error=STALE_JOB_ERROR, version=job["version"] + 1, updated_at=time.time())
+            return len(stale)
+
+    def purge(self, older_than: float, stale_before: Optional[float] = None) -> int:
+        """
+        updated_at이 older_than보다 오래된 완료 작업을 지웁니다.
+        stale_before가 주어지면 그보다 오래 갱신이 없는 대기/실행 중 작업을 먼저 실패로 바꿉니다.
+        """
+        if stale_before is not None:
+            self.fail_stale(stale_before)
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] in FINISHED_STATUSES and job["updated_at"] < older_than
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+            return len(expired)
+
+
+class SQLiteJobStore:
+    """
+    SQLite 저장소 (프로세스 재시작/여러 인스턴스에서도 작업 ID로 조회 가능).
+    열 때 stale_after초 넘게 갱신이 없는 대기/실행 중 작업(이전 프로세스가 남긴 것)을 실패로 바꿉니다.
+    updated_at 열이 기준이며, 하트비트(touch)는 이 열만 갱신합니다.
+    """
+
+    def __init__(self, path: str, stale_after: float = ANALYSIS_JOB_STALE_SECONDS):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        stale = self.fail_stale(time.time() - stale_after)
+        if stale:
+            logging.warning(f"Marked {stale} stale analysis jobs as failed")
+
+    def create(self, job: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, data, status, updated_at) VALUES (?, ?, ?, ?)",
+                (job["job_id"], json.dumps(job, ensure_ascii=False), job["status"], job["updated_at"]),
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data, updated_at FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = json.loads(row[0])
+        job["updated_at"] = row[1]
+        return job
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = json.loads(row[0])
+            job.update(fields)
+            job["version"] += 1
+            job["updated_at"] = time.time()
+            self._conn.execute(
+                "UPDATE jobs SET data = ?, status = ?, updated_at = ? WHERE job_id = ?",
+                (json.dumps(job, ensure_ascii=False), job["status"], job["updated_at"], job_id),
+            )
+            return job
+
+    def touch(self, job_ids: list[str]) -> None:
+        if not job_ids:
+            return
+        placeholders = ", ".join("?" for _ in job_ids)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET updated_at = ? WHERE job_id IN ({placeholders})", (time.time(), *job_ids))
+
+    def fail_stale(self, older_than: float) -> int:
+        placeholders = ", ".join("?" for _ in UNFINISHED_STATUSES)
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT job_id, data FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*UNFINISHED_STATUSES, older_than),
+            ).fetchall()
+            for job_id, data in rows:
+                job = json.loads(data)
+                job.update(status=FAILED, error=STALE_JOB_ERROR, version=job["version"] + 1, updated_at=now)
+                # 다른 인스턴스가 그 사이에 갱신했으면 건드리지 않음
+                self._conn.execute(
+                    f"UPDATE jobs SET data = ?, status = ?, updated_at = ? "
+                    f"WHERE job_id = ? AND status IN ({placeholders}) AND updated_at < ?",
+                    (json.dumps(job, ensure_ascii=False), FAILED, now, job_id, *UNFINISHED_STATUSES, older_than),
+                )
+        return len(rows)
+
+    def purge(self, older_than: float, stale_before: Optional[float] = None) -> int:
+        if stale_before is not None:
+            self.fail_stale(stale_before)
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*FINISHED_STATUSES, older_than),
+            )
+            return cursor.rowcount
+
+
+# ============================================================
+# 작업 관리자
+# ============================================================
+
+def _close_buffers(file_data_list: list[tuple[bytes, str]]) -> None:
+    """작업에 넘겨진 mmap 버퍼를 닫습니다 (bytes는 그대로)."""
+    for data, _ in file_data_list:
+        close = getattr(data, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                logging.warning(f"Failed to close job buffer: {e}")
+
+
+class _JobProgress:
+    """stream_contract_analysis의 progress 인자로 넘기는 어댑터 (단계를 작업 레코드에 기록)."""
+
+    def __init__(self, manager: "JobManager", job_id: str):
+        self._manager = manager
+        self._job_id = job_id
+        self._started_at = time.monotonic()
+        self.phases: list[tuple[str, float]] = []
+
+    def phase(self, name: str) -> None:
+        self.phases.append((name, round(time.monotonic() - self._started_at, 3)))
+        self._manager._update(self._job_id, phase=name, phases=list(self.phases))
+
+
+class JobManager:
+    """
+    analyze_contract_files를 감싸는 작업 관리자.
+
+    - submit(): 작업 ID를 즉시 반환하고, 최대 max_workers개의 워커 스레드가 순서대로 처리
+    - 대기/실행 중인 작업이 max_pending을 넘거나, 같은 key가 window초 안에 rate_limit번을
+      넘게 요청하면 JobRejected
+    - 같은 파일 묶음이 이미 대기/실행 중이면 새 작업을 만들지 않고 기존 작업 ID를 반환
+    - wait(): 작업이 갱신될 때까지(최대 timeout초) 기다렸다가 최신 레코드를 반환
+    - 이 관리자가 맡은 대기/실행 중 작업은 heartbeat초마다 updated_at을 갱신하고,
+      stale_after초 넘게 갱신이 없는 작업(죽은 워커/이전 프로세스)은 조회/정리할 때 실패로 바꿈
+    """
+
+    def __init__(
+        self,
+        store=None,
+        max_workers: int = ANALYSIS_MAX_WORKERS,
+        max_pending: int = ANALYSIS_MAX_PENDING_JOBS,
+        rate_limit: int = ANALYSIS_RATE_LIMIT,
+        rate_limit_window: float = ANALYSIS_RATE_LIMIT_WINDOW_SECONDS,
+        job_ttl: float = ANALYSIS_JOB_TTL_SECONDS,
+        heartbeat: float = ANALYSIS_JOB_HEARTBEAT_SECONDS,
+        stale_after: float = ANALYSIS_JOB_STALE_SECONDS,
+    ):
+        self.store = store if store is not None else InMemoryJobStore()
+        self.max_pending = max_pending
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.job_ttl = job_ttl
+        self.heartbeat = heartbeat
+        self.stale_after = stale_after
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._lock = threading.Lock()
+        self._updated = threading.Condition(self._lock)
+        self._pending = 0
+        self._inflight: dict[str, str] = {}
+        self._requests: dict[str, deque] = defaultdict(deque)
+
+        self._stopped = threading.Event()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="analysis-job-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stopped.wait(self.heartbeat):
+            with self._lock:
+                job_ids = list(self._inflight.values())
+            try:
+                self.store.touch(job_ids)
+            except Exception as e:
+                logging.warning(f"Job heartbeat failed: {e}")
+
+    def _expire_if_stale(self, job: Optional[dict]) -> Optional[dict]:
+        """하트비트가 끊긴 대기/실행 중 작업이면 실패로 바꾼 레코드를 반환합니다."""
+        if job is None or job["status"] not in UNFINISHED_STATUSES:
+            return job
+        if job["updated_at"] >= time.time() - self.stale_after:
+            return job
+        return self.store.update(job["job_id"], status=FAILED, error=STALE_JOB_ERROR) or job
+
+    def _check_rate_limit(self, key: str, now: float) -> None:
+        requests = self._requests[key]
+        while requests and now - requests[0] > self.rate_limit_window:
+            requests.popleft()
+        if len(requests) >= self.rate_limit:
+            retry_after = int(self.rate_limit_window - (now - requests[0])) + 1
+            raise JobRejected(f"분석 요청이 너무 잦아요. {retry_after}초 후에 다시 시도해주세요.")
+        requests.append(now)
+
+    def submit(self, file_data_list: list[tuple[bytes, str]], key: str = "anonymous") -> str:
+        """
+        분석 작업을 대기열에 넣고 작업 ID를 반환합니다.
+
+        Args:
+            file_data_list: analyze_contract_files와 같은 (file_bytes, mime_type) 리스트.
+                file_bytes는 mmap 등 bytes처럼 읽히는 버퍼여도 되며, 작업이 실행될 때 읽고 끝나면 닫습니다.
+            key: 요청 제한 단위 (세션/사용자 ID 등)
+
+        Raises:
+            JobRejected: 대기열 초과 또는 요청 제한
+        """
+        from gemini_analyzer import build_analysis_cache_key
+
+        files_key = build_analysis_cache_key(file_data_list)
+        now = time.time()
+
+        with self._lock:
+            existing = self._inflight.get(files_key)
+            if existing is not None:
+                _close_buffers(file_data_list)
+                return existing
+
+            try:
+                if self._pending >= self.max_pending:
+                    raise JobRejected("지금은 분석 요청이 많아요. 잠시 후 다시 시도해주세요.")
+                self._check_rate_limit(key, time.monotonic())
+            except JobRejected:
+                _close_buffers(file_data_list)
+                raise
+
+            job_id = uuid.uuid4().hex
+            self.store.create({
+                "job_id": job_id,
+                "key": key,
+                "status": QUEUED,
+                "phase": None,
+                "phases": [],
+                "extracted_text": None,
+                "clauses": [],
+                "result": None,
+                "error": None,
+                "version": 0,
+                "created_at": now,
+                "updated_at": now,
+            })
+            self._pending += 1
+            self._inflight[files_key] = job_id
+
+        try:
+            self.store.purge(now - self.job_ttl, stale_before=now - self.stale_after)
+        except Exception as e:
+            logging.warning(f"Job store purge failed: {e}")
+
+        self._executor.submit(self._run, job_id, files_key, file_data_list)
+        return job_id
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._updated:
+            self.store.update(job_id, **fields)
+            self._updated.notify_all()
+
+    def _run(self, job_id: str, files_key: str, file_data_list: list[tuple[bytes, str]]) -> None:
+        from gemini_analyzer import stream_contract_analysis
+
+        progress = _JobProgress(self, job_id)
+        clauses = []
+        # 버퍼(blob_store의 mmap)를 복사하지 않고 memoryview로 넘김 (모델에 올리는 페이지만 그때 bytes로 읽음)
+        views = [memoryview(data) for data, _ in file_data_list]
+        try:
+            self._update(job_id, status=RUNNING)
+            finished = False
+            analysis_input = [(view, mime_type) for view, (_, mime_type) in zip(views, file_data_list)]
+            for kind, payload in stream_contract_analysis(analysis_input, progress=progress):
+                if kind == "extracted_text":
+                    self._update(job_id, extracted_text=payload)
+                elif kind == "risk_clause":
+                    clauses.append(payload.model_dump())
+                    self._update(job_id, clauses=list(clauses))
+                elif kind == "result":
+                    progress.phase("done")
+                    self._update(job_id, status=DONE, result=payload.model_dump())
+                    finished = True
+            if not finished:
+                self._update(job_id, status=FAILED, error="분석 결과를 받지 못했어요. 다시 시도해주세요!")
+        except Exception as e:
+            logging.error(f"Analysis job {job_id} failed: {e}")
+            self._update(job_id, status=FAILED, error=str(e))
+        finally:
+            for view in views:
+                view.release()
+            _close_buffers(file_data_list)
+            with self._lock:
+                self._pending -= 1
+                self._inflight.pop(files_key, None)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self._expire_if_stale(self.store.get(job_id))
+
+    def wait(self, job_id: str, since_version: int = -1, timeout: float = 0.5) -> Optional[dict]:
+        """
+        작업 레코드의 version이 since_version보다 커지거나 작업이 끝날 때까지 최대 timeout초 기다립니다.
+        같은 프로세스의 갱신은 즉시 깨어나고, 다른 인스턴스가 쓰는 저장소는 timeout 간격으로 다시 읽습니다.
+        """
+        deadline = time.monotonic() + timeout
+        with self._updated:
+            job = self.store.get(job_id)
+            while job is not None and job["version"] <= since_version and job["status"] not in FINISHED_STATUSES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._updated.wait(remaining)
+                job = self.store.get(job_id)
+            return self._expire_if_stale(job)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "inflight": len(self._inflight),
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._stopped.set()
+        self._executor.shutdown(wait=wait)
+
+
+_job_manager: Optional[JobManager] = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """프로세스당 하나의 JobManager (ANALYSIS_JOB_STORE_PATH가 있으면 SQLite 저장소 사용)."""
+    global _job_manager
+
+    with _job_manager_lock:
+        if _job_manager is None:
+            store = None
+            if ANALYSIS_JOB_STORE_PATH:
+                try:
+                    store = SQLiteJobStore(ANALYSIS_JOB_STORE_PATH)
+                except Exception as e:
+                    logging.warning(f"Job store unavailable, falling back to memory: {e}")
+            _job_manager = JobManager(store=store)
+        return _job_manager
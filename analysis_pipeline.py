@@ -0,0 +1,360 @@
+# 계약서 분석 파이프라인 (ingest → preprocess → extract → rule_check → llm → anonymize → post_process → store)
+
+from __future__ import annotations
+
+import json
+import time
+import logging
+import threading
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional
+
+import gemini_analyzer as analyzer
+
+# 스트리밍 이벤트 (stream_contract_analysis와 같은 형식: ("extracted_text", str), ("risk_clause", AnalysisItem), ...)
+Event = tuple[str, Any]
+
+
+class AnalysisContext:
+    """
+    분석 요청 하나가 단계들을 지나며 채우는 상태.
+
+    단계는 필요한 필드만 읽고 채우며, finished=True로 바꾸면 남은 단계를 건너뜁니다
+    (캐시 적중, 데모 모드, 본문/응답이 비어 있는 경우).
+    """
+
+    def __init__(self, file_data_list: list[tuple[bytes, str]], use_cache: bool = True, progress=None, stream: bool = False):
+        self.file_data_list = file_data_list
+        self.use_cache = use_cache
+        self.progress = progress
+        # True이면 모델 응답을 스트리밍으로 받아 완성되는 조항부터 이벤트로 내보냄
+        self.stream = stream
+
+        self.cache_key: Optional[str] = None
+        self.client = None
+        self.single_image = False
+        # 페이지별로 추출한 원문 (이 경우 모델은 extracted_text를 다시 쓰지 않음)
+        self.contract_text: Optional[str] = None
+        # 비식별화된 본문과 위치 정렬 색인 (스트리밍 중 조항 위치 계산용)
+        self.extracted_text: Optional[str] = None
+        self.alignment_index = None
+        # 모델 호출 전에 규칙 엔진이 찾은 조항 (본문이 있는 입력만, 원문 기준)
+        self.rule_hits: Optional[list[analyzer.AnalysisItem]] = None
+        self.config = None
+        self.result: Optional[analyzer.ContractAnalysisResult] = None
+        # 모델 호출이 실패해 규칙 엔진 결과로 대신한 경우 (결과 캐시에 저장하지 않음)
+        self.degraded = False
+        self.finished = False
+        self.timings: list[tuple[str, float]] = []
+
+    def phase(self, name: str) -> None:
+        if self.progress is not None:
+            self.progress.phase(name)
+
+
+class Stage(NamedTuple):
+    """
+    name: 단계 이름 (타이밍/교체용)
+    run: context를 받아 상태를 채우는 함수. 스트리밍 이벤트를 내보내려면 제너레이터로 작성
+    """
+    name: str
+    run: Callable[[AnalysisContext], Optional[Iterable[Event]]]
+
+
+# 단계가 끝날 때마다 (단계 이름, 걸린 초, context)로 호출
+StageHook = Callable[[str, float, AnalysisContext], None]
+
+
+class AnalysisPipeline:
+    """
+    단계 목록을 순서대로 실행하는 분석 엔진. 업로드 종류(이미지 한 장, 여러 장, PDF)와 관계없이
+    같은 단계를 지나므로 캐시/병렬 페이지 추출/스트리밍이 모든 입력에 똑같이 적용됩니다.
+
+    - stream(context): 단계가 내보내는 이벤트를 그대로 전달하고 마지막에 ("result", 결과)
+    - run(context): 이벤트를 버리고 최종 결과만 반환
+    - replace()/insert_after()/without(): 단계를 바꾼 새 파이프라인 (원본은 그대로)
+    - hooks: 단계별 소요 시간 콜백 (이벤트를 소비하는 쪽에서 쓴 시간은 제외)
+    """
+
+    def __init__(self, stages: list[Stage], hooks: Iterable[StageHook] = ()):
+        self.stages = list(stages)
+        self.hooks = list(hooks)
+
+        self._lock = threading.Lock()
+        self._stage_calls: dict[str, int] = {}
+        self._stage_seconds: dict[str, float] = {}
+
+    def _index(self, name: str) -> int:
+        for index, stage in enumerate(self.stages):
+            if stage.name == name:
+                return index
+        raise KeyError(f"Unknown analysis stage: {name}")
+
+    def _with_stages(self, stages: list[Stage]) -> "AnalysisPipeline":
+        return AnalysisPipeline(stages, self.hooks)
+
+    def replace(self, name: str, run: Callable[[AnalysisContext], Optional[Iterable[Event]]]) -> "AnalysisPipeline":
+        stages = list(self.stages)
+        stages[self._index(name)] = Stage(name, run)
+        return self._with_stages(stages)
+
+    def insert_after(self, name: str, stage: Stage) -> "AnalysisPipeline":
+        stages = list(self.stages)
+        stages.insert(self._index(name) + 1, stage)
+        return self._with_stages(stages)
+
+    def without(self, name: str) -> "AnalysisPipeline":
+        self._index(name)
+        return self._with_stages([stage for stage in self.stages if stage.name != name])
+
+    def _record(self, name: str, seconds: float, context: AnalysisContext) -> None:
+        context.timings.append((name, seconds))
+        with self._lock:
+            self._stage_calls[name] = self._stage_calls.get(name, 0) + 1
+            self._stage_seconds[name] = self._stage_seconds.get(name, 0.0) + seconds
+        for hook in self.hooks:
+            try:
+                hook(name, seconds, context)
+            except Exception as e:
+                logging.warning(f"Analysis stage hook failed: {e}")
+
+    def stream(self, context: AnalysisContext) -> Iterator[Event]:
+        try:
+            for stage in self.stages:
+                if context.finished:
+                    break
+                elapsed = 0.0
+                started = time.perf_counter()
+                try:
+                    output = stage.run(context)
+                    for event in output or ():
+                        elapsed += time.perf_counter() - started
+                        yield event
+                        started = time.perf_counter()
+                finally:
+                    self._record(stage.name, elapsed + time.perf_counter() - started, context)
+        except Exception as e:
+            logging.error(f"Contract analysis failed: {e}")
+            raise Exception(f"계약서 분석 중 오류가 발생했습니다: {e}") from e
+
+        if context.result is not None:
+            yield ("result", context.result)
+
+    def run(self, context: AnalysisContext) -> Optional[analyzer.ContractAnalysisResult]:
+        for _ in self.stream(context):
+            pass
+        return context.result
+
+    def stats(self) -> dict:
+        """단계별 호출 수와 평균 소요 시간(초)."""
+        with self._lock:
+            return {
+                name: {"calls": calls, "avg_seconds": round(self._stage_seconds[name] / calls, 4)}
+                for name, calls in self._stage_calls.items()
+            }
+
+
+# ============================================================
+# 기본 단계
+# ============================================================
+
+def _finish_with(context: AnalysisContext, result: analyzer.ContractAnalysisResult) -> Iterator[Event]:
+    """이미 완성된 결과(데모/캐시)로 끝냅니다. 스트리밍 이벤트 순서는 새로 분석할 때와 같습니다."""
+    context.result = result
+    context.finished = True
+    yield ("extracted_text", result.extracted_text)
+    for clause in result.risk_clauses:
+        yield ("risk_clause", clause)
+
+
+def ingest_stage(context: AnalysisContext) -> Iterator[Event]:
+    """데모 모드/결과 캐시 확인 후 클라이언트를 준비합니다 (캐시 키는 전처리 전 원본 바이트 기준)."""
+    if analyzer.DEMO_MODE:
+        yield from _finish_with(context, analyzer.get_demo_result())
+        return
+
+    context.cache_key = analyzer.build_analysis_cache_key(context.file_data_list) if context.use_cache else None
+    if context.cache_key:
+        cached = analyzer.get_cached_analysis(context.cache_key)
+        if cached is not None:
+            logging.info(f"Analysis cache hit: {context.cache_key[:12]}")
+            yield from _finish_with(context, cached)
+            return
+
+    context.phase("upload")
+    context.client = analyzer.get_genai_client()
+    context.single_image = analyzer._is_single_image(context.file_data_list)
+
+
+def preprocess_stage(context: AnalysisContext) -> None:
+    """이미지 한 장은 업로드 전 EXIF 회전/흑백/자르기/기울기 보정/축소 (페이지 추출은 page_ocr가 페이지별로 처리)."""
+    if context.single_image:
+        from image_preprocess import prepare_image_for_upload
+
+        image_bytes, mime_type = context.file_data_list[0]
+        context.file_data_list = [prepare_image_for_upload(image_bytes, mime_type)]
+
+
+def extract_stage(context: AnalysisContext) -> Iterator[Event]:
+    """PDF/여러 장은 페이지별 텍스트를 병렬로 추출해 본문을 먼저 내보냅니다 (이미지 한 장은 모델이 직접 읽음)."""
+    from text_alignment import AlignmentIndex
+
+    if context.single_image:
+        return
+
+    context.phase("ocr")
+    context.contract_text = analyzer.extract_contract_text(context.file_data_list)
+    if not context.contract_text:
+        context.finished = True
+        return
+    context.extracted_text = analyzer.anonymize_personal_info(context.contract_text)
+    context.alignment_index = AlignmentIndex(context.extracted_text)
+    yield ("extracted_text", context.extracted_text)
+
+
+def _streamed_response(context: AnalysisContext, contents: list) -> Iterator[Event]:
+    """모델 응답을 스트리밍으로 읽으며 본문/조항이 완성되는 대로 내보내고, 전체 JSON 텍스트를 반환합니다."""
+    from incremental_json import IncrementalJSONParser
+    from text_alignment import AlignmentIndex
+
+    parser = IncrementalJSONParser()
+    stream = analyzer.generate_content_stream_resilient(context.client, analyzer.ANALYSIS_MODEL, contents, context.config)
+    for chunk_index, chunk in enumerate(stream):
+        if chunk_index == 0 and context.contract_text is None:
+            # 첫 응답 조각 도착: 모델이 본문(OCR)을 쓰기 시작
+            context.phase("ocr")
+        for kind, key, value in parser.feed(chunk.text or ""):
+            if kind == "field" and key == "extracted_text" and isinstance(value, str):
+                context.phase("llm")
+                context.extracted_text = analyzer.anonymize_personal_info(value)
+                context.alignment_index = AlignmentIndex(context.extracted_text)
+                yield ("extracted_text", context.extracted_text)
+            elif kind == "field" and key == "confirmed_rule_candidates" and context.rule_hits:
+                from risk_rules import confirmed_rule_hits
+
+                for hit in confirmed_rule_hits(context.rule_hits, value):
+                    yield ("risk_clause", analyzer._prepare_streamed_clause(hit.model_dump(), context.extracted_text, context.alignment_index))
+            elif kind == "item" and key == "risk_clauses" and isinstance(value, dict):
+                try:
+                    yield ("risk_clause", analyzer._prepare_streamed_clause(value, context.extracted_text, context.alignment_index))
+                except ValueError as e:
+                    logging.warning(f"Skipping malformed streamed clause: {e}")
+    return parser.text
+
+
+def rule_check_stage(context: AnalysisContext) -> None:
+    """
+    모델 호출 전에 추출한 본문을 로컬 규칙 엔진으로 검사합니다.
+    찾은 조항은 위반 후보로 텍스트 요청에 넣어 모델이 확인하게 하고(확인된 것만 결과에 포함), 모델 호출이 실패하면 대체 결과로 씁니다.
+    이미지 한 장은 본문이 모델 응답에 들어 있으므로 llm 단계에서 응답 본문으로 검사합니다.
+    """
+    from risk_rules import check_mandatory_rules
+
+    if context.contract_text is None:
+        return
+    context.phase("rule_match")
+    try:
+        context.rule_hits = check_mandatory_rules(context.contract_text)
+    except Exception as e:
+        logging.warning(f"Rule engine failed: {e}")
+        context.rule_hits = []
+
+
+def _request_analysis(context: AnalysisContext) -> Iterator[Event]:
+    """모델에 분석을 요청하고 응답 JSON 텍스트를 반환합니다 (스트리밍이면 조항 이벤트를 내보내며)."""
+    if context.single_image:
+        image_bytes, mime_type = context.file_data_list[0]
+        contents, context.config = analyzer._build_image_request(image_bytes, mime_type, context.client)
+    else:
+        contents, context.config = analyzer._build_text_request(context.contract_text, context.client, context.rule_hits)
+
+    try:
+        if not (context.stream and context.single_image):
+            # 스트리밍 이미지 요청은 응답에서 본문이 끝나는 시점에 llm 단계로 넘어감
+            context.phase("llm")
+        if context.stream:
+            return (yield from _streamed_response(context, contents))
+        response = analyzer.generate_content_resilient(context.client, analyzer.ANALYSIS_MODEL, contents, context.config)
+        return response.text
+    except Exception as e:
+        analyzer.invalidate_prompt_cache_on_error(context.config, e)
+        raise
+
+
+def llm_stage(context: AnalysisContext) -> Iterator[Event]:
+    """
+    위험 조항 분석 요청 (이미지 한 장은 멀티모달 요청, 그 외는 추출한 본문으로 텍스트 요청).
+    규칙 엔진 후보 중 모델이 확인한 것만 모델 결과에 합칩니다 (비식별화 전에 합쳐 함께 마스킹되도록).
+
+    본문이 있는 입력에서 모델 호출이 실패하거나 제한 시간을 넘기면 작업을 실패시키지 않고
+    규칙 엔진만으로 만든 결과(risk_rules.build_rule_based_result)를 반환합니다.
+    """
+    from risk_rules import build_rule_based_result, confirmed_rule_hits, merge_rule_hits
+
+    try:
+        raw_json = yield from _request_analysis(context)
+    except Exception as e:
+        if context.contract_text is None:
+            raise
+        logging.warning(f"LLM analysis failed, falling back to rule-based result: {e}")
+        context.result = build_rule_based_result(context.contract_text, context.rule_hits)
+        context.degraded = True
+        return
+
+    logging.info(f"Gemini response: {raw_json}")
+    if not raw_json:
+        context.finished = True
+        return
+
+    data = json.loads(raw_json)
+    confirmed = data.pop("confirmed_rule_candidates", None)
+    if context.contract_text is not None:
+        data["extracted_text"] = context.contract_text
+    context.result = analyzer.ContractAnalysisResult(**data)
+    if context.rule_hits is None:
+        analyzer.apply_mandatory_rules(context.result)
+    else:
+        merge_rule_hits(context.result, confirmed_rule_hits(context.rule_hits, confirmed))
+
+
+def anonymize_stage(context: AnalysisContext) -> None:
+    """개인정보 비식별화 (위치 정렬/근거 검색이 비식별화된 텍스트를 쓰도록 후처리보다 먼저)."""
+    analyzer.anonymize_analysis_result(context.result)
+
+
+def post_process_stage(context: AnalysisContext) -> None:
+    """하이라이트 위치 계산과 조항별 근거 법령."""
+    from legal_citations import attach_citations
+
+    context.phase("post_process")
+    analyzer.align_risk_clauses(context.result)
+    attach_citations(context.result)
+
+
+def store_stage(context: AnalysisContext) -> None:
+    # 규칙 엔진 대체 결과는 저장하지 않음 (다음 요청에서 다시 모델로 분석)
+    if context.cache_key and not context.degraded:
+        analyzer.store_cached_analysis(context.cache_key, context.result)
+
+
+DEFAULT_STAGES = [
+    Stage("ingest", ingest_stage),
+    Stage("preprocess", preprocess_stage),
+    Stage("extract", extract_stage),
+    Stage("rule_check", rule_check_stage),
+    Stage("llm", llm_stage),
+    Stage("anonymize", anonymize_stage),
+    Stage("post_process", post_process_stage),
+    Stage("store", store_stage),
+]
+
+
+def log_stage_timing(name: str, seconds: float, context: AnalysisContext) -> None:
+    logging.info(f"Analysis stage {name}: {seconds:.3f}s")
+
+
+_default_pipeline = AnalysisPipeline(DEFAULT_STAGES, hooks=[log_stage_timing])
+
+
+def get_analysis_pipeline() -> AnalysisPipeline:
+    """analyze_contract_files/stream_contract_analysis가 쓰는 기본 파이프라인."""
+    return _default_pipeline
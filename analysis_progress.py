@@ -0,0 +1,16 @@
+# 분석 진행 단계 정의 (작업 레코드의 phase → 화면 메시지/진행률)
+
+from __future__ import annotations
+
+# (단계 이름, 화면 메시지, 진행률) - 분석 파이프라인이 실제로 지나가는 순서
+PHASES = [
+    ("upload", "📄 계약서 파일을 보내고 있어요...", 0.05),
+    ("ocr", "🔍 계약서 글자를 읽고 있어요...", 0.2),
+    ("rule_match", "🚨 명백한 강행규정 위반부터 확인하고 있어요...", 0.35),
+    ("llm", "⚖️ 근로기준법과 비교 분석 중이에요...", 0.5),
+    ("post_process", "✨ 하이라이트 위치를 정리하고 있어요...", 0.95),
+    ("done", "✅ 분석 완료!", 1.0),
+]
+
+PHASE_MESSAGES = {name: message for name, message, _ in PHASES}
+PHASE_PROGRESS = {name: progress for name, _, progress in PHASES}
@@ -1,7 +1,6 @@
 import streamlit as st
-from PIL import Image
-import io
 import os
+import time
 
 st.set_page_config(
     page_title="계약서 위험 탐지기",
@@ -276,6 +275,14 @@ st.markdown("""
         filter: brightness(0.95);
     }
     
+    /* 안쪽 조항에 완전히 가려진 조항을 여는 작은 표시 */
+    .risk-nested-badge {
+        cursor: pointer;
+        font-size: 0.75em;
+        vertical-align: super;
+        margin-left: 1px;
+    }
+    
     /* Tooltip - Clean minimal style */
     .risk-tooltip {
         position: absolute;
@@ -869,6 +876,20 @@ st.markdown("""
 
 from gemini_analyzer import DEMO_MODE, get_demo_result
 
+
+@st.cache_resource(show_spinner=False)
+def warm_up_backend():
+    """프로세스당 한 번, 벡터 DB를 백그라운드에서 미리 열어둡니다."""
+    import threading
+    from gemini_analyzer import warm_up_vector_store
+
+    threading.Thread(target=warm_up_vector_store, daemon=True).start()
+    return True
+
+
+if not DEMO_MODE:
+    warm_up_backend()
+
 if 'analysis_complete' not in st.session_state:
     st.session_state.analysis_complete = False
 if 'uploaded_images' not in st.session_state:
@@ -887,6 +908,18 @@ if 'show_add_uploader' not in st.session_state:
     st.session_state.show_add_uploader = False
 if 'add_uploader_key' not in st.session_state:
     st.session_state.add_uploader_key = 0
+if 'client_id' not in st.session_state:
+    import uuid
+    st.session_state.client_id = uuid.uuid4().hex
+if 'file_blobs' not in st.session_state:
+    # 업로드 파일 바이트는 세션 상태가 아니라 임시 파일(mmap)에 보관, 세션이 사라지면 함께 삭제
+    from blob_store import SessionBlobs, get_blob_store
+    st.session_state.file_blobs = SessionBlobs(get_blob_store(), st.session_state.client_id)
+if 'analysis_job_id' not in st.session_state:
+    # 새로고침/재접속 시 URL의 작업 ID로 진행 중인 분석을 이어서 표시
+    st.session_state.analysis_job_id = st.query_params.get("job")
+    if st.session_state.analysis_job_id:
+        st.session_state.is_analyzing = True
 
 import hashlib
 
@@ -894,22 +927,45 @@ def get_file_hash(file_bytes: bytes) -> str:
     return hashlib.sha256(file_bytes).hexdigest()[:16]
 
 def add_files_to_manifest(files):
-    added_count = 0
+    from concurrent.futures import ThreadPoolExecutor
+    from blob_store import BlobQuotaExceeded
+    from image_preprocess import make_thumbnail_data_uri
+    
+    blobs = st.session_state.file_blobs
+    new_entries = {}
     for f in files:
         f.seek(0)
         file_bytes = f.read()
         file_hash = get_file_hash(file_bytes)
-        if file_hash not in st.session_state.file_manifest:
-            st.session_state.file_manifest[file_hash] = {
-                "name": f.name,
-                "mime": get_mime_type(f.name),
-                "bytes": file_bytes
-            }
-            added_count += 1
-    return added_count
+        if file_hash in st.session_state.file_manifest or file_hash in new_entries:
+            continue
+        try:
+            blob_id = blobs.put(file_bytes)
+        except BlobQuotaExceeded as e:
+            st.toast(str(e), icon="⚠️")
+            break
+        # 매니페스트에는 메타데이터만 두고, 썸네일은 추가할 때 한 번만 만들어 이후 rerun에서 재사용
+        new_entries[file_hash] = ({
+            "name": f.name,
+            "mime": get_mime_type(f.name),
+            "blob_id": blob_id,
+            "size": len(file_bytes),
+        }, file_bytes)
+    
+    if new_entries:
+        entries = list(new_entries.values())
+        with ThreadPoolExecutor(max_workers=min(4, len(entries))) as executor:
+            thumbnails = executor.map(lambda item: make_thumbnail_data_uri(item[1], item[0]["mime"]), entries)
+            for (entry, _), thumbnail in zip(entries, thumbnails):
+                entry["thumbnail"] = thumbnail
+        for file_hash, (entry, _) in new_entries.items():
+            st.session_state.file_manifest[file_hash] = entry
+    
+    return len(new_entries)
 
 def reset_manifest():
     st.session_state.file_manifest = {}
+    st.session_state.file_blobs.clear()
     st.session_state.show_add_uploader = False
 
 def get_mime_type(filename: str) -> str:
@@ -932,7 +988,7 @@ if DEMO_MODE:
 
 if not st.session_state.analysis_complete:
     is_analyzing = st.session_state.is_analyzing
-    has_files = len(st.session_state.file_manifest) > 0
+    has_files = len(st.session_state.file_manifest) > 0 or is_analyzing
     
     if not has_files:
         st.markdown("""
@@ -984,73 +1040,104 @@ if not st.session_state.analysis_complete:
             </style>
             """, unsafe_allow_html=True)
             
-            progress_messages = [
-                ("📄 계약서 이미지를 읽고 있어요...", 0.08),
-                ("🔍 사진을 인식하고 있어요...", 0.18),
-                ("🔒 업로드한 파일은 절대 저장되지 않아요", 0.28),
-                ("🗑️ 분석이 완료되면 즉시 폐기처리돼요", 0.38),
-                ("⚖️ 근로기준법과 비교 분석 중이에요...", 0.52),
-                ("🚨 위험 조항을 찾고 있어요...", 0.68),
-                ("💬 어떻게 바꾸어야하는지 정리하고 있어요...", 0.82),
-                ("✨ 거의 다 됐어요!", 0.95),
-            ]
-            
             status_container = st.empty()
             progress_bar = st.progress(0)
+            preview_container = st.empty()
             
-            import time
-            import threading
-            
-            analysis_done = threading.Event()
-            analysis_result = {"result": None, "error": None}
+            from analysis_jobs import get_job_manager, JobRejected, DONE, FINISHED_STATUSES, ANALYSIS_WAIT_DEADLINE_SECONDS
+            from analysis_progress import PHASE_MESSAGES, PHASE_PROGRESS
+            from gemini_analyzer import AnalysisItem, ContractAnalysisResult
             
-            manifest_copy = dict(st.session_state.file_manifest)
+            job_manager = get_job_manager()
+            job_id = st.session_state.analysis_job_id
+            submit_error = None
             
-            def run_analysis():
+            if not job_id:
                 try:
-                    from gemini_analyzer import analyze_contract_files
-                    
-                    file_data_list = []
-                    for file_hash, file_info in manifest_copy.items():
-                        file_data_list.append((file_info["bytes"], file_info["mime"]))
-                    
-                    result = analyze_contract_files(file_data_list)
-                    analysis_result["result"] = result
-                except Exception as e:
-                    analysis_result["error"] = str(e)
-                finally:
-                    analysis_done.set()
+                    # 바이트를 복사하지 않고 mmap 버퍼를 그대로 작업에 넘김
+                    file_data_list = [
+                        (st.session_state.file_blobs.open(file_info["blob_id"]), file_info["mime"])
+                        for file_info in st.session_state.file_manifest.values()
+                    ]
+                    job_id = job_manager.submit(file_data_list, key=st.session_state.client_id)
+                    st.session_state.analysis_job_id = job_id
+                    st.query_params["job"] = job_id
+                except FileNotFoundError:
+                    st.session_state.file_manifest = {}
+                    submit_error = "업로드한 파일이 만료되었어요. 계약서를 다시 올려주세요!"
+                except JobRejected as e:
+                    submit_error = str(e)
             
-            thread = threading.Thread(target=run_analysis)
-            thread.start()
+            def show_status(msg):
+                status_container.markdown(f'<div class="loading-text" style="text-align:center; font-size:1rem; color: var(--text-secondary);"><span class="loading-spinner"></span>{msg}</div>', unsafe_allow_html=True)
             
-            msg_idx = 0
-            while not analysis_done.is_set():
-                if msg_idx < len(progress_messages):
-                    msg, progress = progress_messages[msg_idx]
-                    status_container.markdown(f'<div class="loading-text" style="text-align:center; font-size:1rem; color: var(--text-secondary);"><span class="loading-spinner"></span>{msg}</div>', unsafe_allow_html=True)
-                    progress_bar.progress(progress)
-                    msg_idx += 1
-                time.sleep(2.5)
+            def render_preview(text, clauses):
+                from gemini_analyzer import highlight_text_with_risks, generate_css_modals_html
+                
+                highlighted_html, modal_data_list = highlight_text_with_risks(text, clauses)
+                modals_html = generate_css_modals_html(modal_data_list) if modal_data_list else ""
+                preview_container.markdown(f"""
+                {modals_html}
+                <div class="document-viewer">
+                    {highlighted_html}
+                </div>
+                """, unsafe_allow_html=True)
             
-            progress_bar.progress(1.0)
-            status_container.markdown('<p style="text-align:center; font-size:1rem; color: var(--text-secondary);">✅ 분석 완료!</p>', unsafe_allow_html=True)
-            time.sleep(0.5)
+            # 작업 ID로 상태를 조회 (작업이 갱신되면 즉시, 아니면 0.5초마다 깨어남, 최대 ANALYSIS_WAIT_DEADLINE_SECONDS)
+            job = None
+            wait_timed_out = False
+            if job_id:
+                show_status("🔒 업로드한 파일은 절대 저장되지 않아요")
+                rendered_version = -1
+                rendered_preview = (None, 0)
+                wait_deadline = time.monotonic() + ANALYSIS_WAIT_DEADLINE_SECONDS
+                while True:
+                    if time.monotonic() > wait_deadline:
+                        wait_timed_out = True
+                        break
+                    job = job_manager.wait(job_id, since_version=rendered_version, timeout=0.5)
+                    if job is None:
+                        break
+                    if job["version"] != rendered_version:
+                        rendered_version = job["version"]
+                        phase = job["phase"]
+                        if phase:
+                            progress_bar.progress(PHASE_PROGRESS.get(phase, 0.0))
+                            show_status(PHASE_MESSAGES.get(phase, ""))
+                        clauses = job["clauses"]
+                        if job["extracted_text"] and rendered_preview != (job["extracted_text"], len(clauses)):
+                            rendered_preview = (job["extracted_text"], len(clauses))
+                            if clauses and phase == "llm":
+                                show_status(f"🚨 위험 조항 {len(clauses)}개를 찾았어요...")
+                            render_preview(job["extracted_text"], [AnalysisItem(**clause) for clause in clauses])
+                    if job["status"] in FINISHED_STATUSES:
+                        break
             
             status_container.empty()
             progress_bar.empty()
+            preview_container.empty()
             
             st.session_state.is_analyzing = False
+            st.session_state.analysis_job_id = None
+            if "job" in st.query_params:
+                del st.query_params["job"]
             
-            if analysis_result["error"]:
-                st.session_state.analysis_error = analysis_result["error"]
+            if submit_error:
+                st.session_state.analysis_error = submit_error
+                st.session_state.analysis_complete = False
+            elif wait_timed_out:
+                st.session_state.analysis_error = "분석이 너무 오래 걸리고 있어요. 잠시 후 다시 시도해주세요!"
                 st.session_state.analysis_complete = False
-            elif analysis_result["result"]:
-                st.session_state.analysis_result = analysis_result["result"]
+            elif job is None:
+                st.session_state.analysis_error = "분석 작업을 찾을 수 없어요. 계약서를 다시 올려주세요!"
+                st.session_state.analysis_complete = False
+            elif job["status"] == DONE and job["result"]:
+                st.session_state.analysis_result = ContractAnalysisResult(**job["result"])
                 st.session_state.analysis_complete = True
                 st.session_state.analysis_error = None
             else:
-                st.session_state.analysis_error = "분석 결과를 받지 못했어요. 다시 시도해주세요!"
+                st.session_state.analysis_error = job["error"] or "분석 결과를 받지 못했어요. 다시 시도해주세요!"
+                st.session_state.analysis_complete = False
                     
             st.rerun()
         
@@ -1060,9 +1147,6 @@ if not st.session_state.analysis_complete:
         if not is_analyzing:
             manifest = st.session_state.file_manifest
             
-            import base64
-            from io import BytesIO
-            
             total_files = len(manifest)
             
             st.markdown(f'<p style="text-align:center; color: var(--text-secondary); margin-bottom: 0.75rem; font-size: 0.875rem;">📄 총 {total_files}개 파일 선택됨</p>', unsafe_allow_html=True)
@@ -1072,7 +1156,10 @@ if not st.session_state.analysis_complete:
             preview_html = '<div class="preview-grid">'
             for file_hash in file_hashes:
                 file_info = manifest[file_hash]
-                if file_info["mime"] == "application/pdf":
+                thumbnail = file_info.get("thumbnail")
+                if thumbnail:
+                    preview_html += f'<div class="preview-item"><div class="uploaded-preview"><img src="{thumbnail}" /></div></div>'
+                elif file_info["mime"] == "application/pdf":
                     name = file_info["name"]
                     preview_html += f'''<div class="preview-item">
                         <div class="uploaded-preview" style="display: flex; flex-direction: column; align-items: center; justify-content: center; background: #FEF3C7;">
@@ -1081,12 +1168,7 @@ if not st.session_state.analysis_complete:
                         </div>
                     </div>'''
                 else:
-                    img = Image.open(BytesIO(file_info["bytes"]))
-                    img.thumbnail((160, 160))
-                    buffered = BytesIO()
-                    img.save(buffered, format="PNG")
-                    img_base64 = base64.b64encode(buffered.getvalue()).decode()
-                    preview_html += f'<div class="preview-item"><div class="uploaded-preview"><img src="data:image/png;base64,{img_base64}" /></div></div>'
+                    preview_html += '<div class="preview-item"><div class="uploaded-preview" style="display: flex; align-items: center; justify-content: center; font-size: 3rem;">🖼️</div></div>'
             
             preview_html += '</div>'
             
@@ -1297,7 +1379,7 @@ else:
             st.session_state.uploaded_image = None
             st.session_state.analysis_result = None
             st.session_state.analysis_error = None
-            st.session_state.file_manifest = {}
+            reset_manifest()
             st.session_state.uploader_key += 1
             st.rerun()
 
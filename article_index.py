@@ -0,0 +1,215 @@
+# 법령 조문 번호 색인 ((법령, 조문) → 조문 전문/페이지, 벡터 검색 없이 O(1) 조회)
+
+from __future__ import annotations
+
+import os
+import re
+import json
+import mmap
+import logging
+import threading
+from functools import lru_cache
+from typing import Optional
+
+from legal_chunker import ArticleText
+
+ARTICLE_INDEX_DIRNAME = "article_index"
+ARTICLE_INDEX_VERSION = 1
+_ENTRIES_NAME = "articles.json"
+_BLOB_NAME = "articles.bin"
+
+# 자주 쓰는 약칭 (PDF 첫 페이지의 "( 약칭: 하도급법 )"에서 읽은 약칭도 빌드 때 추가됨)
+LAW_ALIASES = {
+    "근기법": "근로기준법",
+    "최임법": "최저임금법",
+    "하도급법": "하도급거래 공정화에 관한 법률",
+    "약관법": "약관의 규제에 관한 법률",
+}
+
+_REFERENCE_RE = re.compile(r"^\s*(?P<law>.*?)\s*제\s*(?P<number>\d+)\s*조(?:\s*의\s*(?P<branch>\d+))?")
+_ABBREVIATION_RE = re.compile(r"약칭\s*:\s*([^)\s]+)")
+
+
+def normalize_law_name(name: str) -> str:
+    """띄어쓰기/낫표를 무시한 법령 이름 키 ("하도급거래 공정화에 관한 법률" → "하도급거래공정화에관한법률")."""
+    return re.sub(r"[\s「」『』]", "", name or "")
+
+
+@lru_cache(maxsize=1024)
+def parse_legal_reference(reference: str) -> Optional[tuple[str, str]]:
+    """
+    "근로기준법 제20조 (위약 예정 금지)" → ("근로기준법", "제20조").
+    "하도급거래 공정화에 관한 법률 제3조의4" → (..., "제3조의4"). 조문 번호가 없으면 None.
+    """
+    match = _REFERENCE_RE.match(reference or "")
+    if not match or not match.group("law"):
+        return None
+    article = f"제{match.group('number')}조"
+    if match.group("branch"):
+        article += f"의{match.group('branch')}"
+    return match.group("law").strip(), article
+
+
+def _entry_key(law_key: str, article: str) -> str:
+    return f"{law_key}|{article}"
+
+
+def build_article_index(data_folder: str = "./data", persist_directory: str = "./chroma_db", force: bool = False) -> dict:
+    """
+    data_folder의 PDF에서 본칙 조문을 뽑아 색인을 만듭니다 (PDF 내용이 그대로면 건너뜀).
+
+    - articles.bin: 조문 텍스트(UTF-8)를 이어 붙인 파일 (조회 시 mmap)
+    - articles.json: "법령키|제N조" → [offset, length, page, 제목, 파일, 법령 이름], 약칭, 원본 파일 해시
+
+    Returns:
+        {"articles": 조문 수, "laws": 법령 수, "skipped": 변경 없어 건너뛰었는지}
+    """
+    import pymupdf
+    from legal_chunker import extract_articles
+    from vector_index import file_sha256
+
+    index_directory = os.path.join(persist_directory, ARTICLE_INDEX_DIRNAME)
+    entries_path = os.path.join(index_directory, _ENTRIES_NAME)
+    pdf_files = sorted(f for f in os.listdir(data_folder) if f.endswith(".pdf"))
+    file_hashes = {pdf_file: file_sha256(os.path.join(data_folder, pdf_file)) for pdf_file in pdf_files}
+
+    if not force:
+        try:
+            with open(entries_path, "r", encoding="utf-8") as f:
+                existing = json.load(f)
+            if existing.get("version") == ARTICLE_INDEX_VERSION and existing.get("files") == file_hashes:
+                return {"articles": len(existing["entries"]), "laws": len(existing["laws"]), "skipped": True}
+        except (OSError, ValueError):
+            pass
+
+    entries: dict[str, list] = {}
+    laws: dict[str, str] = {}
+    aliases = {normalize_law_name(alias): normalize_law_name(name) for alias, name in LAW_ALIASES.items()}
+    blob = bytearray()
+
+    for pdf_file in pdf_files:
+        try:
+            with pymupdf.open(os.path.join(data_folder, pdf_file)) as document:
+                pages = [page.get_text() for page in document]
+        except Exception as e:
+            logging.warning(f"Article index: failed to read {pdf_file}: {e}")
+            continue
+
+        articles: list[ArticleText] = extract_articles(pages, pdf_file)
+        if not articles:
+            continue
+        law_key = normalize_law_name(articles[0].law_name)
+        laws[law_key] = articles[0].law_name
+        abbreviation = _ABBREVIATION_RE.search(pages[0]) if pages else None
+        if abbreviation:
+            aliases[normalize_law_name(abbreviation.group(1))] = law_key
+
+        for article in articles:
+            data = article.text.encode("utf-8")
+            entries[_entry_key(law_key, article.article)] = [
+                len(blob), len(data), article.page, article.title, article.source, article.law_name,
+            ]
+            blob.extend(data)
+
+    os.makedirs(index_directory, exist_ok=True)
+    # 조회 중인 프로세스가 반쯤 쓴 파일을 보지 않도록 임시 파일에 쓴 뒤 교체 (blob 먼저)
+    blob_path = os.path.join(index_directory, _BLOB_NAME)
+    with open(blob_path + ".tmp", "wb") as f:
+        f.write(blob)
+    os.replace(blob_path + ".tmp", blob_path)
+    with open(entries_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": ARTICLE_INDEX_VERSION, "files": file_hashes, "laws": laws, "aliases": aliases, "entries": entries},
+            f,
+            ensure_ascii=False,
+        )
+    os.replace(entries_path + ".tmp", entries_path)
+
+    return {"articles": len(entries), "laws": len(laws), "skipped": False}
+
+
+class ArticleIndex:
+    """build_article_index가 만든 색인을 읽는 조회기. 조문 텍스트는 mmap에서 필요한 부분만 읽습니다."""
+
+    def __init__(self, index_directory: str):
+        with open(os.path.join(index_directory, _ENTRIES_NAME), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != ARTICLE_INDEX_VERSION:
+            raise ValueError(f"Unsupported article index version: {data.get('version')}")
+        self._entries: dict[str, list] = data["entries"]
+        self._laws: dict[str, str] = data["laws"]
+        self._aliases: dict[str, str] = data.get("aliases", {})
+
+        with open(os.path.join(index_directory, _BLOB_NAME), "rb") as f:
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def law_key(self, law_name: str) -> Optional[str]:
+        """법령 이름/약칭 → 색인 키 (모르는 법령이면 None)."""
+        key = normalize_law_name(law_name)
+        if key in self._laws:
+            return key
+        return self._aliases.get(key)
+
+    def get(self, law_name: str, article: str) -> Optional[ArticleText]:
+        law_key = self.law_key(law_name)
+        if law_key is None:
+            return None
+        entry = self._entries.get(_entry_key(law_key, article.replace(" ", "")))
+        if entry is None:
+            return None
+        offset, length, page, title, source, display_name = entry
+        text = self._blob[offset:offset + length].decode("utf-8")
+        return ArticleText(display_name, article, title, text, page, source)
+
+    def resolve(self, reference: str) -> Optional[ArticleText]:
+        """ "근로기준법 제20조 (위약 예정 금지)" 같은 참조 문자열 → 조문 전문 (없으면 None)."""
+        parsed = parse_legal_reference(reference)
+        if parsed is None:
+            return None
+        return self.get(*parsed)
+
+
+_article_index: Optional[ArticleIndex] = None
+_article_index_failed = False
+_article_index_lock = threading.Lock()
+
+
+def get_article_index(persist_directory: str = "./chroma_db") -> Optional[ArticleIndex]:
+    """프로세스당 한 번 여는 조문 색인 (아직 빌드하지 않았거나 열 수 없으면 None)."""
+    global _article_index, _article_index_failed
+
+    with _article_index_lock:
+        if _article_index is None and not _article_index_failed:
+            try:
+                _article_index = ArticleIndex(os.path.join(persist_directory, ARTICLE_INDEX_DIRNAME))
+            except FileNotFoundError:
+                _article_index_failed = True
+                logging.warning(f"Article index not found under {persist_directory}. Run build_db.py first.")
+            except Exception as e:
+                _article_index_failed = True
+                logging.warning(f"Article index unavailable: {e}")
+        return _article_index
+
+
+def invalidate_article_index() -> None:
+    global _article_index, _article_index_failed
+
+    with _article_index_lock:
+        _article_index = None
+        _article_index_failed = False
+
+
+def resolve_legal_reference(reference: str) -> Optional[ArticleText]:
+    """참조 문자열을 조문 전문으로 (색인이 없거나 코퍼스에 없는 법령이면 None)."""
+    index = get_article_index()
+    return index.resolve(reference) if index is not None else None
+
+
+def resolve_mandatory_references() -> dict[str, Optional[ArticleText]]:
+    """MANDATORY_RISK_CLAUSES의 clause_id → legal_reference 조문 전문 (인용 카드용)."""
+    from gemini_analyzer import MANDATORY_RISK_CLAUSES
+
+    return {clause["clause_id"]: resolve_legal_reference(clause["legal_reference"]) for clause in MANDATORY_RISK_CLAUSES}
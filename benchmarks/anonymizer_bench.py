@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+개인정보 비식별화 마이크로 벤치마크
+
+50페이지 분량의 합성 계약서로 다음을 비교합니다.
+- legacy: 기존 방식 (호출마다 re.sub 11회, 인라인 패턴)
+- single-pass: gemini_analyzer.anonymize_personal_info (미리 컴파일한 단일 정규식)
+- batch: gemini_analyzer.anonymize_analysis_result (결과 전체를 한 번에)
+
+실행: python benchmarks/anonymizer_bench.py [--pages 50] [--repeat 20]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_analyzer import (  # noqa: E402
+    AnalysisItem,
+    ContractAnalysisResult,
+    anonymize_analysis_result,
+    anonymize_personal_info,
+)
+
+PAGE_TEMPLATE = """제{article}조 (근로조건)
+근로자: {name} (주민등록번호 {rrn})
+연락처: {mobile} / 사무실 {landline}
+이메일: {email}
+급여계좌: {account}
+주소: 서울시 강남구 테헤란로 {street}, {floor}층
+1. 근로시간은 09:00부터 18:00까지로 하며, 휴게시간은 12:00부터 13:00까지로 한다.
+2. 임금은 매월 10일에 지급하며, 시급은 10,030원으로 한다.
+3. 연장근로 시 통상임금의 50%를 가산하여 지급한다.
+4. 본 계약에 정하지 않은 사항은 근로기준법에 따른다.
+"""
+
+
+def legacy_anonymize(text: str) -> str:
+    """기존 구현 (비교 기준)."""
+    if not text:
+        return text
+    text = re.sub(r'(\d{6})-(\d{7})', r'\1-*******', text)
+    text = re.sub(
+        r'(010|011|016|017|018|019)-(\d{3,4})-(\d{4})',
+        lambda m: f"{m.group(1)}-{'*' * len(m.group(2))}-{m.group(3)}",
+        text
+    )
+    text = re.sub(
+        r'(0\d{1,2})-(\d{3,4})-(\d{4})',
+        lambda m: f"{m.group(1)[:2]}{'*' * (len(m.group(1)) - 2)}-{'*' * len(m.group(2))}-{m.group(3)}",
+        text
+    )
+    text = re.sub(
+        r'([a-zA-Z0-9])([a-zA-Z0-9._%+-]{1,})@([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})',
+        lambda m: f"{m.group(1)}{'*' * min(len(m.group(2)), 5)}@{m.group(3)}",
+        text
+    )
+    text = re.sub(
+        r'(\d{3,4})-(\d{3,4})-(\d{3,4})-(\d{3,4})',
+        lambda m: f"{'*' * len(m.group(1))}-{'*' * len(m.group(2))}-{'*' * len(m.group(3))}-{m.group(4)}",
+        text
+    )
+    name_patterns = [
+        r'(근로자\s*[:：]\s*)([가-힣]{2,4})(?=\s|$|\()',
+        r'(성\s*명\s*[:：]\s*)([가-힣]{2,4})(?=\s|$|\()',
+        r'(이\s*름\s*[:：]\s*)([가-힣]{2,4})(?=\s|$|\()',
+        r'(대\s*표\s*[:：]\s*)([가-힣]{2,4})(?=\s|$|\()',
+        r'(사용자\s*[:：]\s*)([가-힣]{2,4})(?=\s|$|\()',
+        r'(성명\s*)([가-힣]{2,4})(?=\s|$|\()',
+    ]
+    for pattern in name_patterns:
+        text = re.sub(
+            pattern,
+            lambda m: f"{m.group(1)}{m.group(2)[0]}{'*' * (len(m.group(2)) - 1)}",
+            text
+        )
+    address_pattern = r'(서울|부산|대구|인천|광주|대전|울산|세종|경기|강원|충북|충남|전북|전남|경북|경남|제주)([시도])\s+([가-힣]+[시군구])\s+([가-힣0-9\s,.-]+)'
+    text = re.sub(
+        address_pattern,
+        lambda m: f"{m.group(1)}{m.group(2)} {m.group(3)} ********",
+        text
+    )
+    return text
+
+
+def build_contract(pages: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    surnames = "김이박최정강조윤장임"
+    given = "민서지우하준도윤서연"
+    body = []
+    for page in range(pages):
+        body.append(PAGE_TEMPLATE.format(
+            article=page + 1,
+            name=rng.choice(surnames) + "".join(rng.choice(given) for _ in range(2)),
+            rrn=f"{rng.randint(100000, 999999)}-{rng.randint(1000000, 9999999)}",
+            mobile=f"010-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+            landline=f"02-{rng.randint(100, 9999)}-{rng.randint(1000, 9999)}",
+            email=f"user{rng.randint(1, 9999)}@example.com",
+            account=f"{rng.randint(100, 9999)}-{rng.randint(100, 9999)}-{rng.randint(100, 9999)}-{rng.randint(100, 9999)}",
+            street=rng.randint(1, 500),
+            floor=rng.randint(1, 30),
+        ))
+        # 페이지당 약 2,000자가 되도록 일반 조항으로 채움
+        body.append("본 계약의 내용은 당사자 간의 합의에 따라 성실히 이행한다. " * 30)
+    return "\n".join(body)
+
+
+def build_result(contract: str, clauses: int = 20) -> ContractAnalysisResult:
+    lines = [line for line in contract.splitlines() if line.strip()]
+    return ContractAnalysisResult(
+        extracted_text=contract,
+        risk_clauses=[
+            AnalysisItem(
+                category="🚨 테스트",
+                original_text=lines[i * 7 % len(lines)],
+                explanation=f"설명 {i}: 담당자 010-1234-5678 로 문의해요. 근로자: 홍길동 님의 권리예요.",
+                script=f"요청 {i}: 성명: 김철수 (연락처 02-123-4567)",
+            )
+            for i in range(clauses)
+        ],
+        summary="요약",
+    )
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    contract = build_contract(args.pages)
+    size_kb = len(contract.encode("utf-8")) / 1024
+
+    # 결과 동일성 확인
+    legacy_output = legacy_anonymize(contract)
+    new_output = anonymize_personal_info(contract)
+    print(f"📄 {args.pages} pages, {len(contract):,} chars ({size_kb:.0f} KB)")
+    print(f"✅ output identical to legacy: {legacy_output == new_output}")
+    # legacy는 전화번호 패턴이 계좌번호 안쪽(예: 4540-2019-1234-6195의 019-1234-6195)을
+    # 먼저 치환해 계좌 앞자리가 노출되는 경우가 있습니다. 단일 스캔은 가장 왼쪽에서 시작하는
+    # 계좌번호 전체를 잡으므로 이 줄들만 달라야 합니다.
+    differing = [
+        (old, new)
+        for old, new in zip(legacy_output.splitlines(), new_output.splitlines())
+        if old != new
+    ]
+    unexpected = [new for _, new in differing if not new.startswith("급여계좌: ")]
+    print(f"   differing lines: {len(differing)} (account numbers fully masked), unexpected: {len(unexpected)}")
+
+    legacy_time = timed(lambda: legacy_anonymize(contract), args.repeat)
+    new_time = timed(lambda: anonymize_personal_info(contract), args.repeat)
+
+    print(f"   legacy       : {legacy_time * 1000:8.2f} ms  ({len(contract) / legacy_time / 1e6:6.2f} M chars/s)")
+    print(f"   single-pass  : {new_time * 1000:8.2f} ms  ({len(contract) / new_time / 1e6:6.2f} M chars/s)")
+    print(f"   speedup      : {legacy_time / new_time:.2f}x")
+
+    # 결과 전체 비식별화 (extracted_text + 조항 20개 × 3필드)
+    def legacy_result():
+        result = build_result(contract)
+        result.extracted_text = legacy_anonymize(result.extracted_text)
+        for clause in result.risk_clauses:
+            clause.original_text = legacy_anonymize(clause.original_text)
+            clause.explanation = legacy_anonymize(clause.explanation)
+            clause.script = legacy_anonymize(clause.script)
+        return result
+
+    def batch_result():
+        return anonymize_analysis_result(build_result(contract))
+
+    print(f"✅ batch extracted_text matches single-pass: {batch_result().extracted_text == new_output}")
+    legacy_batch_time = timed(legacy_result, args.repeat)
+    batch_time = timed(batch_result, args.repeat)
+    print(f"   legacy result: {legacy_batch_time * 1000:8.2f} ms")
+    print(f"   batch result : {batch_time * 1000:8.2f} ms")
+    print(f"   speedup      : {legacy_batch_time / batch_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+업로드 전 이미지 정규화 벤치마크
+
+휴대폰 사진과 비슷한 합성 계약서 사진(4032×3024, 어두운 배경 위에 3도 기울어진 종이, EXIF 회전)을 만들어
+image_preprocess.preprocess_image 전후의 크기/해상도/처리 시간을 비교합니다.
+
+- serial: 한 장씩 현재 프로세스에서 처리
+- pool  : prepare_image_for_upload (프로세스 풀)로 여러 장을 동시에 처리
+
+--ocr 옵션을 주면 (GEMINI_API_KEY 필요) 원본/정규화 이미지를 각각 OCR해
+정답 텍스트와의 문자 유사도와 응답 시간을 비교합니다.
+
+실행: python benchmarks/image_preprocess_bench.py [--images 8] [--ocr]
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import difflib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+from image_preprocess import preprocess_image, prepare_image_for_upload  # noqa: E402
+
+LINES = [
+    "EMPLOYMENT CONTRACT",
+    "Article 1 (Working hours) 09:00 - 18:00, break 12:00 - 13:00.",
+    "Article 2 (Wage) Hourly wage KRW 10,030, paid on the 10th of each month.",
+    "Article 3 (Overtime) 50% premium on ordinary wage for overtime work.",
+    "Article 4 (Severance) Severance pay is included in the monthly wage.",
+    "Article 5 (Penalty) Employee pays KRW 1,000,000 when leaving early.",
+    "Article 6 (Others) Matters not stated follow the Labor Standards Act.",
+]
+
+
+def build_photo(seed: int = 0) -> tuple[bytes, str]:
+    rng = random.Random(seed)
+    paper = Image.new("RGB", (2480, 3508), (246, 244, 238))
+    draw = ImageDraw.Draw(paper)
+    y = 200
+    for repeat in range(6):
+        for line in LINES:
+            draw.text((160, y), line, fill=(20, 20, 20), font_size=44)
+            y += 72
+    paper = paper.rotate(3 + rng.random(), expand=True, fillcolor=(60, 52, 48), resample=Image.BICUBIC)
+
+    photo = Image.new("RGB", (3024, 4032), (60, 52, 48))
+    paper.thumbnail((2700, 3700))
+    photo.paste(paper, ((3024 - paper.width) // 2, (4032 - paper.height) // 2))
+    photo = photo.filter(ImageFilter.GaussianBlur(0.6))
+
+    # 센서는 가로로 찍고 EXIF Orientation=6(90도 회전)으로 저장하는 휴대폰 사진 흉내
+    stored = photo.transpose(Image.Transpose.ROTATE_90)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    output = io.BytesIO()
+    stored.save(output, format="JPEG", quality=95, exif=exif)
+    return output.getvalue(), "\n".join(LINES * 6)
+
+
+def similarity(expected: str, actual: str) -> float:
+    normalize = lambda text: " ".join(text.split()).lower()
+    return difflib.SequenceMatcher(None, normalize(expected), normalize(actual)).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--ocr", action="store_true", help="Gemini OCR 정확도/지연 비교 (API 키 필요)")
+    args = parser.parse_args()
+
+    photos = [build_photo(seed) for seed in range(args.images)]
+    original_bytes, truth = photos[0]
+
+    start = time.perf_counter()
+    processed, mime_type, info = preprocess_image(original_bytes, "image/jpeg")
+    single_time = time.perf_counter() - start
+
+    print(f"🖼️  original : {len(original_bytes) / 1024:8.0f} KB  {info.get('original_size')}")
+    print(f"   processed: {len(processed) / 1024:8.0f} KB  {info.get('size')}  ({mime_type})")
+    print(f"   reduction: {len(original_bytes) / len(processed):.1f}x smaller")
+    print(f"   cropped={info.get('cropped', False)}  deskew={info.get('deskew_degrees', 0.0)}°")
+    print(f"   one image: {single_time * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    for photo, _ in photos:
+        preprocess_image(photo, "image/jpeg")
+    serial_time = time.perf_counter() - start
+
+    prepare_image_for_upload(original_bytes, "image/jpeg")  # 풀 기동 시간 제외
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(photos)) as executor:
+        list(executor.map(lambda item: prepare_image_for_upload(item[0], "image/jpeg"), photos))
+    pool_time = time.perf_counter() - start
+
+    print(f"⏱️  {args.images} images serial: {serial_time * 1000:8.0f} ms")
+    print(f"   {args.images} images pool  : {pool_time * 1000:8.0f} ms  ({serial_time / pool_time:.1f}x)")
+
+    if args.ocr:
+        from page_ocr import OCR_PROMPT, OCR_MODEL
+        from genai_client import get_genai_client
+        from google.genai import types
+
+        client = get_genai_client()
+        for label, data, mime in (("original", original_bytes, "image/jpeg"), ("processed", processed, mime_type)):
+            start = time.perf_counter()
+            response = client.models.generate_content(
+                model=OCR_MODEL,
+                contents=[types.Part.from_bytes(data=data, mime_type=mime), OCR_PROMPT],
+                config=types.GenerateContentConfig(temperature=0.0),
+            )
+            elapsed = time.perf_counter() - start
+            print(f"🔍 OCR {label:9s}: {elapsed:6.2f} s  similarity {similarity(truth, response.text or ''):.3f}")
+
+
+if __name__ == "__main__":
+    main()
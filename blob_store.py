@@ -0,0 +1,201 @@
+# 업로드 파일 바이트 보관소 (세션별 임시 파일 + mmap, 세션 용량 제한, 세션 종료 시 삭제)
+
+from __future__ import annotations
+
+import os
+import re
+import mmap
+import time
+import atexit
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import weakref
+from typing import Optional, Union
+
+# 비워두면 프로세스마다 새 임시 디렉터리를 만들고 종료 시 지웁니다
+BLOB_STORE_DIR = os.environ.get("BLOB_STORE_DIR", "")
+BLOB_SESSION_QUOTA_BYTES = int(os.environ.get("BLOB_SESSION_QUOTA_BYTES", str(50 * 1024 * 1024)))
+# 세션 종료를 알 수 없는 경우(브라우저 종료 등)의 안전장치: 이 시간 동안 접근이 없는 세션의 파일은 삭제
+BLOB_SESSION_IDLE_TTL_SECONDS = float(os.environ.get("BLOB_SESSION_IDLE_TTL_SECONDS", str(2 * 60 * 60)))
+
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class BlobQuotaExceeded(Exception):
+    """세션에 올린 파일의 총 용량이 제한을 넘은 경우."""
+
+
+class BlobStore:
+    """
+    업로드 파일 바이트를 서버 메모리(session_state) 대신 세션별 임시 파일에 보관합니다.
+
+    - put(): 내용 해시(sha256)를 blob ID로 저장 (같은 세션의 같은 파일은 한 번만)
+    - open(): 읽기 전용 mmap으로 열어 복사 없이 넘김 (페이지 캐시에서 필요한 만큼만 읽힘)
+    - 세션별 총 용량이 session_quota를 넘으면 BlobQuotaExceeded
+    - purge_session()/purge_idle()로 세션 파일 삭제 (이미 열린 mmap은 닫힐 때까지 유효)
+    """
+
+    def __init__(
+        self,
+        root: str,
+        session_quota: int = BLOB_SESSION_QUOTA_BYTES,
+        idle_ttl: float = BLOB_SESSION_IDLE_TTL_SECONDS,
+    ):
+        self.root = root
+        self.session_quota = session_quota
+        self.idle_ttl = idle_ttl
+        os.makedirs(root, mode=0o700, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._sessions: dict[str, dict[str, int]] = {}
+        self._last_access: dict[str, float] = {}
+
+    def _session_dir(self, session_id: str) -> str:
+        if not _SESSION_ID_RE.match(session_id):
+            raise ValueError(f"Invalid blob session id: {session_id!r}")
+        return os.path.join(self.root, session_id)
+
+    def _path(self, session_id: str, blob_id: str) -> str:
+        return os.path.join(self._session_dir(session_id), blob_id)
+
+    def put(self, session_id: str, data: bytes) -> str:
+        """
+        data를 세션 파일로 저장하고 blob ID를 반환합니다.
+
+        Raises:
+            BlobQuotaExceeded: 세션 용량 제한 초과
+        """
+        blob_id = hashlib.sha256(data).hexdigest()
+        session_dir = self._session_dir(session_id)
+        self.purge_idle()
+
+        with self._lock:
+            blobs = self._sessions.setdefault(session_id, {})
+            self._last_access[session_id] = time.monotonic()
+            if blob_id in blobs:
+                return blob_id
+            if sum(blobs.values()) + len(data) > self.session_quota:
+                raise BlobQuotaExceeded(
+                    f"한 번에 올릴 수 있는 파일 용량({self.session_quota // (1024 * 1024)}MB)을 넘었어요. "
+                    "일부 파일을 빼고 다시 시도해주세요."
+                )
+            # 쓰는 동안 다른 요청이 용량을 넘기지 않도록 먼저 예약
+            blobs[blob_id] = len(data)
+
+        try:
+            os.makedirs(session_dir, mode=0o700, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=session_dir, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(session_id, blob_id))
+        except Exception:
+            with self._lock:
+                self._sessions.get(session_id, {}).pop(blob_id, None)
+            raise
+        return blob_id
+
+    def open(self, session_id: str, blob_id: str) -> Union[mmap.mmap, bytes]:
+        """
+        blob을 읽기 전용 mmap으로 엽니다 (bytes처럼 해시/슬라이스 가능, 빈 파일은 b"").
+
+        Raises:
+            FileNotFoundError: 삭제되었거나 만료된 blob
+        """
+        path = self._path(session_id, blob_id)
+        with self._lock:
+            if session_id in self._last_access:
+                self._last_access[session_id] = time.monotonic()
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def delete(self, session_id: str, blob_id: str) -> None:
+        with self._lock:
+            self._sessions.get(session_id, {}).pop(blob_id, None)
+        try:
+            os.remove(self._path(session_id, blob_id))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Blob delete failed: {e}")
+
+    def usage(self, session_id: str) -> int:
+        """세션이 사용 중인 바이트 수."""
+        with self._lock:
+            return sum(self._sessions.get(session_id, {}).values())
+
+    def purge_session(self, session_id: str) -> None:
+        """세션의 모든 파일을 삭제합니다."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._last_access.pop(session_id, None)
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+    def purge_idle(self) -> int:
+        """idle_ttl 동안 접근이 없는 세션을 삭제하고, 삭제한 세션 수를 반환합니다."""
+        cutoff = time.monotonic() - self.idle_ttl
+        with self._lock:
+            expired = [session_id for session_id, accessed in self._last_access.items() if accessed < cutoff]
+        for session_id in expired:
+            self.purge_session(session_id)
+        if expired:
+            logging.info(f"Purged blobs of {len(expired)} idle sessions")
+        return len(expired)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "blobs": sum(len(blobs) for blobs in self._sessions.values()),
+                "bytes": sum(sum(blobs.values()) for blobs in self._sessions.values()),
+            }
+
+
+class SessionBlobs:
+    """
+    세션 하나에 묶인 BlobStore 핸들.
+    st.session_state에 넣어두면 세션이 끝나 상태가 정리(가비지 수집)될 때 세션 파일도 함께 삭제됩니다.
+    """
+
+    def __init__(self, store: BlobStore, session_id: str):
+        self.store = store
+        self.session_id = session_id
+        self._finalizer = weakref.finalize(self, store.purge_session, session_id)
+
+    def put(self, data: bytes) -> str:
+        return self.store.put(self.session_id, data)
+
+    def open(self, blob_id: str) -> Union[mmap.mmap, bytes]:
+        return self.store.open(self.session_id, blob_id)
+
+    def delete(self, blob_id: str) -> None:
+        self.store.delete(self.session_id, blob_id)
+
+    def usage(self) -> int:
+        return self.store.usage(self.session_id)
+
+    def clear(self) -> None:
+        self.store.purge_session(self.session_id)
+
+
+_blob_store: Optional[BlobStore] = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """프로세스당 하나의 BlobStore (BLOB_STORE_DIR이 없으면 종료 시 지워지는 임시 디렉터리)."""
+    global _blob_store
+
+    with _blob_store_lock:
+        if _blob_store is None:
+            if BLOB_STORE_DIR:
+                root = BLOB_STORE_DIR
+            else:
+                root = tempfile.mkdtemp(prefix="contract-blobs-")
+                atexit.register(shutil.rmtree, root, True)
+            _blob_store = BlobStore(root)
+        return _blob_store
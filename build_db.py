@@ -2,12 +2,15 @@
 """
 벡터 DB 리빌딩 스크립트
 
-data/ 폴더의 모든 PDF 파일을 읽어서 ChromaDB 벡터 DB를 새로 구축합니다.
-기존 chroma_db 폴더가 있다면 삭제하고 처음부터 다시 만듭니다.
+data/ 폴더의 PDF 파일로 ChromaDB 벡터 DB를 갱신합니다.
+새로 추가되거나 바뀐 PDF만 다시 분할/임베딩하고, data/에서 사라진 PDF의 벡터는 삭제합니다.
+
+실행: python build_db.py [--full]
+  --full  기존 chroma_db 폴더를 지우고 처음부터 다시 구축
 """
 
 import os
-import shutil
+import argparse
 from dotenv import load_dotenv
 from gemini_analyzer import build_vector_db
 
@@ -16,16 +19,20 @@ load_dotenv()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="data/ 폴더의 PDF로 벡터 DB를 갱신합니다.")
+    parser.add_argument("--full", action="store_true", help="기존 DB를 지우고 처음부터 다시 구축")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("벡터 DB 리빌딩 시작")
     print("=" * 60)
 
-    # 1. 기존 chroma_db 폴더가 있다면 삭제
+    # 1. 기존 DB 확인 (--full이면 처음부터, 아니면 바뀐 문서만 반영)
     chroma_db_path = "./chroma_db"
-    if os.path.exists(chroma_db_path):
-        print(f"\n⚠️  기존 {chroma_db_path} 폴더를 삭제합니다...")
-        shutil.rmtree(chroma_db_path)
-        print(f"✅ 기존 DB 삭제 완료")
+    if args.full and os.path.exists(chroma_db_path):
+        print(f"\n⚠️  --full: 기존 {chroma_db_path} 폴더를 지우고 처음부터 구축합니다...")
+    elif os.path.exists(chroma_db_path):
+        print(f"\n💡 기존 DB에 바뀐 문서만 반영합니다.")
     else:
         print(f"\n💡 기존 DB가 없습니다. 새로 생성합니다.")
 
@@ -45,7 +52,7 @@ def main():
     # 3. 벡터 DB 구축 (backend.py의 build_vector_db 함수 호출)
     print("\n" + "=" * 60)
     try:
-        vectorstore = build_vector_db()
+        vectorstore = build_vector_db(full_rebuild=args.full)
         print("=" * 60)
         print("\n🎉 벡터 DB 리빌딩 완료!")
         print(f"✅ 데이터베이스가 {chroma_db_path} 폴더에 저장되었습니다.")
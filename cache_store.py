@@ -0,0 +1,164 @@
+# 디스크 기반 LRU/TTL 캐시 (분석 결과, 임베딩 등 재사용용)
+
+from __future__ import annotations
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class SQLiteLRUCache:
+    """
+    SQLite에 저장되는 문자열 key-value 캐시.
+
+    - LRU: 마지막 접근 시각(accessed_at)이 오래된 항목부터 max_entries를 넘는 만큼 삭제
+    - TTL: 생성 후 ttl_seconds가 지난 항목은 조회 시 만료 처리
+    - 자주 쓰는 항목은 메모리 LRU(memory_entries)에도 올려두어 디스크 조회를 줄임
+
+    여러 Streamlit 세션(스레드)에서 동시에 접근해도 안전하도록 하나의 커넥션을 락으로 보호합니다.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 500,
+        ttl_seconds: Optional[float] = 7 * 24 * 60 * 60,
+        memory_entries: int = 64,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed_at ON cache (accessed_at)")
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """캐시된 값을 반환합니다. 없거나 만료되었으면 None."""
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None and not self._is_expired(cached[1], now):
+                self._memory.move_to_end(key)
+                self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+                self._hits += 1
+                return cached[0]
+            self._memory.pop(key, None)
+
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+
+            value, created_at = row
+            if self._is_expired(created_at, now):
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._misses += 1
+                return None
+
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._remember(key, value, created_at)
+            self._hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        """값을 저장하고, 용량을 넘으면 가장 오래 쓰지 않은 항목부터 삭제합니다."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._remember(key, value, now)
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        evicted = [
+            row[0] for row in self._conn.execute(
+                "SELECT key FROM cache ORDER BY accessed_at ASC LIMIT ?", (overflow,)
+            )
+        ]
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in evicted])
+        for key in evicted:
+            self._memory.pop(key, None)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._memory.pop(key, None)
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM cache")
+
+    def purge_expired(self) -> int:
+        """만료된 항목을 한 번에 정리하고 삭제 개수를 반환합니다."""
+        if self.ttl_seconds is None:
+            return 0
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            self._memory.clear()
+            cursor = self._conn.execute("DELETE FROM cache WHERE created_at < ?", (cutoff,))
+            return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+            total = self._hits + self._misses
+            return {
+                "entries": count,
+                "memory_entries": len(self._memory),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / total) if total else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except sqlite3.Error as e:
+                logging.warning(f"Cache close failed: {e}")
@@ -0,0 +1,187 @@
+# RAG 검색용 질문 임베딩 캐시
+
+from __future__ import annotations
+
+import re
+import json
+import hashlib
+import inspect
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from cache_store import SQLiteLRUCache
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:  # langchain 미설치 환경에서도 모듈 import는 가능하도록
+    Embeddings = object
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCT_RE = re.compile(r"[?？!！.。~〜…]+$")
+
+
+def normalize_query(text: str) -> str:
+    """
+    캐시 키용 질문 정규화.
+    "주휴수당 받을 수 있나요?" / "주휴수당 받을수 있나요" 처럼
+    띄어쓰기, 끝 문장부호, 전각/반각만 다른 질문은 같은 키가 됩니다.
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower().strip()
+    text = _TRAILING_PUNCT_RE.sub("", text)
+    return _WHITESPACE_RE.sub("", text)
+
+
+def _accepts_task_type(method) -> bool:
+    """embed_documents가 task_type 키워드를 받는지 (GoogleGenerativeAIEmbeddings 등) 시그니처로 확인합니다."""
+    try:
+        parameters = inspect.signature(method).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(p.name == "task_type" or p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    embed_query() 결과를 정규화된 질문 텍스트 기준으로 캐시하는 Embeddings 래퍼.
+
+    - 1차: 메모리 LRU (max_entries개)
+    - 2차: SQLiteLRUCache (선택, 프로세스 재시작 후에도 유지)
+    - embed_queries()는 여러 질문을 캐시 확인 후 한 번의 배치 호출로 임베딩
+    - embed_documents()는 캐시 없이 그대로 위임 (DB 빌드용)
+    """
+
+    def __init__(
+        self,
+        underlying,
+        model_name: str = "",
+        max_entries: int = 1024,
+        disk_cache: Optional[SQLiteLRUCache] = None,
+    ):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.disk_cache = disk_cache
+        # task_type을 받지 않는 임베딩 구현은 질문별로 embed_query 호출
+        self._batch_queries = _accepts_task_type(getattr(underlying, "embed_documents", None))
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, list[float]] = OrderedDict()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+    def _cache_key(self, text: str) -> str:
+        normalized = normalize_query(text)
+        return hashlib.sha256(f"{self.model_name}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: list[float]) -> None:
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._cache_key(text)
+
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self._memory_hits += 1
+                return list(vector)
+
+        if self.disk_cache is not None:
+            try:
+                raw = self.disk_cache.get(key)
+            except Exception as e:
+                logging.warning(f"Embedding cache read failed: {e}")
+                raw = None
+            if raw is not None:
+                vector = json.loads(raw)
+                self._remember(key, vector)
+                with self._lock:
+                    self._disk_hits += 1
+                return list(vector)
+
+        vector = list(self.underlying.embed_query(text))
+        with self._lock:
+            self._misses += 1
+        self._remember(key, vector)
+
+        if self.disk_cache is not None:
+            try:
+                self.disk_cache.set(key, json.dumps(vector))
+            except Exception as e:
+                logging.warning(f"Embedding cache write failed: {e}")
+
+        return list(vector)
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """
+        여러 질문을 한 번에 임베딩합니다. 캐시에 없는 질문만 모아 원격 호출 한 번(배치)으로 처리합니다.
+        """
+        vectors: list[Optional[list[float]]] = [None] * len(texts)
+        missing: dict[str, list[int]] = {}
+        for index, text in enumerate(texts):
+            key = self._cache_key(text)
+            with self._lock:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self._memory_hits += 1
+            if vector is None and self.disk_cache is not None:
+                try:
+                    raw = self.disk_cache.get(key)
+                except Exception as e:
+                    logging.warning(f"Embedding cache read failed: {e}")
+                    raw = None
+                if raw is not None:
+                    vector = json.loads(raw)
+                    self._remember(key, vector)
+                    with self._lock:
+                        self._disk_hits += 1
+            if vector is not None:
+                vectors[index] = list(vector)
+            else:
+                missing.setdefault(key, []).append(index)
+
+        if missing:
+            keys = list(missing)
+            queries = [texts[missing[key][0]] for key in keys]
+            if self._batch_queries:
+                embedded = self.underlying.embed_documents(queries, task_type="retrieval_query")
+            else:
+                embedded = [self.underlying.embed_query(query) for query in queries]
+            with self._lock:
+                self._misses += len(keys)
+            for key, vector in zip(keys, embedded):
+                vector = list(vector)
+                self._remember(key, vector)
+                for index in missing[key]:
+                    vectors[index] = vector
+                if self.disk_cache is not None:
+                    try:
+                        self.disk_cache.set(key, json.dumps(vector))
+                    except Exception as e:
+                        logging.warning(f"Embedding cache write failed: {e}")
+
+        return vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            total = hits + self._misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": (hits / total) if total else 0.0,
+            }
@@ -1,16 +1,24 @@
 from __future__ import annotations
 
 import os
+import re
 import json
+import hashlib
 import logging
+import threading
 from typing import Optional, List
 
 from pydantic import BaseModel
+from pydantic.json_schema import SkipJsonSchema
+
+from cache_store import SQLiteLRUCache
+from genai_client import get_genai_client, track_genai_request
+from resilience import call_with_resilience, stream_with_resilience, with_call_timeout
+from embedding_cache import CachedQueryEmbeddings
+from prompt_cache import PromptPrefixCache
 
 # Vector DB imports (for chat_with_contract RAG system)
 try:
-    from langchain_community.document_loaders import PyPDFLoader
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
     from langchain_google_genai import GoogleGenerativeAIEmbeddings
     from langchain_chroma import Chroma
     VECTOR_DB_AVAILABLE = True
@@ -20,6 +28,21 @@ except ImportError as e:
 
 DEMO_MODE = False
 
+# 분석 모델 및 프롬프트 버전 (프롬프트나 후처리를 수정하면 PROMPT_VERSION을 올려야 캐시가 갱신됩니다)
+ANALYSIS_MODEL = "gemini-2.5-pro"
+PROMPT_VERSION = "2026-10-17.7"
+
+# 분석 결과 캐시 설정 (동일 파일 재업로드 시 모델 호출 생략)
+ANALYSIS_CACHE_PATH = os.environ.get("ANALYSIS_CACHE_PATH", "./.cache/analysis_results.sqlite3")
+ANALYSIS_CACHE_MAX_ENTRIES = 500
+ANALYSIS_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# RAG 질문 임베딩 캐시 설정 (같은 질문은 원격 임베딩 호출 생략)
+EMBEDDING_MODEL = "models/embedding-001"
+QUERY_EMBEDDING_CACHE_PATH = os.environ.get("QUERY_EMBEDDING_CACHE_PATH", "./.cache/query_embeddings.sqlite3")
+QUERY_EMBEDDING_MEMORY_ENTRIES = 1024
+QUERY_EMBEDDING_DISK_ENTRIES = 20000
+
 CLEANING_RULES = """
 **[작업 1: 텍스트 추출 및 정제 (Text Cleaning)] - 중요!**
 계약서 이미지에서 텍스트를 추출할 때, 다음 '줄바꿈 처리 규칙'을 엄격하게 적용하여 문장을 자연스럽게 만드세요.
@@ -33,6 +56,15 @@ CLEANING_RULES = """
    - 표나 리스트 형태의 데이터는 구조가 깨지지 않도록 줄바꿈을 보존하세요.
 """
 
+# 연도별 최저시급 (원). 계약서에 연도가 없으면 가장 최근 연도 기준 (프롬프트/규칙 엔진 공통)
+MINIMUM_WAGE_BY_YEAR = {
+    2024: 9860,
+    2025: 10030,
+    2026: 10320,
+}
+MINIMUM_WAGE_YEAR = max(MINIMUM_WAGE_BY_YEAR)
+MINIMUM_WAGE = MINIMUM_WAGE_BY_YEAR[MINIMUM_WAGE_YEAR]
+
 # [백엔드 삽입용] 6대 법령 강행규정 위반 탐지 데이터셋
 # 이 리스트는 AI가 분석할 때 '정답지'로 참고합니다.
 MANDATORY_RISK_CLAUSES = [
@@ -60,10 +92,10 @@ MANDATORY_RISK_CLAUSES = [
     {
         "clause_id": "mandatory_wage_01",
         "category": "🚨 최저임금법 위반",
-        "risk_pattern": "시급 환산 시 법정 최저임금(2025년 10,030원)보다 낮음",
+        "risk_pattern": f"시급 환산 시 법정 최저임금({MINIMUM_WAGE_YEAR}년 {MINIMUM_WAGE:,}원)보다 낮음",
         "legal_reference": "최저임금법 제6조 (최저임금의 효력)",
-        "explanation": "2025년 최저시급은 10,030원입니다. 월급을 근무시간으로 나눴을 때 이보다 낮으면 형사처벌 대상입니다.",
-        "script": "계약서상 급여를 시급으로 환산하면 최저임금법에 미달합니다. 2025년 최저시급 10,030원 기준으로 재계산하여 계약서 수정을 요청합니다."
+        "explanation": f"{MINIMUM_WAGE_YEAR}년 최저시급은 {MINIMUM_WAGE:,}원입니다. 월급을 근무시간으로 나눴을 때 이보다 낮으면 형사처벌 대상입니다.",
+        "script": f"계약서상 급여를 시급으로 환산하면 최저임금법에 미달합니다. {MINIMUM_WAGE_YEAR}년 최저시급 {MINIMUM_WAGE:,}원 기준으로 재계산하여 계약서 수정을 요청합니다."
     },
 
     # 4. 근로기준법 제54조 (휴게시간 미부여) - 의무 위반
@@ -97,11 +129,24 @@ MANDATORY_RISK_CLAUSES = [
     }
 ]
 
+class Citation(BaseModel):
+    """위험 조항의 근거 법령 (data/ 코퍼스의 조문 또는 검색된 청크)."""
+    law_name: str
+    article: str = ""
+    title: str = ""
+    page: Optional[int] = None  # 법령 PDF 페이지 (1부터)
+    text: str
+
 class AnalysisItem(BaseModel):
     category: str
     original_text: str
     explanation: str
     script: str
+    # extracted_text 내 하이라이트 위치 [start, end) - 후처리에서 계산 (모델 출력값은 덮어씀)
+    start: Optional[int] = None
+    end: Optional[int] = None
+    # 근거 법령 - 후처리에서 RAG로 채움 (응답 스키마에서 빼서 모델이 출력 토큰을 쓰지 않게 함)
+    citations: SkipJsonSchema[list[Citation]] = []
 
 class ContractAnalysisResult(BaseModel):
     extracted_text: str
@@ -109,6 +154,93 @@ class ContractAnalysisResult(BaseModel):
     missing_clauses: list[str] = []
     summary: str
 
+class TextAnalysisResult(BaseModel):
+    """텍스트만 보내는 2단계 분석의 응답 (본문은 이미 있으므로 extracted_text를 다시 받지 않음)."""
+    # 규칙 검사 후보 중 모델이 실제 위반으로 확인한 번호 (1부터, 스트리밍에서 먼저 받도록 맨 앞)
+    confirmed_rule_candidates: list[int] = []
+    risk_clauses: list[AnalysisItem]
+    missing_clauses: list[str] = []
+    summary: str
+
+
+# ============================================================
+# 개인정보 비식별화 (모듈 로드 시 한 번 컴파일, 한 번의 스캔으로 처리)
+# ============================================================
+
+# 배치 처리 시 필드 구분자 (어떤 패턴에도 포함되지 않는 문자)
+_PII_FIELD_SEPARATOR = "\x00"
+
+# 각 패턴이 시작할 수 있는 첫 글자 (숫자/영문, 이름 라벨, 시·도 이름의 첫 글자).
+# 대부분의 위치를 이 검사 한 번으로 건너뛰어 alternation 전체를 시도하지 않게 합니다.
+_PII_FIRST_CHARS = "0-9a-zA-Z근성이대사서부인광울세경강충전제"
+
+_PII_PATTERN = re.compile(
+    rf"(?=[{_PII_FIRST_CHARS}])(?:" + "|".join([
+        # 1. 주민등록번호: 000000-0000000 -> 000000-*******
+        r"(?P<rrn>(?P<rrn_front>\d{6})-\d{7})",
+        # 2. 휴대전화: 010-0000-0000 -> 010-****-0000
+        r"(?P<mobile>(?P<mobile_prefix>010|011|016|017|018|019)-(?P<mobile_middle>\d{3,4})-(?P<mobile_last>\d{4}))",
+        # 지역번호: 02, 031 등 -> 0*-***-0000 형식
+        r"(?P<landline>(?P<landline_prefix>0\d{1,2})-(?P<landline_middle>\d{3,4})-(?P<landline_last>\d{4}))",
+        # 3. 이메일: example@domain.com -> e*****@domain.com
+        r"(?P<email>(?P<email_first>[a-zA-Z0-9])(?P<email_rest>[a-zA-Z0-9._%+-]{1,})@(?P<email_domain>[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}))",
+        # 4. 계좌번호: 1234-5678-9012-3456 -> ****-****-****-3456
+        r"(?P<account>(?P<account_1>\d{3,4})-(?P<account_2>\d{3,4})-(?P<account_3>\d{3,4})-(?P<account_4>\d{3,4}))",
+        # 5. 이름: "근로자:", "성명:", "이름:", "대표:" 등 뒤에 나오는 2-4자 한글 이름
+        r"(?P<name>(?P<name_label>근로자\s*[:：]\s*|성\s*명\s*[:：]\s*|이\s*름\s*[:：]\s*|대\s*표\s*[:：]\s*|사용자\s*[:：]\s*|성명\s*)"
+        r"(?P<name_value>[가-힣]{2,4})(?=\s|$|\(|\x00))",
+        # 6. 주소: "서울시 강남구 테헤란로 123, 4층" -> "서울시 강남구 ********"
+        r"(?P<address>(?P<address_city>서울|부산|대구|인천|광주|대전|울산|세종|경기|강원|충북|충남|전북|전남|경북|경남|제주)"
+        r"(?P<address_suffix>[시도])\s+(?P<address_district>[가-힣]+[시군구])\s+[가-힣0-9\s,.-]+)",
+    ]) + ")"
+)
+
+
+def _mask_rrn(m: re.Match) -> str:
+    return f"{m.group('rrn_front')}-*******"
+
+
+def _mask_mobile(m: re.Match) -> str:
+    return f"{m.group('mobile_prefix')}-{'*' * len(m.group('mobile_middle'))}-{m.group('mobile_last')}"
+
+
+def _mask_landline(m: re.Match) -> str:
+    prefix = m.group('landline_prefix')
+    return f"{prefix[:2]}{'*' * (len(prefix) - 2)}-{'*' * len(m.group('landline_middle'))}-{m.group('landline_last')}"
+
+
+def _mask_email(m: re.Match) -> str:
+    return f"{m.group('email_first')}{'*' * min(len(m.group('email_rest')), 5)}@{m.group('email_domain')}"
+
+
+def _mask_account(m: re.Match) -> str:
+    return f"{'*' * len(m.group('account_1'))}-{'*' * len(m.group('account_2'))}-{'*' * len(m.group('account_3'))}-{m.group('account_4')}"
+
+
+def _mask_name(m: re.Match) -> str:
+    name = m.group('name_value')
+    return f"{m.group('name_label')}{name[0]}{'*' * (len(name) - 1)}"
+
+
+def _mask_address(m: re.Match) -> str:
+    return f"{m.group('address_city')}{m.group('address_suffix')} {m.group('address_district')} ********"
+
+
+_PII_MASKERS = {
+    "rrn": _mask_rrn,
+    "mobile": _mask_mobile,
+    "landline": _mask_landline,
+    "email": _mask_email,
+    "account": _mask_account,
+    "name": _mask_name,
+    "address": _mask_address,
+}
+
+
+def _mask_pii_match(m: re.Match) -> str:
+    # lastgroup은 마지막으로 닫힌 그룹 = 매칭된 최상위 alternative 이름
+    return _PII_MASKERS[m.lastgroup](m)
+
 
 def anonymize_personal_info(text: str) -> str:
     """
@@ -122,82 +254,190 @@ def anonymize_personal_info(text: str) -> str:
     - 이름: 홍** (계약서 내 "근로자:", "성명:" 등 뒤에 나오는 한글 이름)
     - 주소: 상세 주소 마스킹
 
+    모든 패턴을 하나의 정규식으로 미리 컴파일해 두고, 텍스트를 한 번만 스캔하면서
+    매칭된 항목 종류에 맞는 마스킹 함수로 치환합니다.
+
     Args:
         text: 비식별화할 텍스트
 
     Returns:
         비식별화 처리된 텍스트
     """
-    import re
-
     if not text:
         return text
 
-    # 1. 주민등록번호 마스킹: 000000-0000000 -> 000000-*******
-    text = re.sub(
-        r'(\d{6})-(\d{7})',
-        r'\1-*******',
-        text
-    )
+    return _PII_PATTERN.sub(_mask_pii_match, text)
 
-    # 2. 전화번호 마스킹
-    # 010-0000-0000 -> 010-****-0000
-    text = re.sub(
-        r'(010|011|016|017|018|019)-(\d{3,4})-(\d{4})',
-        lambda m: f"{m.group(1)}-{'*' * len(m.group(2))}-{m.group(3)}",
-        text
-    )
 
-    # 02, 031 등 지역번호 -> 0*-***-0000 형식
-    text = re.sub(
-        r'(0\d{1,2})-(\d{3,4})-(\d{4})',
-        lambda m: f"{m.group(1)[:2]}{'*' * (len(m.group(1)) - 2)}-{'*' * len(m.group(2))}-{m.group(3)}",
-        text
-    )
+def anonymize_texts(texts: list[str]) -> list[str]:
+    """
+    여러 텍스트를 한 번의 정규식 스캔으로 비식별화합니다.
+    패턴이 필드 경계를 넘지 않도록 어떤 패턴에도 없는 구분자로 이어 붙입니다.
+    """
+    if any(_PII_FIELD_SEPARATOR in (text or "") for text in texts):
+        return [anonymize_personal_info(text) for text in texts]
 
-    # 3. 이메일 마스킹: example@domain.com -> ex***@domain.com
-    text = re.sub(
-        r'([a-zA-Z0-9])([a-zA-Z0-9._%+-]{1,})@([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})',
-        lambda m: f"{m.group(1)}{'*' * min(len(m.group(2)), 5)}@{m.group(3)}",
-        text
-    )
+    joined = _PII_FIELD_SEPARATOR.join(text or "" for text in texts)
+    masked = _PII_PATTERN.sub(_mask_pii_match, joined).split(_PII_FIELD_SEPARATOR)
+    return [masked_text if text else text for text, masked_text in zip(texts, masked)]
 
-    # 4. 계좌번호 마스킹 (10자리 이상 연속된 숫자, 단 전화번호나 주민번호가 아닌 경우)
-    # 하이픈으로 구분된 계좌번호: 1234-5678-9012-3456 -> ****-****-****-3456
-    text = re.sub(
-        r'(\d{3,4})-(\d{3,4})-(\d{3,4})-(\d{3,4})',
-        lambda m: f"{'*' * len(m.group(1))}-{'*' * len(m.group(2))}-{'*' * len(m.group(3))}-{m.group(4)}",
-        text
-    )
 
-    # 5. 이름 마스킹 (계약서 특정 키워드 뒤의 한글 이름)
-    # "근로자:", "성명:", "이름:", "대표:" 등 뒤에 나오는 2-4자 한글 이름
-    name_patterns = [
-        r'(근로자\s*[:：]\s*)([가-힣]{2,4})(?=\s|$|\()',
-        r'(성\s*명\s*[:：]\s*)([가-힣]{2,4})(?=\s|$|\()',
-        r'(이\s*름\s*[:：]\s*)([가-힣]{2,4})(?=\s|$|\()',
-        r'(대\s*표\s*[:：]\s*)([가-힣]{2,4})(?=\s|$|\()',
-        r'(사용자\s*[:：]\s*)([가-힣]{2,4})(?=\s|$|\()',
-        r'(성명\s*)([가-힣]{2,4})(?=\s|$|\()',
-    ]
+def anonymize_analysis_result(result: ContractAnalysisResult) -> ContractAnalysisResult:
+    """분석 결과의 extracted_text와 모든 risk_clause 필드를 한 번에 비식별화합니다."""
+    fields = [result.extracted_text]
+    for clause in result.risk_clauses:
+        fields.extend([clause.original_text, clause.explanation, clause.script])
 
-    for pattern in name_patterns:
-        text = re.sub(
-            pattern,
-            lambda m: f"{m.group(1)}{m.group(2)[0]}{'*' * (len(m.group(2)) - 1)}",
-            text
-        )
+    masked = anonymize_texts(fields)
+
+    result.extracted_text = masked[0]
+    for i, clause in enumerate(result.risk_clauses):
+        clause.original_text, clause.explanation, clause.script = masked[1 + i * 3: 4 + i * 3]
+    return result
+
+
+def apply_mandatory_rules(result: ContractAnalysisResult) -> ContractAnalysisResult:
+    """
+    MANDATORY_RISK_CLAUSES 로컬 규칙 엔진(risk_rules.py)을 extracted_text에 적용해
+    LLM 결과에 없는 위반 조항을 risk_clauses에 추가합니다.
+    """
+    from risk_rules import check_mandatory_rules, merge_rule_hits
+
+    try:
+        return merge_rule_hits(result, check_mandatory_rules(result.extracted_text))
+    except Exception as e:
+        logging.warning(f"Rule engine failed: {e}")
+        return result
+
+
+def align_risk_clauses(result: ContractAnalysisResult) -> ContractAnalysisResult:
+    """
+    각 risk_clause의 original_text를 extracted_text에 근사 정렬해 start/end를 채웁니다.
+    정렬에 실패한 항목은 None으로 남고, 렌더링 시 문자열 검색으로 대체됩니다.
+    """
+    from text_alignment import align_clauses
+
+    spans = align_clauses(result.extracted_text, [clause.original_text for clause in result.risk_clauses])
+    for clause, span in zip(result.risk_clauses, spans):
+        clause.start, clause.end = span if span else (None, None)
+    return result
+
+
+def generate_content_resilient(client, model: str, contents: list, config):
+    """
+    client.models.generate_content를 resilience 계층으로 감싸 호출합니다.
+    일시적 오류(429/5xx/타임아웃)는 지수 백오프로 재시도하고, 시도마다 남은 마감 시간을 요청 타임아웃으로 씁니다.
+    GEMINI_HEDGE_ENABLED이면 p95 지연을 넘긴 요청에 헤지 요청을 보냅니다.
+    """
+    def attempt(timeout: float):
+        with track_genai_request():
+            return client.models.generate_content(
+                model=model,
+                contents=contents,
+                config=with_call_timeout(config, timeout),
+            )
+
+    return call_with_resilience(attempt, name=model)
+
+
+def generate_content_stream_resilient(client, model: str, contents: list, config):
+    """
+    generate_content_stream용. 첫 응답 조각을 받기 전의 일시적 오류만 재시도합니다.
+    요청 집계(track_genai_request)는 스트림을 끝까지 읽거나 닫을 때까지 유지됩니다.
+    """
+    def open_stream(timeout: float):
+        with track_genai_request():
+            yield from client.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=with_call_timeout(config, timeout),
+            )
+
+    return stream_with_resilience(open_stream, name=f"{model}-stream")
+
+
+_analysis_cache: Optional[SQLiteLRUCache] = None
+_analysis_cache_failed = False
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> Optional[SQLiteLRUCache]:
+    """
+    프로세스 전역 분석 결과 캐시를 반환합니다.
+    캐시 파일을 열 수 없는 환경에서는 None을 반환하고 캐시 없이 동작합니다.
+    """
+    global _analysis_cache, _analysis_cache_failed
+
+    if _analysis_cache is not None or _analysis_cache_failed:
+        return _analysis_cache
+
+    with _analysis_cache_lock:
+        if _analysis_cache is None and not _analysis_cache_failed:
+            try:
+                _analysis_cache = SQLiteLRUCache(
+                    ANALYSIS_CACHE_PATH,
+                    max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+                    ttl_seconds=ANALYSIS_CACHE_TTL_SECONDS,
+                )
+            except Exception as e:
+                _analysis_cache_failed = True
+                logging.warning(f"Analysis cache disabled: {e}")
 
-    # 6. 주소 마스킹 (상세주소 부분을 마스킹)
-    # "서울시 강남구 테헤란로 123, 4층" -> "서울시 강남구 ********"
-    address_pattern = r'(서울|부산|대구|인천|광주|대전|울산|세종|경기|강원|충북|충남|전북|전남|경북|경남|제주)([시도])\s+([가-힣]+[시군구])\s+([가-힣0-9\s,.-]+)'
-    text = re.sub(
-        address_pattern,
-        lambda m: f"{m.group(1)}{m.group(2)} {m.group(3)} ********",
-        text
+    return _analysis_cache
+
+
+def build_analysis_cache_key(
+    file_data_list: list[tuple[bytes, str]],
+    model: str = ANALYSIS_MODEL,
+    prompt_version: str = PROMPT_VERSION,
+) -> str:
+    """
+    업로드 파일 해시(정렬), 프롬프트 버전, 모델명(분석/페이지 OCR)으로 캐시 키를 만듭니다.
+    파일 내용이 같으면 업로드 순서나 파일명이 달라도 같은 키가 나옵니다.
+    """
+    from page_ocr import OCR_MODEL, OCR_PROMPT_VERSION
+
+    file_hashes = sorted(hashlib.sha256(file_bytes).hexdigest() for file_bytes, _ in file_data_list)
+    payload = json.dumps(
+        {
+            "files": file_hashes,
+            "prompt_version": prompt_version,
+            "model": model,
+            "ocr_model": OCR_MODEL,
+            "ocr_prompt_version": OCR_PROMPT_VERSION,
+        },
+        sort_keys=True,
     )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached_analysis(cache_key: str) -> Optional[ContractAnalysisResult]:
+    """캐시된 분석 결과를 반환합니다. 없거나 읽을 수 없으면 None."""
+    cache = get_analysis_cache()
+    if cache is None:
+        return None
+
+    try:
+        raw_json = cache.get(cache_key)
+        if raw_json is None:
+            return None
+        return ContractAnalysisResult.model_validate_json(raw_json)
+    except Exception as e:
+        logging.warning(f"Analysis cache read failed: {e}")
+        cache.delete(cache_key)
+        return None
+
 
-    return text
+def store_cached_analysis(cache_key: str, result: ContractAnalysisResult) -> None:
+    """분석 결과를 캐시에 저장합니다. 실패해도 분석 흐름에는 영향을 주지 않습니다."""
+    cache = get_analysis_cache()
+    if cache is None:
+        return
+
+    try:
+        cache.set(cache_key, result.model_dump_json())
+    except Exception as e:
+        logging.warning(f"Analysis cache write failed: {e}")
 
 
 def get_demo_result() -> ContractAnalysisResult:
@@ -273,32 +513,16 @@ def get_demo_result() -> ContractAnalysisResult:
     )
 
 
-def analyze_contract_image(image_bytes: bytes, mime_type: str = "image/jpeg") -> Optional[ContractAnalysisResult]:
-    """
-    Analyze a contract image using Gemini Vision to:
-    1. Extract full text from the contract (OCR)
-    2. Identify risky clauses with exact text for highlighting
-    """
-
-    if DEMO_MODE:
-        return get_demo_result()
-
-    from google import genai
-    from google.genai import types
-
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        raise EnvironmentError("GEMINI_API_KEY 환경 변수가 설정되지 않았습니다.")
-
-    client = genai.Client(api_key=api_key)
-
+def _format_analysis_system_prompt() -> str:
+    """분석 시스템 프롬프트 (이미지/텍스트 요청 공통, 요청마다 같은 내용이므로 모듈 로드 시 한 번만 만듦)."""
     # 강행규정 데이터셋을 문자열로 포맷팅
     mandatory_ref = "\n".join([
         f"{i+1}. {clause['legal_reference']} - {clause['risk_pattern']}"
         for i, clause in enumerate(MANDATORY_RISK_CLAUSES)
     ])
+    minimum_wages = " / ".join(f"{year}년 최저시급: {wage:,}원" for year, wage in sorted(MINIMUM_WAGE_BY_YEAR.items()))
 
-    system_prompt = f"""
+    return f"""
 당신은 사회초년생을 위한 '친절하고 꼼꼼한 AI 법률 멘토, 하이라이터 💡'입니다.
 법을 잘 모르는 사용자도 쉽게 이해할 수 있도록, 전문 용어는 정확히 쓰되 설명은 **'해요체(~해요)'**로 부드럽게 풀어서 해주세요.
 
@@ -329,7 +553,7 @@ def analyze_contract_image(image_bytes: bytes, mime_type: str = "image/jpeg") ->
 
 1. **최저임금 위반 ⚠️**
    - 계약서에 명시된 (월급 ÷ 총 근무시간)을 계산해주세요
-   - 2024년 최저시급: 9,860원 / 2025년 최저시급: 10,030원
+   - {minimum_wages} (계약서에 연도가 없으면 {MINIMUM_WAGE_YEAR}년 기준)
    - 계산 결과가 최저시급보다 낮으면 **명백한 법 위반**이에요
 
 2. **수습기간 악용 ⚠️**
@@ -394,8 +618,8 @@ def analyze_contract_image(image_bytes: bytes, mime_type: str = "image/jpeg") ->
   예시:
   - 계약서: "월급 150만원 (주 40시간, 월 4주)"
   - 계산: 150만원 ÷ 160시간 = 9,375원/시간
-  - 법률: 2025년 최저시급 10,030원
-  - 결론: 🚨 명백한 최저임금법 위반이에요! (655원 부족해요)
+  - 법률: {MINIMUM_WAGE_YEAR}년 최저시급 {MINIMUM_WAGE:,}원
+  - 결론: 🚨 명백한 최저임금법 위반이에요! ({MINIMUM_WAGE - 9375:,}원 부족해요)
 
 분석 시 추가 확인 사항:
 1. 근로시간 및 휴게시간 (근로기준법 제50조, 제54조)
@@ -430,364 +654,181 @@ def analyze_contract_image(image_bytes: bytes, mime_type: str = "image/jpeg") ->
 
 응답은 반드시 한국어로 작성하고, 모든 설명은 **해요체**로 친근하게 작성해주세요."""
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=[
-                types.Part.from_bytes(
-                    data=image_bytes,
-                    mime_type=mime_type,
-                ),
-                system_prompt + "\n\n위 계약서 이미지를 분석해주세요.",
-            ],
-            config=types.GenerateContentConfig(
-                temperature=0.0,  # 일관성 있는 법률 분석을 위해 창의성 제한
-                response_mime_type="application/json",
-                response_schema=ContractAnalysisResult,
-            ),
-        )
 
-        raw_json = response.text
-        logging.info(f"Gemini response: {raw_json}")
+ANALYSIS_SYSTEM_PROMPT = _format_analysis_system_prompt()
+# 고정 프롬프트는 Gemini 컨텍스트 캐시에 한 번 올려두고 요청에는 이미지/본문만 보냄
+_analysis_prompt_cache = PromptPrefixCache(ANALYSIS_MODEL, ANALYSIS_SYSTEM_PROMPT)
 
-        if raw_json:
-            data = json.loads(raw_json)
-            result = ContractAnalysisResult(**data)
 
-            # 개인정보 비식별화 처리
-            result.extracted_text = anonymize_personal_info(result.extracted_text)
-            for clause in result.risk_clauses:
-                clause.original_text = anonymize_personal_info(clause.original_text)
-                clause.explanation = anonymize_personal_info(clause.explanation)
-                clause.script = anonymize_personal_info(clause.script)
+def get_prompt_cache_stats() -> dict:
+    """시스템 프롬프트 컨텍스트 캐시 통계 (생성/연장/적중/대체 횟수)."""
+    return _analysis_prompt_cache.stats()
 
-            return result
-        else:
-            return None
-
-    except Exception as e:
-        logging.error(f"Contract analysis failed: {e}")
-        raise Exception(f"계약서 분석 중 오류가 발생했습니다: {e}")
 
+def _is_prompt_cache_error(error: Exception) -> bool:
+    """캐시가 서버에서 지워졌거나 만료되어 요청이 실패한 경우."""
+    message = str(error).lower()
+    return "cachedcontent" in message or "cached content" in message
 
-def analyze_contract_images(image_data_list: list[tuple[bytes, str]]) -> Optional[ContractAnalysisResult]:
-    """
-    Analyze multiple contract images using Gemini Vision.
-    Combines all pages into a single analysis.
-
-    Args:
-        image_data_list: List of (image_bytes, mime_type) tuples
-    """
 
-    if DEMO_MODE:
-        return get_demo_result()
+def invalidate_prompt_cache_on_error(config, error: Exception) -> None:
+    """프롬프트 캐시를 쓴 요청이 캐시 문제로 실패했으면 다음 요청에서 새로 만들도록 버립니다."""
+    if config is not None and config.cached_content and _is_prompt_cache_error(error):
+        _analysis_prompt_cache.invalidate()
 
-    if len(image_data_list) == 1:
-        return analyze_contract_image(image_data_list[0][0], image_data_list[0][1])
 
-    from google import genai
+def _analysis_config(response_schema, client=None):
+    """
+    분석 요청 공통 설정. client가 주어지고 컨텍스트 캐시를 쓸 수 있으면 시스템 프롬프트 대신
+    캐시 이름(cached_content)을 넣고, 아니면 같은 프롬프트를 system_instruction으로 보냅니다.
+    """
     from google.genai import types
 
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        raise EnvironmentError("GEMINI_API_KEY 환경 변수가 설정되지 않았습니다.")
-
-    client = genai.Client(api_key=api_key)
-
-    # 강행규정 데이터셋을 문자열로 포맷팅
-    mandatory_ref = "\n".join([
-        f"{i+1}. {clause['legal_reference']} - {clause['risk_pattern']}"
-        for i, clause in enumerate(MANDATORY_RISK_CLAUSES)
-    ])
-
-    system_prompt = f"""
-당신은 사회초년생을 위한 '친절하고 꼼꼼한 AI 법률 멘토, 하이라이터 💡'입니다.
-법을 잘 모르는 사용자도 쉽게 이해할 수 있도록, 전문 용어는 정확히 쓰되 설명은 **'해요체(~해요)'**로 부드럽게 풀어서 해주세요.
-
----
-{CLEANING_RULES}
-
----
-
-**[톤앤매너 (Tone & Manner) 가이드] - 중요!**
-1. **말투:** 딱딱한 "~다", "~함" 대신 **"~해요", "~인데요", "~것 같아요"** 같은 부드러운 구어체를 사용하세요.
-2. **공감:** 사용자의 불안한 마음을 먼저 다독여주세요. (예: "이 조항은 조금 위험해 보이네요 😢", "걱정 마세요, 법적으로 무효예요! 🛡️")
-3. **가독성:** 줄글로 길게 쓰지 말고, 이모지(🚨, ✅, 💡, 🗣️)를 적극 활용해서 눈에 쏙 들어오게 작성하세요.
-
----
-
-**🎯 [필독] 강행규정 절대 기준 데이터셋**
-아래 6대 법령 강행규정을 '정답지'로 삼아 계약서를 분석해주세요.
-이 항목들은 어떤 경우에도 위반되어서는 안 되는 **절대적 기준**이에요:
-
-{mandatory_ref}
-
-**[작업 2: 핵심 위험 조항 정밀 진단]**
-정제된 텍스트를 바탕으로, 아래 '강행규정 위반 리스트'와 대조하여 불법/독소 조항을 찾아내주세요.
-(여러 장의 이미지가 제공된 경우, 모든 페이지를 통합하여 분석해주세요.)
-
-🚨 **[Critical Check List - 최우선 검증 항목]**
-(코드 내 MANDATORY_RISK_CLAUSES 리스트를 참고하여, 이와 유사한 패턴이 보이면 즉시 '🚨' 경고를 띄워주세요)
-반드시 아래 항목을 먼저 확인하고, 해당 사항이 있으면 **"high" 위험도**로 분류해주세요:
-
-1. **최저임금 위반 ⚠️**
-   - 계약서에 명시된 (월급 ÷ 총 근무시간)을 계산해주세요
-   - 2024년 최저시급: 9,860원 / 2025년 최저시급: 10,030원
-   - 계산 결과가 최저시급보다 낮으면 **명백한 법 위반**이에요
-
-2. **수습기간 악용 ⚠️**
-   - 계약 기간이 1년 미만인데 수습기간 급여 감액(예: 90% 지급)이 있는지 확인해주세요
-   - 1년 미만 계약에서 수습기간 급여 감액은 **불법**이에요
-
-3. **퇴직금 미지급 조항 ⚠️**
-   - "퇴직금은 월급에 포함", "퇴직금 없음", "퇴직금 지급 안 함" 같은 문구가 있는지 확인해주세요
-   - 이러한 조항은 근로자퇴직급여보장법 위반이에요
-
-4. **위약금/손해배상 예정 ⚠️**
-   - "지각 시 벌금 N원", "조기 퇴사 시 손해배상 N원", "위약금 청구" 등의 문구가 있는지 확인해주세요
-   - 근로기준법 제20조(위약 예정의 금지)에 명백히 위반돼요
-
-5. **부당 해고 조항 ⚠️**
-   - "사장 재량으로 즉시 해고 가능", "통보 없이 해고", "정당한 사유 없이 해고 가능" 등의 문구 확인해주세요
-   - 근로기준법 제23조(해고 등의 제한) 위반이에요
-
-6. **독소 조항 탐지 (가스라이팅/불공정 조항) 🔥**
-   - "을은 갑의 지시에 무조건 따른다" → 노예 계약 유형이에요, 근로자의 자율성을 침해해요
-   - "민/형사상 이의를 제기하지 않는다" → 법적 권리 포기를 강요하는 무효 조항이에요
-   - "휴게시간은 손님이 없을 때 알아서 쉰다" → 근로기준법 제54조(휴게시간 보장) 위반이에요
-   - "수습 기간에는 4대 보험 가입 안 함" → 허위 사실이에요, 고용보험법 위반이에요
-   - 위 문구나 유사한 뉘앙스 발견 시 **"⚠️ 가스라이팅/불공정 조항"**으로 즉시 경고해주세요
-
-7. **하도급법 위반 (무한 수정 요구) ⚠️**
-   - "횟수 제한 없이 무상 수정", "갑이 만족할 때까지 수정", "무제한 재작업" 등의 문구 확인해주세요
-   - 하도급거래 공정화에 관한 법률 제3조의4(부당한 특약 금지) 위반이에요
-   - 통상적으로 "무상 수정 2회, 이후 유상" 같은 명확한 기준이 필요해요
-
-**[작업 3: 필수 조항 누락 탐지]**
-계약서에 다음 '표준근로계약서 필수 항목'이 포함되어 있는지 확인해주세요:
-
-📋 **[필수 확인 항목]**
-1. **업무의 내용 및 장소**
-   - 구체적인 업무 내용이나 근무 장소가 명시되어 있는지 확인해주세요
+    cached_content = _analysis_prompt_cache.get(client) if client is not None else None
+    return types.GenerateContentConfig(
+        temperature=0.0,  # 일관성 있는 법률 분석을 위해 창의성 제한
+        response_mime_type="application/json",
+        response_schema=response_schema,
+        # 캐시가 없을 때도 고정 프롬프트를 앞(system_instruction)에 두어 암시적 캐시 적중을 노림
+        cached_content=cached_content,
+        system_instruction=None if cached_content else ANALYSIS_SYSTEM_PROMPT,
+    )
 
-2. **근로시간 및 휴게시간**
-   - 시작 시간, 종료 시간, 휴게시간이 명확하게 기재되어 있는지 확인해주세요
 
-3. **휴일 및 휴가**
-   - 특히 '연차 유급휴가' 관련 내용이 언급되어 있는지 확인해주세요
-   - 주휴일, 공휴일 등도 확인해주세요
+def _build_image_request(image_bytes: bytes, mime_type: str, client=None) -> tuple[list, object]:
+    """단일 계약서 이미지(전처리 완료) 분석 요청의 (contents, config)를 만듭니다."""
+    from google.genai import types
 
-4. **임금 구성 항목 및 계산 방법**
-   - 기본급, 수당, 지급일, 지급 방법이 명시되어 있는지 확인해주세요
+    contents = [
+        types.Part.from_bytes(
+            data=bytes(image_bytes),
+            mime_type=mime_type,
+        ),
+        "위 계약서 이미지를 분석해주세요.",
+    ]
+    return contents, _analysis_config(ContractAnalysisResult, client)
 
-5. **사회보험(4대 보험) 가입 여부**
-   - 국민연금, 건강보험, 고용보험, 산재보험 가입에 대한 언급이 있는지 확인해주세요
 
-위 항목 중 **전혀 언급이 없는** 항목이 있다면, `missing_clauses` 리스트에 다음 형식으로 추가해주세요:
-- "업무 내용 및 장소 미기재"
-- "휴게시간 미명시"
-- "연차 유급휴가 조항 없음"
-- "임금 계산 방법 미기재"
-- "4대 보험 관련 조항 없음"
+TEXT_ANALYSIS_INSTRUCTION = """아래 계약서 텍스트(페이지별로 추출해 이어 붙인 원문)를 분석해주세요.
+- 본문은 이미 추출되어 있으므로 extracted_text는 다시 쓰지 말고 risk_clauses, missing_clauses, summary만 작성해주세요
+- original_text는 반드시 아래 계약서 텍스트에 포함된 정확한 문장이어야 해요 (하이라이트 표시에 사용)
+- [N페이지 텍스트를 읽지 못했어요] 표시가 있으면 해당 페이지는 없는 것으로 보고 분석해주세요"""
 
-🎯 **[출력 스타일 가이드 - 반드시 준수]**
-- ❌ 금지: "불법 소지가 있습니다", "문제가 될 수 있습니다" 같은 애매한 표현
-- ✅ 필수: 위반 사항 발견 시 **"🚨 명백한 근로기준법 위반이에요!"** 같은 단호하면서도 친근한 표현 사용
-- ✅ 비교 형식: 반드시 **[계약서 원문] vs [관련 법률/팩트]** 형태로 대조해서 설명
-  예시:
-  - 계약서: "월급 150만원 (주 40시간, 월 4주)"
-  - 계산: 150만원 ÷ 160시간 = 9,375원/시간
-  - 법률: 2025년 최저시급 10,030원
-  - 결론: 🚨 명백한 최저임금법 위반이에요! (655원 부족해요)
 
-분석 시 추가 확인 사항:
-1. 근로시간 및 휴게시간 (근로기준법 제50조, 제54조)
-2. 임금 및 수당 (근로기준법 제43조, 제56조)
-3. 해고 예고 (근로기준법 제26조)
-4. 연차휴가 (근로기준법 제60조)
-5. 기타 불리하거나 누락된 조항
+def _build_text_request(contract_text: str, client=None, rule_hits: Optional[list[AnalysisItem]] = None) -> tuple[list, object]:
+    """
+    페이지별로 추출해 이어 붙인 계약서 텍스트의 위험 조항 분석 요청 (contents, config).
+    이미지 분석과 같은 시스템 프롬프트/설정을 쓰고, 응답 스키마만 본문을 뺀 TextAnalysisResult입니다.
 
-**🎨 [출력 형식 (JSON)]**
-반드시 아래 JSON 포맷으로 출력해주세요:
+    rule_hits(규칙 엔진이 먼저 찾은 조항)는 확정이 아닌 후보로 번호를 붙여 보내고, 모델이 문맥상 위반이 맞는
+    번호만 confirmed_rule_candidates로 돌려줍니다 (확인된 후보만 후처리에서 결과에 합쳐짐).
+    """
+    prompt = TEXT_ANALYSIS_INSTRUCTION
+    if rule_hits:
+        candidates = "\n".join(f"{number}. [{hit.category}] {hit.original_text}" for number, hit in enumerate(rule_hits, 1))
+        prompt += (
+            "\n\n규칙 검사가 찾은 강행규정 위반 후보예요. 부정문(\"부과하지 않는다\")이나 적법한 조건(\"2회까지 무상, 이후 유상\")처럼 "
+            "문맥상 위반이 아닌 후보는 빼고, 위반이 맞는 후보 번호만 confirmed_rule_candidates에 넣어주세요. "
+            f"확인한 후보는 결과에 자동으로 포함되니 risk_clauses에 다시 쓰지 말아주세요:\n{candidates}"
+        )
+    contents = [prompt + f"\n\n계약서 텍스트:\n{contract_text}"]
+    return contents, _analysis_config(TextAnalysisResult, client)
 
-{{
-    "extracted_text": "줄바꿈이 교정된 계약서 원문",
-    "risk_clauses": [
-        {{
-            "category": "🚨 위반 항목 제목 (예: 퇴직금 미지급 조항)",
-            "original_text": "문제가 된 계약서 문구 (하이라이트용 - extracted_text에 포함된 정확한 문장)",
-            "explanation": "이게 왜 문제인지 친구에게 설명하듯이 쉽고 친절하게 작성 (해요체 필수! 법적 근거도 자연스럽게 포함)",
-            "script": "사장님께 보낼 정중하지만 단호한 요청 메시지 (그대로 복사해서 쓸 수 있게)"
-        }}
-    ],
-    "missing_clauses": ["연차 유급휴가 조항 없음", "4대 보험 관련 조항 없음"],
-    "summary": "전체적인 총평 (예: '전반적으로 괜찮지만, 3조는 꼭 짚고 넘어가야 해요! 꼼꼼히 챙겨서 손해보지 말자고요 💪')"
-}}
 
-**중요:**
-- original_text는 반드시 extracted_text에 포함된 정확한 문장이어야 해요 (하이라이트 표시에 사용)
-- category는 이모지를 포함한 간결한 제목으로 (🚨 위험, ⚠️ 주의, 💡 참고)
-- explanation은 법적 근거를 포함하되 친구에게 설명하듯 자연스럽게 작성
-- script는 실제로 사용할 수 있는 정중하고 명확한 요청 문구로
-- summary는 공감과 응원이 담긴 친근한 총평으로
+def extract_contract_text(file_data_list: list[tuple[bytes, str]]) -> str:
+    """
+    1단계: 모든 페이지에서 텍스트를 병렬로 추출해 이어 붙입니다 (페이지 해시별 캐시).
+    모든 페이지가 실패하면 예외를 발생시킵니다.
+    """
+    from page_ocr import extract_pages, stitch_pages
 
-응답은 반드시 한국어로 작성하고, 모든 설명은 **해요체**로 친근하게 작성해주세요."""
+    pages = extract_pages(file_data_list)
+    if pages and all(page.error is not None for page in pages):
+        raise Exception(f"계약서 페이지를 읽지 못했어요: {pages[0].error}")
+    return stitch_pages(pages)
 
-    try:
-        contents = []
-        for idx, (image_bytes, mime_type) in enumerate(image_data_list):
-            contents.append(
-                types.Part.from_bytes(
-                    data=image_bytes,
-                    mime_type=mime_type,
-                )
-            )
 
-        contents.append(system_prompt + f"\n\n위 {len(image_data_list)}장의 계약서 이미지를 분석해주세요.")
+def _is_single_image(file_data_list: list[tuple[bytes, str]]) -> bool:
+    """이미지 한 장이면 한 번의 멀티모달 요청으로, 그 외(PDF, 여러 장)는 페이지별 파이프라인으로 분석합니다."""
+    return len(file_data_list) == 1 and file_data_list[0][1] != 'application/pdf'
 
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=contents,
-            config=types.GenerateContentConfig(
-                temperature=0.0,  # 일관성 있는 법률 분석을 위해 창의성 제한
-                response_mime_type="application/json",
-                response_schema=ContractAnalysisResult,
-            ),
-        )
 
-        raw_json = response.text
-        logging.info(f"Gemini response: {raw_json}")
+def _prepare_streamed_clause(data: dict, extracted_text: Optional[str], index) -> AnalysisItem:
+    """스트리밍 중 완성된 risk_clause 하나를 비식별화하고, 본문이 있으면 위치를 정렬합니다."""
+    from text_alignment import align_clause
 
-        if raw_json:
-            data = json.loads(raw_json)
-            result = ContractAnalysisResult(**data)
+    clause = AnalysisItem(**data)
+    clause.original_text, clause.explanation, clause.script = anonymize_texts(
+        [clause.original_text, clause.explanation, clause.script]
+    )
+    if extracted_text:
+        span = align_clause(extracted_text, clause.original_text, index=index)
+        clause.start, clause.end = span if span else (None, None)
+    return clause
 
-            # 개인정보 비식별화 처리
-            result.extracted_text = anonymize_personal_info(result.extracted_text)
-            for clause in result.risk_clauses:
-                clause.original_text = anonymize_personal_info(clause.original_text)
-                clause.explanation = anonymize_personal_info(clause.explanation)
-                clause.script = anonymize_personal_info(clause.script)
 
-            return result
-        else:
-            return None
+def analyze_contract_files(file_data_list: list[tuple[bytes, str]], use_cache: bool = True) -> Optional[ContractAnalysisResult]:
+    """
+    Analyze contract files (images or PDFs) using Gemini.
 
-    except Exception as e:
-        logging.error(f"Contract analysis failed: {e}")
-        raise Exception(f"계약서 분석 중 오류가 발생했습니다: {e}")
+    analysis_pipeline의 단계(ingest → preprocess → extract → rule_check → llm → anonymize
+    → post_process → store)를 거칩니다. 본문을 먼저 추출하는 입력은 모델 호출 전에 규칙 엔진으로
+    검사하고, 모델 호출이 실패하면 규칙 엔진 결과만으로 답합니다. 이미지 한 장은 한 번의 멀티모달 요청으로,
+    PDF/여러 장은 페이지별 텍스트를 병렬로 추출한 뒤 텍스트 요청으로 분석합니다.
 
+    동일한 파일 묶음을 다시 분석하면 모델 호출 없이 캐시된 결과를 반환합니다.
+    (키: 정렬된 파일 SHA-256 + PROMPT_VERSION + ANALYSIS_MODEL)
 
-def analyze_contract_files(file_data_list: list[tuple[bytes, str]]) -> Optional[ContractAnalysisResult]:
-    """
-    Analyze contract files (images or PDFs) using Gemini.
-    PDFs are sent directly to Gemini without conversion.
-    
     Args:
         file_data_list: List of (file_bytes, mime_type) tuples
                        mime_type can be 'image/jpeg', 'image/png', or 'application/pdf'
+        use_cache: False이면 캐시를 건너뛰고 항상 새로 분석
     """
-    
-    if DEMO_MODE:
-        return get_demo_result()
-    
-    if len(file_data_list) == 1 and file_data_list[0][1] != 'application/pdf':
-        return analyze_contract_image(file_data_list[0][0], file_data_list[0][1])
-    
-    from google import genai
-    from google.genai import types
-    
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        raise EnvironmentError("GEMINI_API_KEY 환경 변수가 설정되지 않았습니다.")
-    
-    client = genai.Client(api_key=api_key)
-    
-    system_prompt = """당신은 한국 근로기준법 전문가이자 계약서 분석 AI입니다.
+    from analysis_pipeline import AnalysisContext, get_analysis_pipeline
 
-**작업 1: 텍스트 추출 (OCR)**
-제공된 계약서 파일(이미지 또는 PDF)에서 텍스트를 정확히 추출하세요.
-원본 형식(줄바꿈, 번호 등)을 최대한 유지하세요.
+    return get_analysis_pipeline().run(AnalysisContext(file_data_list, use_cache=use_cache))
 
-**작업 2: 위험 조항 분석**
-추출된 텍스트에서 근로자에게 불리한 조항을 찾으세요.
 
-분석 시 확인 사항:
-1. 근로시간 및 휴게시간 (근로기준법 제50조, 제54조)
-2. 임금 및 수당 (근로기준법 제43조, 제56조)
-3. 해고 예고 (근로기준법 제26조)
-4. 연차휴가 (근로기준법 제60조)
-5. 기타 불리하거나 누락된 조항
-
-**🎨 [출력 형식 (JSON)]**
-반드시 아래 JSON 포맷으로 출력하세요:
-
-{{
-    "extracted_text": "줄바꿈이 교정된 계약서 원문",
-    "risk_clauses": [
-        {{
-            "category": "🚨 위반 항목 제목 (예: 퇴직금 미지급 조항)",
-            "original_text": "문제가 된 계약서 문구 (하이라이트용 - extracted_text에 포함된 정확한 문장)",
-            "explanation": "이게 왜 문제인지 친구에게 설명하듯이 쉽고 친절하게 작성 (해요체 필수! 법적 근거도 자연스럽게 포함)",
-            "script": "사장님께 보낼 정중하지만 단호한 요청 메시지 (그대로 복사해서 쓸 수 있게)"
-        }}
-    ],
-    "missing_clauses": ["연차 유급휴가 조항 없음", "4대 보험 관련 조항 없음"],
-    "summary": "전체적인 총평 (예: '전반적으로 괜찮지만, 3조는 꼭 짚고 넘어가야 해요! 꼼꼼히 챙겨서 손해보지 말자고요 💪')"
-}}
-
-**중요:**
-- original_text는 반드시 extracted_text에 포함된 정확한 문장이어야 합니다 (하이라이트 표시에 사용)
-- category는 이모지를 포함한 간결한 제목으로 (🚨 위험, ⚠️ 주의, 💡 참고)
-- explanation은 법적 근거를 포함하되 친구에게 설명하듯 자연스럽게 작성
-- script는 실제로 사용할 수 있는 정중하고 명확한 요청 문구로
-- summary는 공감과 응원이 담긴 친근한 총평으로
-
-응답은 반드시 한국어로 작성하세요."""
+def analyze_contract_image(image_bytes: bytes, mime_type: str = "image/jpeg", use_cache: bool = True) -> Optional[ContractAnalysisResult]:
+    """
+    Analyze a contract image using Gemini Vision to:
+    1. Extract full text from the contract (OCR)
+    2. Identify risky clauses with exact text for highlighting
+    """
+    return analyze_contract_files([(image_bytes, mime_type)], use_cache=use_cache)
 
-    try:
-        contents = []
-        for idx, (file_bytes, mime_type) in enumerate(file_data_list):
-            contents.append(
-                types.Part.from_bytes(
-                    data=file_bytes,
-                    mime_type=mime_type,
-                )
-            )
-        
-        file_count = len(file_data_list)
-        contents.append(system_prompt + f"\n\n위 {file_count}개의 계약서 파일을 분석해주세요.")
-
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=contents,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=ContractAnalysisResult,
-            ),
-        )
 
-        raw_json = response.text
-        logging.info(f"Gemini response: {raw_json}")
+def analyze_contract_images(image_data_list: list[tuple[bytes, str]], use_cache: bool = True) -> Optional[ContractAnalysisResult]:
+    """
+    Analyze multiple contract images using Gemini Vision.
+    Pages are OCR'd in parallel, then analyzed together as one text.
 
-        if raw_json:
-            data = json.loads(raw_json)
-            result = ContractAnalysisResult(**data)
+    Args:
+        image_data_list: List of (image_bytes, mime_type) tuples
+    """
+    return analyze_contract_files(image_data_list, use_cache=use_cache)
 
-            # 개인정보 비식별화 처리
-            result.extracted_text = anonymize_personal_info(result.extracted_text)
-            for clause in result.risk_clauses:
-                clause.original_text = anonymize_personal_info(clause.original_text)
-                clause.explanation = anonymize_personal_info(clause.explanation)
-                clause.script = anonymize_personal_info(clause.script)
 
-            return result
-        else:
-            return None
+def stream_contract_analysis(file_data_list: list[tuple[bytes, str]], use_cache: bool = True, progress=None):
+    """
+    analyze_contract_files의 스트리밍 버전 (같은 파이프라인, 모델 응답만 스트리밍으로 받음).
+    generate_content_stream 응답을 IncrementalJSONParser로 읽으면서, 완성되는 대로 이벤트를 내보냅니다.
+    여러 페이지는 페이지별 텍스트 추출이 끝나는 즉시 본문을 먼저 내보내고, 텍스트 분석만 스트리밍합니다.
+
+    Yields:
+        ("extracted_text", str): 비식별화된 계약서 본문 (하이라이트 렌더링 시작 가능)
+        ("risk_clause", AnalysisItem): 완성된 위험 조항 하나 (비식별화 + 위치 정렬 완료)
+        ("result", ContractAnalysisResult): 후처리까지 끝난 최종 결과 (마지막 이벤트)
+
+    캐시에 결과가 있으면 모델 호출 없이 같은 순서로 바로 내보냅니다.
+    progress(phase(name) 메서드가 있는 객체, analysis_jobs의 _JobProgress)가 주어지면
+    upload -> ocr -> rule_match -> llm -> post_process 단계를 실제로 진입하는 시점에 알립니다
+    (단계 이름은 analysis_progress.PHASES, 이미지 한 장은 규칙 검사를 llm 안에서 하므로 rule_match가 없음).
+    """
+    from analysis_pipeline import AnalysisContext, get_analysis_pipeline
 
-    except Exception as e:
-        logging.error(f"Contract analysis failed: {e}")
-        raise Exception(f"계약서 분석 중 오류가 발생했습니다: {e}")
+    context = AnalysisContext(file_data_list, use_cache=use_cache, progress=progress, stream=True)
+    yield from get_analysis_pipeline().stream(context)
 
 
 def get_risk_color(category: str) -> str:
@@ -832,6 +873,68 @@ def get_risk_label(category: str) -> str:
     return "주의"
 
 
+def find_highlight_spans(contract_text: str, patterns: list[str]) -> list[tuple[int, int, str]]:
+    """
+    여러 문구의 (start, end, pattern) 구간을 시작 위치 순으로 반환합니다 (구간끼리 겹치거나 포함될 수 있음).
+
+    - 모든 문구를 하나의 정규식 alternation으로 컴파일해 한 번에 스캔 (같은 위치에서는 긴 문구 우선)
+    - 스캔에서 못 찾은 문구는 다른 매치에 가려진 것이므로(그 매치 안에서 시작), 매치 구간에서만 다시 찾음
+      (본문 전체를 다시 뒤지지 않으므로 OCR 결과에 없는 문구가 많아도 비용은 매치된 길이에 비례)
+    - 각 문구는 첫 번째 등장 위치만 사용
+    - 원문(이스케이프 전) 기준으로 찾으므로 삽입된 HTML 안에서 잘못 매칭되지 않음
+    """
+    unique_patterns = sorted({p for p in patterns if p}, key=len, reverse=True)
+    if not contract_text or not unique_patterns:
+        return []
+
+    matcher = re.compile("|".join(re.escape(p) for p in unique_patterns))
+
+    found: dict[str, int] = {}
+    matched: list[tuple[int, int, str]] = []
+    for match in matcher.finditer(contract_text):
+        pattern = match.group(0)
+        matched.append((match.start(), match.end(), pattern))
+        if pattern not in found:
+            found[pattern] = match.start()
+            if len(found) == len(unique_patterns):
+                break
+
+    def can_hide(outer: str, pattern: str) -> bool:
+        # outer 매치 안에 포함되거나, outer의 뒷부분에서 시작해 뒤로 걸칠 수 있는지 (문구끼리만 비교)
+        return pattern in outer or any(
+            pattern.startswith(outer[i:]) for i in range(max(1, len(outer) - len(pattern) + 1), len(outer))
+        )
+
+    for pattern in unique_patterns:
+        if pattern in found:
+            continue
+        hiders = {outer for outer in found if can_hide(outer, pattern)}
+        for start, end, outer in matched:
+            if outer not in hiders:
+                continue
+            hidden = contract_text.find(pattern, start, end + len(pattern) - 1)
+            if hidden >= 0:
+                found[pattern] = hidden
+                break
+
+    return sorted(((start, start + len(pattern), pattern) for pattern, start in found.items()), key=lambda span: (span[0], -len(span[2])))
+
+
+def format_citations_html(citations: list[Citation]) -> str:
+    """근거 법령 목록 HTML (없으면 빈 문자열). 조문 전문은 마우스를 올리면 보입니다."""
+    import html
+
+    lines = []
+    for citation in citations:
+        label = " ".join(filter(None, [citation.law_name, citation.article]))
+        if citation.title:
+            label += f" ({citation.title})"
+        if citation.page is not None:
+            label += f" · {citation.page}쪽"
+        lines.append(f'<div class="modal-legal-ref" title="{html.escape(citation.text)}">⚖️ {html.escape(label)}</div>')
+    return "".join(lines)
+
+
 def highlight_text_with_risks(contract_text: str, analysis: list[AnalysisItem]) -> str:
     """
     Apply inline highlights with hover tooltips and click-to-modal functionality.
@@ -840,47 +943,102 @@ def highlight_text_with_risks(contract_text: str, analysis: list[AnalysisItem])
     - Highlighted risk text with colored background
     - Tooltip appearing on hover (like memo box)
     - Modal popup on click with full details (pure CSS)
+
+    하이라이트 구간을 먼저 계산한 뒤 구간 경계를 따라 원문을 한 번만 순회하며 조각을 join합니다
+    (텍스트 길이 + 조각마다 그 조각을 덮는 조항 수에 비례, 겹치지 않는 조항만 있으면 텍스트 길이에 비례).
+    겹치거나 다른 조항 안에 들어 있는 조항도 버리지 않고 안쪽 조항 하이라이트 + 바깥 조항 두 번째 밑줄로 함께 표시합니다.
     """
     import html
-
-    safe_text = html.escape(contract_text)
-    highlighted = safe_text
-
-    modal_data_list = []
-
+    import bisect
+
+    # 긴 문구 우선 번호 부여 (조항 구간끼리 겹치거나 포함돼도 모두 유지)
+    # - start/end가 계산된 항목은 그 위치를 그대로 사용
+    # - 없는 항목은 문구 검색 (같은 문구의 항목들은 같은 구간을 공유)
+    text_length = len(contract_text)
+    spans = []
+    items_by_text = {}
     for idx, item in enumerate(sorted(analysis, key=lambda x: len(x.original_text), reverse=True), 1):
-        safe_original = html.escape(item.original_text)
-
-        if safe_original and safe_original in highlighted:
-            bg_color = get_risk_color(item.category)
-            border_color = get_risk_border_color(item.category)
-            emoji = get_risk_emoji(item.category)
-            label = get_risk_label(item.category)
+        if item.start is not None and item.end is not None and 0 <= item.start < item.end <= text_length:
+            spans.append((item.start, item.end, idx, item))
+        elif item.original_text:
+            items_by_text.setdefault(item.original_text, []).append((idx, item))
+
+    for start, end, pattern in find_highlight_spans(contract_text, list(items_by_text)):
+        spans.extend((start, end, idx, item) for idx, item in items_by_text[pattern])
+
+    modal_data_by_idx = {}
+    for start, end, idx, item in spans:
+        modal_data_by_idx[idx] = {
+            "id": f"risk-modal-{idx}",
+            "checkbox_id": f"modal-toggle-{idx}",
+            "emoji": get_risk_emoji(item.category),
+            "label": get_risk_label(item.category),
+            "category": html.escape(item.category),
+            "original": html.escape(contract_text[start:end]),
+            "explanation": html.escape(item.explanation),
+            "script": html.escape(item.script),
+            "citations": format_citations_html(item.citations),
+            "border_color": get_risk_border_color(item.category)
+        }
 
-            safe_category = html.escape(item.category)
-            safe_explanation = html.escape(item.explanation)
-            safe_script = html.escape(item.script)
+    # 구간 경계마다 원문을 잘라, 조각을 덮는 조항 중 가장 안쪽(짧은) 조항으로 하이라이트 (경계를 따라가며 덮는 조항 목록을 갱신)
+    # 바깥 조항은 두 번째 밑줄과 툴팁 목록으로 표시하고, 안쪽 조항에 완전히 가려진 조항은 끝에 작은 표시를 붙여 클릭할 수 있게 함
+    starts_at: dict[int, list] = {}
+    ends_at: dict[int, list] = {}
+    for span in spans:
+        starts_at.setdefault(span[0], []).append(span)
+        ends_at.setdefault(span[1], []).append(span)
+    boundaries = sorted({0, text_length} | starts_at.keys() | ends_at.keys())
+
+    parts = []
+    shown = set()
+    active: list[tuple[int, int, tuple]] = []  # (구간 길이, idx, span): 안쪽 조항이 앞
+
+    for boundary, next_boundary in zip(boundaries, boundaries[1:] + [None]):
+        for span in ends_at.get(boundary, []):
+            if span[2] not in shown:
+                modal_data = modal_data_by_idx[span[2]]
+                parts.append(f'''<label for="{modal_data["checkbox_id"]}" class="risk-mark-label risk-nested-badge" title="{modal_data["category"]}">{modal_data["emoji"]}</label>''')
+                shown.add(span[2])
+            active.remove((span[1] - span[0], span[2], span))
+        for span in starts_at.get(boundary, []):
+            bisect.insort(active, (span[1] - span[0], span[2], span))
+        if next_boundary is None:
+            break
+
+        safe_segment = html.escape(contract_text[boundary:next_boundary])
+        if not active:
+            parts.append(safe_segment)
+            continue
 
-            modal_id = f"risk-modal-{idx}"
-            checkbox_id = f"modal-toggle-{idx}"
+        covering = [span for _, _, span in active]
+        _, _, idx, item = covering[0]
+        shown.add(idx)
+        bg_color = get_risk_color(item.category)
+        border_color = get_risk_border_color(item.category)
+        label = get_risk_label(item.category)
+        checkbox_id = modal_data_by_idx[idx]["checkbox_id"]
+        outer_shadow = f" box-shadow: 0 3px 0 {get_risk_border_color(covering[1][3].category)};" if len(covering) > 1 else ""
+        tooltip_content = "".join(
+            f'<span class="tooltip-content">{modal_data_by_idx[span[2]]["emoji"]} {modal_data_by_idx[span[2]]["category"]}</span>'
+            for span in covering
+        )
 
-            modal_data_list.append({
-                "id": modal_id,
-                "checkbox_id": checkbox_id,
-                "emoji": emoji,
-                "label": label,
-                "category": safe_category,
-                "original": safe_original,
-                "explanation": safe_explanation,
-                "script": safe_script,
-                "border_color": border_color
-            })
+        highlight_html = f'''<span class="risk-highlight-wrapper"><label for="{checkbox_id}" class="risk-mark-label"><mark class="risk-mark" style="background: {bg_color}; border-bottom: 2px solid {border_color};{outer_shadow} padding: 1px 2px; border-radius: 3px; cursor: pointer;">{safe_segment}</mark></label><span class="risk-tooltip"><span class="tooltip-header"><span style="display:inline-block;width:8px;height:8px;background:{border_color};border-radius:50%;margin-right:6px;"></span>{label}</span>{tooltip_content}<span class="tooltip-hint">클릭하여 상세 정보 확인</span></span></span>'''
+        parts.append(highlight_html)
 
-            highlight_html = f'''<span class="risk-highlight-wrapper"><label for="{checkbox_id}" class="risk-mark-label"><mark class="risk-mark" style="background: {bg_color}; border-bottom: 2px solid {border_color}; padding: 1px 2px; border-radius: 3px; cursor: pointer;">{safe_original}</mark></label><span class="risk-tooltip"><span class="tooltip-header"><span style="display:inline-block;width:8px;height:8px;background:{border_color};border-radius:50%;margin-right:6px;"></span>{label}</span><span class="tooltip-content">{safe_category}</span><span class="tooltip-hint">클릭하여 상세 정보 확인</span></span></span>'''
+    modal_data_list = [modal_data_by_idx[idx] for idx in sorted(modal_data_by_idx)]
+    return "".join(parts), modal_data_list
 
-            highlighted = highlighted.replace(safe_original, highlight_html, 1)
 
-    return highlighted, modal_data_list
+def _citations_section(data: dict) -> str:
+    if not data.get("citations"):
+        return ""
+    return f'''
+            <div class="modal-section">
+                <div class="modal-section-title">⚖️ 관련 법령</div>
+                <div class="modal-section-content">{data['citations']}</div>
+            </div>'''
 
 
 def generate_css_modals_html(modal_data_list: list) -> str:
@@ -911,7 +1069,7 @@ def generate_css_modals_html(modal_data_list: list) -> str:
             <div class="modal-section modal-script-section">
                 <div class="modal-section-title">💬 이렇게 말해보세요</div>
                 <div class="modal-section-content modal-script">"{data['script']}"</div>
-            </div>
+            </div>{_citations_section(data)}
         </div>
     </div>
 </div>'''
@@ -944,7 +1102,7 @@ def generate_modals_html(modal_data_list: list) -> str:
             <div class="modal-section">
                 <div class="modal-section-title">💬 이렇게 말해보세요</div>
                 <div class="modal-section-content modal-script">"{data['script']}"</div>
-            </div>
+            </div>{_citations_section(data)}
         </div>
     </div>
 </div>'''
@@ -1014,6 +1172,13 @@ def generate_annotation_cards(analysis: list[AnalysisItem]) -> str:
         safe_category = html.escape(item.category)
         safe_explanation = html.escape(item.explanation)
         safe_script = html.escape(item.script)
+        citations_html = ""
+        if item.citations:
+            citations_html = f'''
+<div class="annotation-section">
+<div class="annotation-label">⚖️ 관련 법령</div>
+<div class="annotation-content">{format_citations_html(item.citations)}</div>
+</div>'''
 
         cards_html += f'''
 <details class="annotation-card" style="border-left: 4px solid {border_color};">
@@ -1033,7 +1198,7 @@ def generate_annotation_cards(analysis: list[AnalysisItem]) -> str:
 <div class="annotation-section">
 <div class="annotation-label">💬 이렇게 말해보세요</div>
 <div class="annotation-script">"{safe_script}"</div>
-</div>
+</div>{citations_html}
 </div>
 </details>'''
 
@@ -1045,101 +1210,142 @@ def generate_annotation_cards(analysis: list[AnalysisItem]) -> str:
 # VECTOR DB FUNCTIONS (For chat_with_contract RAG system)
 # ============================================================
 
-def build_vector_db(data_folder: str = "./data", persist_directory: str = "./chroma_db") -> Optional[Chroma]:
+def build_vector_db(
+    data_folder: str = "./data",
+    persist_directory: str = "./chroma_db",
+    full_rebuild: bool = False,
+) -> Optional[Chroma]:
     """
-    Build ChromaDB vector database from PDF files in data folder.
+    Build or incrementally update the ChromaDB vector database from PDF files in data folder.
+
+    새 문서/바뀐 문서만 다시 분할·임베딩하고 사라진 문서의 벡터는 삭제합니다 (vector_index.update_vector_db).
 
     Args:
         data_folder: Path to folder containing PDF files
         persist_directory: Path to persist the vector database
+        full_rebuild: True이면 기존 DB를 지우고 처음부터 구축
 
     Returns:
         Chroma vectorstore instance or None if build fails
     """
+    from vector_index import update_vector_db
+
     if not VECTOR_DB_AVAILABLE:
-        logging.error("Vector DB dependencies not installed. Run: pip install langchain langchain-community langchain-google-genai langchain-chroma chromadb pypdf")
+        logging.error("Vector DB dependencies not installed. Run: pip install langchain langchain-google-genai langchain-chroma chromadb")
         return None
 
     api_key = os.environ.get("GEMINI_API_KEY")
     if not api_key:
         raise EnvironmentError("GEMINI_API_KEY 환경 변수가 설정되지 않았습니다.")
 
-    print(f"📂 Scanning PDF files in {data_folder}...")
-
-    # Get all PDF files
     pdf_files = [f for f in os.listdir(data_folder) if f.endswith('.pdf')]
-
     if not pdf_files:
         print(f"❌ No PDF files found in {data_folder}")
         return None
 
-    print(f"✅ Found {len(pdf_files)} PDF files")
+    embeddings = GoogleGenerativeAIEmbeddings(
+        model=EMBEDDING_MODEL,
+        google_api_key=api_key
+    )
 
-    # Load and split documents
-    all_documents = []
-    total_pages = 0
+    print(f"💾 Updating ChromaDB vector store at {persist_directory}...")
+    vectorstore, stats = update_vector_db(
+        lambda directory: Chroma(persist_directory=directory, embedding_function=embeddings),
+        embeddings,
+        data_folder=data_folder,
+        persist_directory=persist_directory,
+        full_rebuild=full_rebuild,
+    )
 
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(data_folder, pdf_file)
-        print(f"   📄 Loading {pdf_file}...")
+    # 조문 번호 색인 ((법령, 조문) → 전문, PDF가 바뀌었을 때만 다시 생성)
+    from article_index import build_article_index, invalidate_article_index
 
+    article_stats = build_article_index(data_folder, persist_directory)
+    if not article_stats["skipped"]:
+        print(f"📑 Article index: {article_stats['articles']} articles from {article_stats['laws']} documents")
+
+    # 새로 빌드한 DB를 쓰도록 캐시된 핸들 교체
+    invalidate_vector_store()
+    invalidate_article_index()
+
+    print(f"✅ Vector DB up to date!")
+    print(
+        f"   📊 Files: {stats['files']} | Updated: {stats['updated']} | Removed: {stats['removed']} "
+        f"| Chunks embedded: {stats['chunks_added']} | Chunks deleted: {stats['chunks_deleted']}"
+    )
+
+    return vectorstore
+
+
+_vector_store: Optional[Chroma] = None
+_vector_store_directory: Optional[str] = None
+_vector_store_api_key: Optional[str] = None
+_vector_store_lock = threading.Lock()
+
+
+_query_embeddings: Optional[CachedQueryEmbeddings] = None
+_query_embeddings_api_key: Optional[str] = None
+
+
+def _get_query_embeddings(api_key: str) -> CachedQueryEmbeddings:
+    """질문 임베딩 캐시가 적용된 임베딩 클라이언트 (벡터 스토어를 다시 열어도 캐시는 유지)."""
+    global _query_embeddings, _query_embeddings_api_key
+
+    if _query_embeddings is None or _query_embeddings_api_key != api_key:
+        disk_cache = None
         try:
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
-            total_pages += len(documents)
-            all_documents.extend(documents)
-            print(f"      ✓ {len(documents)} pages loaded")
+            disk_cache = SQLiteLRUCache(
+                QUERY_EMBEDDING_CACHE_PATH,
+                max_entries=QUERY_EMBEDDING_DISK_ENTRIES,
+                ttl_seconds=None,
+            )
         except Exception as e:
-            print(f"      ✗ Error loading {pdf_file}: {e}")
-            continue
+            logging.warning(f"Query embedding disk cache disabled: {e}")
 
-    if not all_documents:
-        print("❌ No documents loaded")
-        return None
+        _query_embeddings = CachedQueryEmbeddings(
+            GoogleGenerativeAIEmbeddings(
+                model=EMBEDDING_MODEL,
+                google_api_key=api_key
+            ),
+            model_name=EMBEDDING_MODEL,
+            max_entries=QUERY_EMBEDDING_MEMORY_ENTRIES,
+            disk_cache=disk_cache,
+        )
+        _query_embeddings_api_key = api_key
 
-    print(f"\n📊 Total: {len(pdf_files)} files, {total_pages} pages")
-    print(f"🔪 Splitting documents into chunks...")
+    return _query_embeddings
 
-    # Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
-    )
 
-    splits = text_splitter.split_documents(all_documents)
-    print(f"✅ Created {len(splits)} chunks")
+def get_query_embedding_stats() -> dict:
+    """질문 임베딩 캐시 적중률 통계."""
+    if _query_embeddings is None:
+        return {}
+    return _query_embeddings.stats()
 
-    # Create embeddings and vector store
-    print(f"🧮 Creating embeddings with Gemini...")
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model="models/embedding-001",
-        google_api_key=api_key
-    )
 
-    print(f"💾 Building ChromaDB vector store at {persist_directory}...")
-    vectorstore = Chroma.from_documents(
-        documents=splits,
-        embedding=embeddings,
-        persist_directory=persist_directory
+def _open_vector_store(persist_directory: str, api_key: str) -> Chroma:
+    return Chroma(
+        persist_directory=persist_directory,
+        embedding_function=_get_query_embeddings(api_key)
     )
 
-    print(f"✅ Vector DB built successfully!")
-    print(f"   📊 Files: {len(pdf_files)} | Pages: {total_pages} | Chunks: {len(splits)}")
-
-    return vectorstore
-
 
-def get_vector_store(persist_directory: str = "./chroma_db") -> Optional[Chroma]:
+def get_vector_store(persist_directory: str = "./chroma_db", reload: bool = False) -> Optional[Chroma]:
     """
     Load existing ChromaDB vector store.
 
+    한 번 연 벡터 스토어(임베딩 클라이언트 포함)는 프로세스 전역으로 재사용합니다.
+    DB를 다시 빌드한 뒤에는 reload=True 또는 invalidate_vector_store()로 갱신하세요.
+
     Args:
         persist_directory: Path to persisted vector database
+        reload: True이면 캐시된 핸들을 버리고 디스크에서 다시 엽니다
 
     Returns:
         Chroma vectorstore instance or None if not found
     """
+    global _vector_store, _vector_store_directory, _vector_store_api_key
+
     if not VECTOR_DB_AVAILABLE:
         logging.warning("Vector DB dependencies not available")
         return None
@@ -1152,17 +1358,74 @@ def get_vector_store(persist_directory: str = "./chroma_db") -> Optional[Chroma]
     if not api_key:
         raise EnvironmentError("GEMINI_API_KEY 환경 변수가 설정되지 않았습니다.")
 
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model="models/embedding-001",
-        google_api_key=api_key
-    )
+    vectorstore = _vector_store
+    if (
+        not reload
+        and vectorstore is not None
+        and _vector_store_directory == persist_directory
+        and _vector_store_api_key == api_key
+    ):
+        return vectorstore
 
-    vectorstore = Chroma(
-        persist_directory=persist_directory,
-        embedding_function=embeddings
-    )
+    with _vector_store_lock:
+        if (
+            reload
+            or _vector_store is None
+            or _vector_store_directory != persist_directory
+            or _vector_store_api_key != api_key
+        ):
+            _vector_store = _open_vector_store(persist_directory, api_key)
+            _vector_store_directory = persist_directory
+            _vector_store_api_key = api_key
+        return _vector_store
 
-    return vectorstore
+
+def invalidate_vector_store() -> None:
+    """캐시된 벡터 스토어 핸들을 버립니다. 다음 get_vector_store() 호출 때 다시 엽니다."""
+    from lexical_index import invalidate_lexical_index
+
+    global _vector_store, _vector_store_directory, _vector_store_api_key
+
+    with _vector_store_lock:
+        _vector_store = None
+        _vector_store_directory = None
+        _vector_store_api_key = None
+    invalidate_lexical_index()
+
+
+def reload_vector_store(persist_directory: str = "./chroma_db") -> Optional[Chroma]:
+    """벡터 DB를 디스크에서 다시 열어 캐시를 교체합니다."""
+    return get_vector_store(persist_directory, reload=True)
+
+
+def warm_up_vector_store(persist_directory: str = "./chroma_db") -> bool:
+    """
+    앱 시작 시 벡터 스토어를 미리 열고 HNSW 인덱스를 메모리에 올려둡니다.
+    저장된 벡터 하나로 로컬 검색을 한 번 수행하므로 원격 임베딩 호출은 없습니다.
+
+    Returns:
+        준비에 성공하면 True
+    """
+    try:
+        vectorstore = get_vector_store(persist_directory)
+        if vectorstore is None:
+            return False
+
+        collection = vectorstore._collection
+        sample = collection.get(limit=1, include=["embeddings"])
+        embeddings = sample.get("embeddings")
+        if embeddings is not None and len(embeddings) > 0:
+            collection.query(query_embeddings=[list(embeddings[0])], n_results=1)
+
+        # 하이브리드 검색용 BM25 색인도 미리 생성
+        from lexical_index import get_lexical_index
+        get_lexical_index(vectorstore)
+
+        logging.info(f"Vector store warmed up: {persist_directory}")
+        return True
+    except Exception as e:
+        logging.warning(f"Vector store warm-up failed: {e}")
+        return False
 
 
 def chat_with_contract(question: str, contract_text: str = "", use_rag: bool = True) -> dict:
@@ -1177,24 +1440,20 @@ def chat_with_contract(question: str, contract_text: str = "", use_rag: bool = T
     Returns:
         dict with 'answer' and 'sources' keys
     """
-    from google import genai
     from google.genai import types
 
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        raise EnvironmentError("GEMINI_API_KEY 환경 변수가 설정되지 않았습니다.")
-
-    client = genai.Client(api_key=api_key)
+    client = get_genai_client()
 
     # Build context from RAG if enabled
     context_sources = []
     if use_rag and VECTOR_DB_AVAILABLE:
         vectorstore = get_vector_store()
         if vectorstore:
-            # Search for relevant documents
-            retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
-            docs = retriever.invoke(question)  # Updated method name for newer langchain
-            context_sources = [doc.page_content for doc in docs]
+            # BM25 + 벡터 검색 결합 (조문 번호 질문은 임베딩 호출 없이 BM25만)
+            from lexical_index import get_lexical_index, hybrid_search
+
+            hits = hybrid_search(vectorstore, get_lexical_index(vectorstore), question, k=3)
+            context_sources = [hit.text for hit in hits]
 
     # Build prompt
     system_prompt = """당신은 한국 근로기준법 전문가입니다.
@@ -1226,10 +1485,11 @@ def chat_with_contract(question: str, contract_text: str = "", use_rag: bool = T
             user_prompt += f"\n[자료 {i}]\n{source}\n"
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents=[system_prompt + "\n\n" + user_prompt],
-            config=types.GenerateContentConfig(
+        response = generate_content_resilient(
+            client,
+            "gemini-2.0-flash-exp",
+            [system_prompt + "\n\n" + user_prompt],
+            types.GenerateContentConfig(
                 temperature=0.3,  # 법률 상담은 약간의 유연성 허용
             ),
         )
@@ -0,0 +1,174 @@
+# 프로세스 전역 Gemini 클라이언트 (HTTP 커넥션 풀 공유)
+
+from __future__ import annotations
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+# 커넥션 풀 설정 (동시 Streamlit 세션 수에 맞춰 조정)
+GENAI_MAX_CONNECTIONS = int(os.environ.get("GENAI_MAX_CONNECTIONS", "20"))
+GENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("GENAI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+GENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get("GENAI_KEEPALIVE_EXPIRY_SECONDS", "120"))
+
+
+class GenAIClientProvider:
+    """
+    genai.Client를 한 번만 만들어 모든 분석 요청이 같은 httpx 커넥션 풀을 쓰도록 하는 lazy singleton.
+
+    - 최초 get_client() 호출 시 생성 (double-checked locking)
+    - keep-alive 커넥션을 재사용하므로 요청마다 TCP/TLS 핸드셰이크를 하지 않음
+    - GEMINI_API_KEY가 바뀌면 새 클라이언트로 교체
+    - track_request()로 감싼 호출 수/동시 실행 수를 metrics()로 확인 가능
+    """
+
+    def __init__(
+        self,
+        max_connections: int = GENAI_MAX_CONNECTIONS,
+        max_keepalive_connections: int = GENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = GENAI_KEEPALIVE_EXPIRY_SECONDS,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+
+        self._lock = threading.Lock()
+        self._client = None
+        self._httpx_client = None
+        self._api_key: Optional[str] = None
+        self._created_at: Optional[float] = None
+
+        self._clients_created = 0
+        self._acquisitions = 0
+        self._requests_total = 0
+        self._requests_failed = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+
+    def _build_client(self, api_key: str):
+        import httpx
+        from google import genai
+        from google.genai import types
+
+        httpx_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+        client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(httpx_client=httpx_client),
+        )
+        return client, httpx_client
+
+    def get_client(self):
+        """공유 genai.Client를 반환합니다. 필요할 때 한 번만 생성합니다."""
+        api_key = os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            raise EnvironmentError("GEMINI_API_KEY 환경 변수가 설정되지 않았습니다.")
+
+        client = self._client
+        if client is not None and self._api_key == api_key:
+            with self._lock:
+                self._acquisitions += 1
+            return client
+
+        with self._lock:
+            if self._client is None or self._api_key != api_key:
+                if self._client is not None:
+                    logging.info("GEMINI_API_KEY changed; rebuilding shared genai client")
+                # 이전 클라이언트는 진행 중인 요청이 있을 수 있으므로 닫지 않고 GC에 맡깁니다.
+                self._client, self._httpx_client = self._build_client(api_key)
+                self._api_key = api_key
+                self._created_at = time.time()
+                self._clients_created += 1
+            self._acquisitions += 1
+            return self._client
+
+    @contextmanager
+    def track_request(self):
+        """모델 호출을 감싸서 요청 수와 동시 실행 수를 집계합니다."""
+        with self._lock:
+            self._requests_total += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                self._requests_failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _pool_connections(self) -> dict:
+        """httpx 커넥션 풀 상태 (httpcore 내부 구조에 의존하므로 best-effort)."""
+        pool = getattr(getattr(self._httpx_client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = 0
+        for connection in connections:
+            try:
+                if connection.is_idle():
+                    idle += 1
+            except Exception:
+                pass
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "initialized": self._client is not None,
+                "created_at": self._created_at,
+                "clients_created": self._clients_created,
+                "acquisitions": self._acquisitions,
+                "requests_total": self._requests_total,
+                "requests_failed": self._requests_failed,
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "pool_limits": {
+                    "max_connections": self.max_connections,
+                    "max_keepalive_connections": self.max_keepalive_connections,
+                    "keepalive_expiry": self.keepalive_expiry,
+                },
+                "connections": self._pool_connections(),
+            }
+
+    def reset(self) -> None:
+        """클라이언트를 닫고 다음 get_client() 호출 때 새로 만들도록 합니다."""
+        with self._lock:
+            if self._httpx_client is not None:
+                try:
+                    self._httpx_client.close()
+                except Exception as e:
+                    logging.warning(f"Closing genai http client failed: {e}")
+            self._client = None
+            self._httpx_client = None
+            self._api_key = None
+            self._created_at = None
+
+
+_provider = GenAIClientProvider()
+
+
+def get_genai_client():
+    """프로세스 전역 genai.Client를 반환합니다."""
+    return _provider.get_client()
+
+
+def track_genai_request():
+    """공유 클라이언트로 보내는 요청을 metrics에 집계합니다."""
+    return _provider.track_request()
+
+
+def get_genai_pool_metrics() -> dict:
+    return _provider.metrics()
+
+
+def reset_genai_client() -> None:
+    _provider.reset()
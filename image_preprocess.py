@@ -0,0 +1,284 @@
+# 업로드 전 계약서 사진 정규화 (EXIF 회전, 흑백, 문서 영역 자르기, 기울기 보정, 축소, 재인코딩)
+
+from __future__ import annotations
+
+import io
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+try:
+    from PIL import Image, ImageFilter, ImageOps
+    PIL_AVAILABLE = True
+except ImportError as e:
+    PIL_AVAILABLE = False
+    logging.warning(f"Pillow not available: {e}. Images will be uploaded as-is.")
+
+IMAGE_PREPROCESS_ENABLED = os.environ.get("IMAGE_PREPROCESS", "1").lower() not in ("0", "false", "no")
+# 긴 변 최대 픽셀 (Gemini가 내부적으로 타일링/축소하는 해상도보다 크게 보내봐야 업로드 시간만 늘어남)
+IMAGE_MAX_SIDE = int(os.environ.get("IMAGE_MAX_SIDE", "2048"))
+# 이보다 짧은 변이 작아지면 작은 글씨 인식이 떨어지므로 더 줄이지 않음
+IMAGE_MIN_SHORT_SIDE = 1000
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_PREPROCESS_WORKERS = int(os.environ.get("IMAGE_PREPROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# 기울기 추정 범위/간격 (도) 및 분석용 축소 크기
+MAX_SKEW_DEGREES = 5.0
+SKEW_STEP_DEGREES = 0.5
+ANALYSIS_SIDE = 600
+
+_SUPPORTED_MIME_TYPES = ("image/jpeg", "image/png", "image/webp", "image/heic", "image/heif")
+
+
+def _otsu_threshold(gray) -> int:
+    """흑백 이미지 히스토그램의 Otsu 임계값."""
+    histogram = gray.histogram()
+    total = sum(histogram)
+    weighted_total = sum(i * count for i, count in enumerate(histogram))
+
+    background = 0
+    weighted_background = 0.0
+    best_threshold, best_variance = 128, -1.0
+    for threshold, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += threshold * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = threshold, variance
+    return best_threshold
+
+
+def _document_bbox(small) -> Optional[tuple[int, int, int, int]]:
+    """
+    축소 흑백 이미지에서 밝은 종이 영역의 경계 상자를 찾습니다.
+    종이가 화면 대부분(또는 너무 작은 일부)이면 자르지 않도록 None.
+    """
+    threshold = _otsu_threshold(small)
+    # 종이(밝은 영역) 마스크에서 글자 구멍과 잡음을 지움
+    mask = small.point(lambda value: 255 if value > threshold else 0).filter(ImageFilter.MinFilter(5)).filter(ImageFilter.MaxFilter(9))
+    bbox = mask.getbbox()
+    if bbox is None:
+        return None
+    width, height = small.size
+    area_ratio = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1]) / float(width * height)
+    if area_ratio < 0.3 or area_ratio > 0.95:
+        return None
+    return bbox
+
+
+def _estimate_skew(small) -> float:
+    """
+    투영 프로파일로 기울기(도)를 추정합니다.
+    글자 줄이 수평일 때 행별 검은 픽셀 합의 분산이 가장 큽니다.
+    """
+    threshold = _otsu_threshold(small)
+    ink = small.point(lambda value: 255 if value <= threshold else 0)
+
+    def score(angle: float) -> float:
+        rotated = ink.rotate(angle, resample=Image.NEAREST, expand=False, fillcolor=0)
+        width, height = rotated.size
+        rows = rotated.resize((1, height), Image.BOX).getdata()
+        mean = sum(rows) / height
+        return sum((value - mean) ** 2 for value in rows)
+
+    steps = int(MAX_SKEW_DEGREES / SKEW_STEP_DEGREES)
+    best_angle, best_score = 0.0, score(0.0)
+    for step in range(-steps, steps + 1):
+        angle = step * SKEW_STEP_DEGREES
+        if angle == 0:
+            continue
+        current = score(angle)
+        if current > best_score:
+            best_angle, best_score = angle, current
+    return best_angle
+
+
+def _target_size(width: int, height: int) -> tuple[int, int]:
+    """긴 변을 IMAGE_MAX_SIDE 이하로, 단 짧은 변이 IMAGE_MIN_SHORT_SIDE 밑으로 내려가지 않게 축소."""
+    scale = min(1.0, IMAGE_MAX_SIDE / float(max(width, height)))
+    short_side = min(width, height)
+    if short_side * scale < IMAGE_MIN_SHORT_SIDE:
+        scale = min(1.0, IMAGE_MIN_SHORT_SIDE / float(short_side))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def preprocess_image(image_bytes: bytes, mime_type: str = "image/jpeg") -> tuple[bytes, str, dict]:
+    """
+    계약서 사진 한 장을 업로드용으로 정규화합니다 (프로세스 풀에서 실행할 수 있도록 모듈 최상위 함수).
+
+    1. EXIF 방향대로 회전
+    2. 흑백 변환
+    3. 문서(종이) 영역으로 자르기
+    4. 긴 변 IMAGE_MAX_SIDE 이하로 축소
+    5. 기울기 보정 (±5도, 회전으로 늘어난 여백만큼 약간 커질 수 있음)
+    6. JPEG 재인코딩
+
+    Returns:
+        (bytes, mime_type, 처리 정보 dict). 결과가 원본보다 크거나 처리에 실패하면 원본 그대로.
+    """
+    info = {"original_bytes": len(image_bytes)}
+    if not PIL_AVAILABLE or mime_type not in _SUPPORTED_MIME_TYPES:
+        return image_bytes, mime_type, info
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as opened:
+            # JPEG는 DCT 단계에서 바로 축소 디코딩 (IMAGE_MAX_SIDE 이상 크기는 유지)
+            opened.draft("L", (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+            image = ImageOps.exif_transpose(opened)
+            gray = image.convert("L")
+        info["original_size"] = gray.size
+
+        small = gray.copy()
+        small.thumbnail((ANALYSIS_SIDE, ANALYSIS_SIDE))
+        scale = gray.width / float(small.width)
+
+        bbox = _document_bbox(small)
+        if bbox is not None:
+            margin = 4
+            left, top, right, bottom = bbox
+            gray = gray.crop((
+                max(0, int((left - margin) * scale)),
+                max(0, int((top - margin) * scale)),
+                min(gray.width, int((right + margin) * scale)),
+                min(gray.height, int((bottom + margin) * scale)),
+            ))
+            small = small.crop(bbox)
+            info["cropped"] = True
+
+        # 축소를 먼저 해서 회전(가장 비싼 단계)을 작은 이미지에서 수행
+        target = _target_size(*gray.size)
+        if target != gray.size:
+            gray = gray.resize(target, Image.LANCZOS)
+
+        angle = _estimate_skew(small)
+        if angle:
+            gray = gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+            info["deskew_degrees"] = angle
+        info["size"] = gray.size
+
+        output = io.BytesIO()
+        gray.save(output, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+        processed = output.getvalue()
+    except Exception as e:
+        logging.warning(f"Image preprocessing failed, uploading original: {e}")
+        return image_bytes, mime_type, info
+
+    info["bytes"] = len(processed)
+    if len(processed) >= len(image_bytes):
+        return image_bytes, mime_type, info
+    return processed, "image/jpeg", info
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_failed = False
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool, _pool_failed
+
+    with _pool_lock:
+        if _pool is None and not _pool_failed and IMAGE_PREPROCESS_WORKERS > 1:
+            try:
+                # 멀티스레드 Streamlit 서버의 작업 스레드에서 fork하면 다른 스레드가 잡고 있던 락 때문에 멈출 수 있어
+                # 깨끗한 프로세스에서 워커를 띄우는 forkserver(없으면 spawn)를 사용
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _pool = ProcessPoolExecutor(
+                    max_workers=IMAGE_PREPROCESS_WORKERS,
+                    mp_context=multiprocessing.get_context(method),
+                )
+            except Exception as e:
+                _pool_failed = True
+                logging.warning(f"Image preprocess pool unavailable, running inline: {e}")
+        return _pool
+
+
+def prepare_image_for_upload(image_bytes: bytes, mime_type: str) -> tuple[bytes, str]:
+    """
+    Gemini 요청 직전에 호출하는 진입점. CPU를 많이 쓰는 처리는 프로세스 풀에서 실행해
+    여러 페이지/세션이 동시에 올라와도 GIL에 막히지 않게 합니다.
+    비활성화되어 있거나 이미지가 아니면 그대로 반환합니다.
+    """
+    if not IMAGE_PREPROCESS_ENABLED or not PIL_AVAILABLE or mime_type not in _SUPPORTED_MIME_TYPES:
+        return image_bytes, mime_type
+
+    pool = _get_pool()
+    try:
+        if pool is not None:
+            processed, processed_mime, info = pool.submit(preprocess_image, bytes(image_bytes), mime_type).result()
+        else:
+            processed, processed_mime, info = preprocess_image(image_bytes, mime_type)
+    except Exception as e:
+        logging.warning(f"Image preprocessing failed, uploading original: {e}")
+        return image_bytes, mime_type
+
+    logging.info(f"Image preprocessed: {info}")
+    return processed, processed_mime
+
+
+# ============================================================
+# 업로드 미리보기 썸네일
+# ============================================================
+
+THUMBNAIL_SIZE = (160, 160)
+THUMBNAIL_QUALITY = 70
+
+
+def _encode_thumbnail(image) -> tuple[bytes, str]:
+    """WebP(지원 시) 또는 JPEG로 작게 인코딩합니다."""
+    output = io.BytesIO()
+    try:
+        image.save(output, format="WEBP", quality=THUMBNAIL_QUALITY, method=4)
+        return output.getvalue(), "image/webp"
+    except (KeyError, OSError):
+        output = io.BytesIO()
+        image.convert("RGB").save(output, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+        return output.getvalue(), "image/jpeg"
+
+
+def make_thumbnail_data_uri(file_bytes: bytes, mime_type: str, size: tuple[int, int] = THUMBNAIL_SIZE) -> Optional[str]:
+    """
+    업로드 미리보기용 썸네일을 data URI로 만듭니다.
+    이미지는 EXIF 방향을 반영해 축소하고, PDF는 첫 페이지를 래스터화합니다 (PyMuPDF 필요).
+    만들 수 없으면 None.
+    """
+    import base64
+
+    if not PIL_AVAILABLE:
+        return None
+
+    try:
+        if mime_type == "application/pdf":
+            import pymupdf
+
+            with pymupdf.open(stream=file_bytes, filetype="pdf") as document:
+                if document.page_count == 0:
+                    return None
+                page = document[0]
+                zoom = min(size[0] / page.rect.width, size[1] / page.rect.height)
+                pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+                image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+        else:
+            with Image.open(io.BytesIO(file_bytes)) as opened:
+                opened.draft("RGB", size)
+                image = ImageOps.exif_transpose(opened)
+                image.thumbnail(size)
+                if image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+
+        data, thumbnail_mime = _encode_thumbnail(image)
+    except Exception as e:
+        logging.warning(f"Thumbnail generation failed: {e}")
+        return None
+
+    return f"data:{thumbnail_mime};base64,{base64.b64encode(data).decode()}"
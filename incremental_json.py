@@ -0,0 +1,130 @@
+# 스트리밍 응답(JSON 조각)을 받는 대로 파싱해 완성된 필드/배열 항목을 먼저 꺼내는 파서
+
+from __future__ import annotations
+
+import json
+from typing import Any, Optional
+
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalJSONParser:
+    """
+    최상위가 JSON 객체인 응답을 조각 단위로 받아, 완성되는 즉시 이벤트를 돌려줍니다.
+
+    - ("item", key, value): 최상위 배열 필드(key)의 원소(객체/문자열) 하나가 완성됨
+    - ("field", key, value): 최상위 필드(key)의 값 전체가 완성됨
+
+    예) {"extracted_text": "...", "risk_clauses": [{...}, {...}], ...}
+        -> ("field", "extracted_text", "...")
+        -> ("item", "risk_clauses", {...}) × 2
+        -> ("field", "risk_clauses", [...])
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+
+        self._key: Optional[str] = None
+        self._expect_key = False
+        self._awaiting_value = False
+        self._value_start: Optional[int] = None
+        self._item_start: Optional[int] = None
+
+        self.fields: dict[str, Any] = {}
+
+    def feed(self, chunk: str) -> list[tuple[str, str, Any]]:
+        """조각을 추가하고, 이번 조각으로 새로 완성된 이벤트 목록을 반환합니다."""
+        if not chunk:
+            return []
+
+        self._text += chunk
+        text = self._text
+        events = []
+
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._close_string(text, i, events)
+                continue
+
+            if self._awaiting_value and ch not in _WHITESPACE:
+                self._awaiting_value = False
+                self._value_start = i
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = True
+                elif self._depth == 3 and self._is_array_value(text):
+                    self._item_start = i
+            elif ch in "}]":
+                if self._depth == 1:
+                    self._complete_value(text, i, events)
+                elif self._depth == 2 and self._value_start is not None:
+                    self._complete_value(text, i + 1, events)
+                elif self._depth == 3 and self._item_start is not None:
+                    self._emit_item(text[self._item_start:i + 1], events)
+                    self._item_start = None
+                self._depth -= 1
+            elif self._depth == 1:
+                if ch == ":":
+                    self._awaiting_value = True
+                elif ch == ",":
+                    self._complete_value(text, i, events)
+                    self._expect_key = True
+
+        self._pos = len(text)
+        return events
+
+    @property
+    def text(self) -> str:
+        """지금까지 받은 원문 전체."""
+        return self._text
+
+    def _is_array_value(self, text: str) -> bool:
+        return self._value_start is not None and text[self._value_start] == "["
+
+    def _close_string(self, text: str, end: int, events: list) -> None:
+        raw = text[self._string_start:end + 1]
+        if self._depth == 1:
+            if self._expect_key:
+                self._key = json.loads(raw)
+                self._expect_key = False
+            elif self._value_start == self._string_start:
+                self._complete_value(text, end + 1, events)
+        elif self._depth == 2 and self._is_array_value(text):
+            self._emit_item(raw, events)
+
+    def _emit_item(self, raw: str, events: list) -> None:
+        try:
+            events.append(("item", self._key, json.loads(raw)))
+        except ValueError:
+            pass
+
+    def _complete_value(self, text: str, end: int, events: list) -> None:
+        """[value_start, end) 구간을 최상위 필드 값으로 확정합니다 (숫자/불리언은 ','나 '}'에서 끝남)."""
+        if self._value_start is None or self._key is None:
+            return
+        raw = text[self._value_start:end].strip()
+        self._value_start = None
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        self.fields[self._key] = value
+        events.append(("field", self._key, value))
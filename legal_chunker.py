@@ -0,0 +1,327 @@
+# 법령/계약서 구조 기반 청크 분할 (조 단위, 긴 조문은 항/호/목 경계에서 분할)
+
+from __future__ import annotations
+
+import os
+import re
+from collections import Counter
+from typing import NamedTuple
+
+# 청크 최대 글자 수. 조문 하나가 이보다 길면 항 → 호 → 목 경계에서 나누고,
+# 그래도 긴 한 덩어리만 글자 단위로 겹쳐서(overlap) 자릅니다.
+MAX_CHUNK_CHARS = 1000
+FALLBACK_OVERLAP_CHARS = 150
+
+# data/ 파일명 → 법령/문서 이름 (목록에 없으면 첫 줄을 문서 이름으로 사용)
+DOCUMENT_NAMES = {
+    "labor_law.pdf": "근로기준법",
+    "minimum_wage_act.pdf": "최저임금법",
+    "copyright_act.pdf": "저작권법",
+    "fair_subcontracting_act.pdf": "하도급거래 공정화에 관한 법률",
+    "act_on_terms_regulation.pdf": "약관의 규제에 관한 법률",
+    "standard_labor_contract.pdf": "표준근로계약서",
+    "standard_publishing.pdf": "출판 분야 표준계약서",
+    "standard_design.pdf": "미술 분야 표준계약서",
+    "standard_video_staff.pdf": "방송프로그램 제작스태프 표준계약서",
+    "standard_webtoon.pdf": "웹툰 표준계약서",
+    "copyright_guide.pdf": "저작권 표준계약서 해설",
+    "case_study_nocontract.pdf": "근로계약서 미작성 사례",
+}
+
+# 조문 제목: "제56조(연장ㆍ야간 및 휴일 근로)", "제43조의2(...)", "제1조 (계약의 목적)", "제10조 삭제"
+# (본문 중 "제12조제1항에 따른" 같은 참조가 줄 앞에 오는 경우와 구분하려고 제목 괄호나 삭제 표시를 요구)
+ARTICLE_RE = re.compile(
+    r"^[ \t]*제\s*(?P<number>\d+)\s*조(?:\s*의\s*(?P<branch>\d+))?"
+    r"\s*(?:\((?P<title>[^)\n]{1,60})\)|(?=삭제))",
+    re.MULTILINE,
+)
+CHAPTER_RE = re.compile(r"^[ \t]*(제\s*\d+\s*[장절](?:의\s*\d+)?[ \t]+[^\n<]*)", re.MULTILINE)
+SUPPLEMENTARY_RE = re.compile(r"^[ \t]*부\s*칙\b", re.MULTILINE)
+
+# 조문 안의 하위 구조 (항 ①②, 호 1. 2., 목 가. 나.) - 큰 단위부터 시도
+_SUBDIVISION_RES = (
+    re.compile(r"^[ \t]*(?=[①-⑳])", re.MULTILINE),
+    re.compile(r"^[ \t]*(?=\d{1,2}\.\s)", re.MULTILINE),
+    re.compile(r"^[ \t]*(?=[가-하]\.\s)", re.MULTILINE),
+)
+_BLANK_LINE_RE = re.compile(r"\n[ \t]*\n")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+class LegalChunk(NamedTuple):
+    text: str
+    metadata: dict
+
+
+class ArticleText(NamedTuple):
+    """조문 하나의 전체 텍스트 (article_index용)."""
+    law_name: str
+    article: str
+    title: str
+    text: str
+    page: int
+    source: str
+
+
+class _Section(NamedTuple):
+    start: int
+    end: int
+    article: str
+    article_title: str
+    chapter: str
+    supplementary: bool
+
+
+def document_name(file_name: str, text: str) -> str:
+    name = DOCUMENT_NAMES.get(os.path.basename(file_name))
+    if name:
+        return name
+    for line in text.splitlines():
+        if line.strip():
+            return line.strip()[:60]
+    return os.path.basename(file_name)
+
+
+def strip_running_headers(pages: list[str]) -> list[str]:
+    """
+    페이지마다 반복되는 머리글 줄("법제처 3 국가법령정보센터", "근로기준법")을 지웁니다.
+    각 페이지 첫 두 줄 중 (숫자를 무시하고) 절반 이상의 페이지에 나오는 줄을 머리글로 봅니다.
+    """
+    if len(pages) < 3:
+        return pages
+
+    def head_lines(page: str) -> list[str]:
+        return [line.strip() for line in page.splitlines() if line.strip()][:2]
+
+    counts = Counter(_DIGITS_RE.sub("#", line) for page in pages for line in set(head_lines(page)))
+    headers = {line for line, count in counts.items() if count >= len(pages) / 2}
+    if not headers:
+        return pages
+
+    cleaned = []
+    for page in pages:
+        lines = page.splitlines()
+        removed = 0
+        kept = []
+        for line in lines:
+            if removed < 2 and line.strip() and _DIGITS_RE.sub("#", line.strip()) in headers:
+                removed += 1
+                continue
+            if line.strip():
+                removed = 2  # 본문이 시작된 뒤에는 지우지 않음
+            kept.append(line)
+        cleaned.append("\n".join(kept))
+    return cleaned
+
+
+def _sections(text: str) -> list[_Section]:
+    """본문을 조문 단위 구간으로 나눕니다 (첫 조문 앞부분과 조문이 없는 문서는 article이 빈 구간)."""
+    chapters = [(match.start(), " ".join(match.group(1).split())) for match in CHAPTER_RE.finditer(text)]
+    supplementary_match = SUPPLEMENTARY_RE.search(text)
+    supplementary_start = supplementary_match.start() if supplementary_match else len(text) + 1
+
+    boundaries = []
+    for match in ARTICLE_RE.finditer(text):
+        article = f"제{match.group('number')}조"
+        if match.group("branch"):
+            article += f"의{match.group('branch')}"
+        boundaries.append((match.start(), article, (match.group("title") or "").strip()))
+    # 장/절 제목과 부칙 표시도 구간 경계 (앞 조문 끝에 붙지 않도록)
+    for position, _ in chapters:
+        boundaries.append((position, "", ""))
+    if supplementary_match:
+        boundaries.append((supplementary_start, "", ""))
+    boundaries.sort(key=lambda boundary: boundary[0])
+
+    sections = []
+    starts = [(0, "", "")] + boundaries
+    for index, (start, article, title) in enumerate(starts):
+        end = starts[index + 1][0] if index + 1 < len(starts) else len(text)
+        if end <= start or not text[start:end].strip():
+            continue
+        chapter = ""
+        for position, name in chapters:
+            if position <= start and position < supplementary_start:
+                chapter = name
+        sections.append(_Section(start, end, article, title, chapter, start >= supplementary_start))
+    return sections
+
+
+def _split_at(text: str, pattern: re.Pattern) -> list[str]:
+    positions = sorted({0, *(match.start() for match in pattern.finditer(text))})
+    parts = [text[start:end] for start, end in zip(positions, positions[1:] + [len(text)])]
+    return [part for part in parts if part.strip()]
+
+
+def _split_with_overlap(text: str, max_chars: int, overlap: int) -> list[str]:
+    """구조 경계가 없는 긴 덩어리만 문장/공백 경계에서 겹치게 자릅니다."""
+    pieces = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + max_chars)
+        if end < len(text):
+            cut = max(text.rfind(". ", start, end), text.rfind("다.", start, end), text.rfind("\n", start, end))
+            if cut <= start + max_chars // 2:
+                cut = text.rfind(" ", start, end)
+            if cut > start + max_chars // 2:
+                end = cut + 1
+        pieces.append(text[start:end])
+        if end >= len(text):
+            break
+        start = max(start + 1, end - overlap)
+    return pieces
+
+
+def _units(text: str, max_chars: int, overlap: int, level: int = 0) -> list[str]:
+    """max_chars 이하가 될 때까지 항 → 호 → 목 → 문단 경계 순서로 나눕니다."""
+    if len(text) <= max_chars:
+        return [text]
+    patterns = _SUBDIVISION_RES[level:] + (_BLANK_LINE_RE,)
+    for offset, pattern in enumerate(patterns):
+        parts = _split_at(text, pattern) if pattern is not _BLANK_LINE_RE else [
+            part for part in _BLANK_LINE_RE.split(text) if part.strip()
+        ]
+        if len(parts) > 1:
+            next_level = min(level + offset + 1, len(_SUBDIVISION_RES))
+            return [unit for part in parts for unit in _units(part, max_chars, overlap, next_level)]
+    return _split_with_overlap(text, max_chars, overlap)
+
+
+def _pack(units: list[str], max_chars: int, prefix: str = "") -> list[str]:
+    """연속된 단위를 max_chars 안에서 최대한 합칩니다. 두 번째 청크부터는 조문 제목(prefix)을 앞에 붙입니다."""
+    chunks = []
+    current = ""
+    for unit in units:
+        unit = unit.strip()
+        if not unit:
+            continue
+        if current and len(current) + 1 + len(unit) > max_chars:
+            chunks.append(current)
+            current = f"{prefix}\n{unit}" if prefix else unit
+        else:
+            current = f"{current}\n{unit}" if current else unit
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _page_offsets(pages: list[str]) -> list[int]:
+    starts = []
+    position = 0
+    for page in pages:
+        starts.append(position)
+        position += len(page) + 1
+    return starts
+
+
+def _page_of(page_starts: list[int], offset: int) -> int:
+    page = 0
+    for index, start in enumerate(page_starts):
+        if start <= offset:
+            page = index
+    return page
+
+
+def extract_articles(pages: list[str], file_name: str) -> list[ArticleText]:
+    """
+    문서의 본칙 조문을 하나씩 (자르지 않은 전체 텍스트로) 뽑습니다.
+    같은 조문 번호가 여러 번 나오면(계약서 양식이 여러 개인 해설서 등) 처음 것만 사용합니다.
+    """
+    pages = strip_running_headers(pages)
+    page_starts = _page_offsets(pages)
+    text = "\n".join(pages)
+    law_name = document_name(file_name, text)
+
+    articles = []
+    seen = set()
+    for section in _sections(text):
+        if not section.article or section.supplementary or section.article in seen:
+            continue
+        seen.add(section.article)
+        raw = text[section.start:section.end]
+        articles.append(ArticleText(
+            law_name=law_name,
+            article=section.article,
+            title=section.article_title,
+            text=raw.strip(),
+            page=_page_of(page_starts, section.start + len(raw) - len(raw.lstrip())),
+            source=file_name,
+        ))
+    return articles
+
+
+def chunk_pages(
+    pages: list[str],
+    file_name: str,
+    max_chars: int = MAX_CHUNK_CHARS,
+    overlap: int = FALLBACK_OVERLAP_CHARS,
+) -> list[LegalChunk]:
+    """
+    페이지 텍스트 리스트를 조문 구조에 맞춰 청크로 나눕니다.
+
+    - 조(제N조)가 기본 단위. 짧은 조문은 같은 장의 이웃 조문과 max_chars 안에서 묶고,
+      긴 조문은 항/호/목 경계에서 나눈 뒤 나뉜 청크마다 조문 제목을 붙여 어느 조문인지 알 수 있게 함
+    - 조문이 없는 문서(해설서, 사례)는 문단을 max_chars 안에서 묶음
+    - 겹침(overlap)은 구조 경계가 전혀 없는 긴 덩어리를 자를 때만 사용
+
+    Returns:
+        LegalChunk(text, metadata) 리스트. metadata: source, page(0부터), law_name,
+        article/article_title(청크의 첫 조문), articles(청크에 든 조문 목록, 쉼표 구분),
+        chapter, supplementary(부칙 여부)
+    """
+    pages = strip_running_headers(pages)
+    page_starts = _page_offsets(pages)
+    text = "\n".join(pages)
+    law_name = document_name(file_name, text)
+
+    chunks: list[LegalChunk] = []
+    previous_whole = False
+    for section in _sections(text):
+        raw = text[section.start:section.end]
+        body = raw.strip()
+        # 장/절 제목 한 줄뿐인 구간은 chapter 메타데이터로 대신함
+        if not section.article and "\n" not in body and CHAPTER_RE.match(body):
+            continue
+
+        prefix = ""
+        if section.article:
+            prefix = f"{section.article}({section.article_title})" if section.article_title else section.article
+            if section.supplementary:
+                prefix = f"부칙 {prefix}"
+        # 나뉜 청크 앞에 조문 제목을 붙여도 max_chars를 넘지 않도록 여유를 둠
+        unit_chars = max_chars - len(prefix) - 1 if prefix else max_chars
+        pieces = _pack(_units(body, unit_chars, overlap), max_chars, prefix)
+
+        # 통째로 들어가는 짧은 조문은 같은 장의 앞 조문 청크에 이어 붙여 벡터 수를 줄임 (조문 중간은 자르지 않음)
+        whole = bool(section.article) and len(pieces) == 1
+        if whole and previous_whole:
+            previous = chunks[-1]
+            if (
+                previous.metadata["chapter"] == section.chapter
+                and previous.metadata["supplementary"] == section.supplementary
+                and len(previous.text) + 2 + len(pieces[0]) <= max_chars
+            ):
+                metadata = dict(previous.metadata, articles=f"{previous.metadata['articles']},{section.article}")
+                chunks[-1] = LegalChunk(f"{previous.text}\n\n{pieces[0]}", metadata)
+                continue
+
+        metadata = {
+            "source": file_name,
+            "page": _page_of(page_starts, section.start + len(raw) - len(raw.lstrip())),
+            "law_name": law_name,
+            "article": section.article,
+            "article_title": section.article_title,
+            "articles": section.article,
+            "chapter": section.chapter,
+            "supplementary": section.supplementary,
+        }
+        for piece in pieces:
+            chunks.append(LegalChunk(piece, dict(metadata)))
+        previous_whole = whole
+    return chunks
+
+
+def chunk_text(text: str, file_name: str, max_chars: int = MAX_CHUNK_CHARS, overlap: int = FALLBACK_OVERLAP_CHARS) -> list[LegalChunk]:
+    """한 덩어리 텍스트용 chunk_pages."""
+    return chunk_pages([text], file_name, max_chars, overlap)
+
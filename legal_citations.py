@@ -0,0 +1,190 @@
+# 분석된 위험 조항에 근거 법령(조문) 붙이기: 명시된 조문은 조문 색인으로, 나머지는 배치 벡터 검색으로
+
+from __future__ import annotations
+
+import os
+import re
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Optional
+
+RAG_CITATIONS_ENABLED = os.environ.get("RAG_CITATIONS_ENABLED", "1") != "0"
+# 분석 응답이 이 시간 이상 늦어지지 않도록 제한 (넘으면 근거 법령 없이 반환)
+RAG_CITATION_TIMEOUT_SECONDS = float(os.environ.get("RAG_CITATION_TIMEOUT_SECONDS", "3.0"))
+RAG_CITATIONS_PER_CLAUSE = int(os.environ.get("RAG_CITATIONS_PER_CLAUSE", "2"))
+CITATION_TEXT_MAX_CHARS = int(os.environ.get("CITATION_TEXT_MAX_CHARS", "800"))
+# 동시에 진행할 수 있는 근거 검색 수 (제한 시간을 넘긴 검색이 아직 돌고 있으면 새 요청은 대기열에 쌓지 않고 근거 없이 반환)
+RAG_CITATION_MAX_INFLIGHT = int(os.environ.get("RAG_CITATION_MAX_INFLIGHT", "2"))
+
+# "근로기준법 제20조", "「최저임금법」 제6조의2" (법령 이름은 앞쪽 단어에서 찾음)
+_ARTICLE_MENTION_RE = re.compile(r"제\s*(\d+)\s*조(?:\s*의\s*(\d+))?")
+_LAW_WORD_RE = re.compile(r"[^\s「」『』()\[\],.·]+")
+# 조문 앞에서 법령 이름을 찾을 때 살펴보는 단어 수
+_LAW_NAME_MAX_WORDS = 6
+
+# 조항 분석 요청 간에 공유. 제한 시간을 넘긴 검색은 원격 벡터 검색 전이면 건너뛰고, 이미 시작했으면 결과만 버림
+_executor = ThreadPoolExecutor(max_workers=RAG_CITATION_MAX_INFLIGHT, thread_name_prefix="legal-citations")
+_inflight_slots = threading.BoundedSemaphore(RAG_CITATION_MAX_INFLIGHT)
+
+
+def _truncate(text: str, max_chars: int = CITATION_TEXT_MAX_CHARS) -> str:
+    text = (text or "").strip()
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "…"
+
+
+def explicit_references(text: str, article_index) -> list:
+    """
+    텍스트에 "법령 이름 + 제N조" 형태로 적힌 조문을 조문 색인에서 찾습니다 (약칭 포함).
+    법령 이름 없이 조문 번호만 있거나 코퍼스에 없는 법령이면 건너뜁니다.
+    """
+    from lexical_index import article_label
+
+    found = []
+    for match in _ARTICLE_MENTION_RE.finditer(text or ""):
+        words = _LAW_WORD_RE.findall(text[max(0, match.start() - 60):match.start()])[-_LAW_NAME_MAX_WORDS:]
+        # 가장 긴 이름부터 ("하도급거래 공정화에 관한 법률" 우선, 없으면 "하도급법")
+        for count in range(len(words), 0, -1):
+            law_name = " ".join(words[-count:])
+            if article_index.law_key(law_name) is None:
+                continue
+            article = article_index.get(law_name, article_label(match.group(1), match.group(2)))
+            if article is not None:
+                found.append(article)
+            break
+    return found
+
+
+def _citation_from_article(article):
+    from gemini_analyzer import Citation
+
+    return Citation(
+        law_name=article.law_name,
+        article=article.article,
+        title=article.title,
+        page=article.page + 1,
+        text=_truncate(article.text),
+    )
+
+
+def _citation_from_chunk(text: str, metadata: dict):
+    from gemini_analyzer import Citation
+
+    page = metadata.get("page")
+    return Citation(
+        law_name=str(metadata.get("law_name") or metadata.get("source") or ""),
+        article=str(metadata.get("article") or ""),
+        title=str(metadata.get("article_title") or ""),
+        page=int(page) + 1 if isinstance(page, (int, float)) else None,
+        text=_truncate(text),
+    )
+
+
+def _batched_vector_search(vectorstore, queries: list[str], k: int) -> list[list[tuple[str, dict]]]:
+    """
+    질문 여러 개를 임베딩 호출 한 번(캐시 미스만)과 컬렉션 조회 한 번으로 검색합니다.
+    질문 순서대로 [(청크 텍스트, 메타데이터), ...]를 반환합니다.
+    """
+    embeddings = vectorstore._embedding_function
+    if hasattr(embeddings, "embed_queries"):
+        vectors = embeddings.embed_queries(queries)
+    else:
+        vectors = [embeddings.embed_query(query) for query in queries]
+    result = vectorstore._collection.query(
+        query_embeddings=vectors,
+        n_results=k,
+        include=["documents", "metadatas"],
+    )
+    return [
+        [(text or "", metadata or {}) for text, metadata in zip(documents, metadatas)]
+        for documents, metadatas in zip(result["documents"], result["metadatas"])
+    ]
+
+
+def find_citations(
+    clauses: list,
+    vectorstore=None,
+    article_index=None,
+    k: int = RAG_CITATIONS_PER_CLAUSE,
+    cancelled: Optional[threading.Event] = None,
+) -> list[list]:
+    """
+    조항(AnalysisItem)별 근거 법령 목록을 계산합니다 (clauses와 같은 순서).
+
+    1. 설명/유형/대응 문구에 "근로기준법 제20조"처럼 조문이 적혀 있으면 조문 색인에서 전문을 가져옴 (원격 호출 없음)
+    2. 그래도 k개가 안 되는 조항은 "유형 + 원문"을 질문으로 모아 한 번에 임베딩/검색
+       (cancelled가 설정되어 있으면 건너뜀)
+    """
+    citations: list[list] = [[] for _ in clauses]
+    seen: list[set] = [set() for _ in clauses]
+
+    def add(index: int, citation) -> None:
+        key = (citation.law_name.replace(" ", ""), citation.article, citation.page if not citation.article else None)
+        if key not in seen[index] and len(citations[index]) < k:
+            seen[index].add(key)
+            citations[index].append(citation)
+
+    if article_index is not None:
+        for index, clause in enumerate(clauses):
+            for article in explicit_references(f"{clause.category}\n{clause.explanation}\n{clause.script}", article_index):
+                add(index, _citation_from_article(article))
+
+    pending = [index for index, clause in enumerate(clauses) if len(citations[index]) < k and clause.original_text]
+    if vectorstore is not None and pending and not (cancelled is not None and cancelled.is_set()):
+        queries = [f"{clauses[index].category}\n{clauses[index].original_text}" for index in pending]
+        # 명시 조문과 겹칠 수 있으므로 조금 더 가져옴
+        for index, hits in zip(pending, _batched_vector_search(vectorstore, queries, k + 1)):
+            for text, metadata in hits:
+                add(index, _citation_from_chunk(text, metadata))
+
+    return citations
+
+
+def attach_citations(result, timeout: float = RAG_CITATION_TIMEOUT_SECONDS):
+    """
+    result.risk_clauses의 각 조항에 citations를 채웁니다 (모델이 적은 값은 덮어씀).
+    벡터 DB/조문 색인이 없거나, 실패하거나, timeout 안에 끝나지 않으면 근거 없이 그대로 반환합니다.
+    """
+    for item in result.risk_clauses:
+        item.citations = []
+    if not RAG_CITATIONS_ENABLED or not result.risk_clauses:
+        return result
+
+    from gemini_analyzer import VECTOR_DB_AVAILABLE, get_vector_store
+    from article_index import get_article_index
+
+    if not _inflight_slots.acquire(blocking=False):
+        logging.warning("Citation lookups are backed up, returning analysis without citations")
+        return result
+
+    cancelled = threading.Event()
+
+    def lookup():
+        try:
+            vectorstore = get_vector_store() if VECTOR_DB_AVAILABLE else None
+            article_index = get_article_index()
+            if vectorstore is None and article_index is None:
+                return None
+            return find_citations(result.risk_clauses, vectorstore, article_index, cancelled=cancelled)
+        finally:
+            _inflight_slots.release()
+
+    try:
+        future = _executor.submit(lookup)
+    except Exception:
+        _inflight_slots.release()
+        raise
+    try:
+        citations: Optional[list[list]] = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        cancelled.set()
+        logging.warning(f"Citation lookup exceeded {timeout:.1f}s, returning analysis without citations")
+        return result
+    except Exception as e:
+        logging.warning(f"Citation lookup failed: {e}")
+        return result
+
+    if citations is not None:
+        for item, item_citations in zip(result.risk_clauses, citations):
+            item.citations = item_citations
+    return result
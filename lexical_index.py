@@ -0,0 +1,216 @@
+# 법령 청크 로컬 BM25 색인 + 벡터 검색 결과와의 RRF(reciprocal rank fusion) 결합
+
+from __future__ import annotations
+
+import re
+import math
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import NamedTuple, Optional
+
+# BM25 파라미터
+BM25_K1 = 1.5
+BM25_B = 0.75
+# RRF 상수 (순위 1위와 10위의 점수 차이를 완만하게)
+RRF_K = 60
+# 결합 전에 각 검색기에서 가져오는 후보 수 (최종 k보다 넉넉하게)
+HYBRID_FETCH_K = 20
+
+# "제56조", "56조", "제43조의2", "제 56 조" (금액 단위 "1조원", "3조 달러", "1.5조 원"은 제외)
+ARTICLE_QUERY_RE = re.compile(r"(?<![\d.,])제?\s*(\d+)\s*조(?!\s*(?:원|달러|억|만|천|엔|위안|유로))(?:\s*의\s*(\d+))?")
+_TOKEN_RE = re.compile(r"[가-힣]+|[A-Za-z]+|\d+")
+
+
+class SearchHit(NamedTuple):
+    id: str
+    text: str
+    metadata: dict
+    score: float
+
+
+def article_label(number: str, branch: Optional[str] = None) -> str:
+    return f"제{number}조의{branch}" if branch else f"제{number}조"
+
+
+def query_articles(text: str) -> list[str]:
+    """질문에 적힌 조문 번호 ("56조" → "제56조")."""
+    return [article_label(match.group(1), match.group(2)) for match in ARTICLE_QUERY_RE.finditer(text)]
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    형태소 분석기 없이 쓰는 한국어 토크나이저.
+    한글 연속 구간은 글자 바이그램("포괄임금" → 포괄, 괄임, 임금)으로 나눠 조사/어미가 붙어도 맞고,
+    영문/숫자는 단어 단위, 조문 번호는 "제56조" 같은 하나의 토큰으로 추가합니다.
+    """
+    tokens = [f"§{label}" for label in query_articles(text)]
+    for match in _TOKEN_RE.finditer(text.lower()):
+        word = match.group(0)
+        if "가" <= word[0] <= "힣" and len(word) > 1:
+            tokens.extend(word[index:index + 2] for index in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+class BM25Index:
+    """청크 (id, 텍스트, 메타데이터) 목록으로 만드는 메모리 역색인."""
+
+    def __init__(self, ids: list[str], texts: list[str], metadatas: list[dict], k1: float = BM25_K1, b: float = BM25_B):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.k1 = k1
+        self.b = b
+
+        self._postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        self._lengths: list[int] = []
+        # 조문 번호 → 그 조문이 들어 있는 청크 (본칙만)
+        self._articles: dict[str, list[int]] = defaultdict(list)
+        for doc_index, (text, metadata) in enumerate(zip(texts, metadatas)):
+            counts = Counter(tokenize(text))
+            self._lengths.append(sum(counts.values()))
+            for token, count in counts.items():
+                self._postings[token].append((doc_index, count))
+            if not metadata.get("supplementary"):
+                for article in filter(None, str(metadata.get("articles") or metadata.get("article") or "").split(",")):
+                    self._articles[article].append(doc_index)
+        self._average_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _idf(self, token: str) -> float:
+        document_frequency = len(self._postings.get(token, ()))
+        return math.log(1 + (len(self.ids) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def _scores(self, query: str, candidates: Optional[set[int]] = None) -> dict[int, float]:
+        scores: dict[int, float] = defaultdict(float)
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = self._idf(token)
+            for doc_index, count in postings:
+                if candidates is not None and doc_index not in candidates:
+                    continue
+                length_norm = 1 - self.b + self.b * self._lengths[doc_index] / (self._average_length or 1.0)
+                scores[doc_index] += idf * count * (self.k1 + 1) / (count + self.k1 * length_norm)
+        return scores
+
+    def _hits(self, scores: dict[int, float], k: int) -> list[SearchHit]:
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [SearchHit(self.ids[index], self.texts[index], self.metadatas[index], score) for index, score in ranked]
+
+    def search(self, query: str, k: int = 10) -> list[SearchHit]:
+        return self._hits(self._scores(query), k)
+
+    def search_articles(self, query: str, k: int = 10) -> list[SearchHit]:
+        """
+        질문에 적힌 조문 번호가 들어 있는 청크만 BM25로 정렬합니다 (법령 이름이 있으면 그 법령으로 한정).
+        조문 번호가 없거나 해당 조문이 없으면 빈 리스트.
+        """
+        candidates = {index for article in query_articles(query) for index in self._articles.get(article, ())}
+        if not candidates:
+            return []
+        # "근로기준법 제56조"처럼 법령 이름도 적었으면 그 법령의 조문만
+        compact_query = query.replace(" ", "")
+        named = {
+            index for index in candidates
+            if str(self.metadatas[index].get("law_name", "")).replace(" ", "") in compact_query
+            and self.metadatas[index].get("law_name")
+        }
+        candidates = named or candidates
+        scores = self._scores(query, candidates)
+        for index in candidates:
+            scores.setdefault(index, 0.0)
+        return self._hits(scores, k)
+
+
+def reciprocal_rank_fusion(result_lists: list[list[SearchHit]], k: int, rrf_k: int = RRF_K) -> list[SearchHit]:
+    """여러 검색 결과를 순위 기반(RRF)으로 합칩니다. 점수 척도가 다른 BM25와 벡터 거리를 그대로 합칠 수 있습니다."""
+    fused: dict[str, float] = defaultdict(float)
+    hits: dict[str, SearchHit] = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results):
+            fused[hit.id] += 1.0 / (rrf_k + rank + 1)
+            hits.setdefault(hit.id, hit)
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [hits[hit_id]._replace(score=score) for hit_id, score in ranked]
+
+
+def _vector_search(vectorstore, query: str, k: int) -> list[SearchHit]:
+    """Chroma 컬렉션을 직접 조회해 ID까지 받아옵니다 (질문 임베딩은 캐시 적용된 임베딩 함수 사용)."""
+    embedding = vectorstore._embedding_function.embed_query(query)
+    result = vectorstore._collection.query(
+        query_embeddings=[embedding],
+        n_results=k,
+        include=["documents", "metadatas", "distances"],
+    )
+    return [
+        SearchHit(hit_id, text or "", metadata or {}, -distance)
+        for hit_id, text, metadata, distance in zip(
+            result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+        )
+    ]
+
+
+def hybrid_search(vectorstore, index: Optional[BM25Index], query: str, k: int = 3, fetch_k: int = HYBRID_FETCH_K) -> list[SearchHit]:
+    """
+    BM25와 벡터 검색 결과를 RRF로 합쳐 상위 k개를 반환합니다.
+
+    - 질문에 조문 번호("제56조")가 있고 색인에 그 조문이 있으면 임베딩 호출 없이 BM25 결과만 반환
+    - BM25 색인이 없으면 벡터 검색만, 벡터 검색이 실패하면 BM25 결과만 사용
+    """
+    if index is not None:
+        article_hits = index.search_articles(query, k)
+        if article_hits:
+            return article_hits
+
+    lexical = index.search(query, fetch_k) if index is not None else []
+    try:
+        dense = _vector_search(vectorstore, query, fetch_k)
+    except Exception as e:
+        logging.warning(f"Vector search failed, using BM25 only: {e}")
+        dense = []
+    return reciprocal_rank_fusion([dense, lexical], k)
+
+
+def build_index_from_vectorstore(vectorstore) -> BM25Index:
+    """벡터 DB에 저장된 청크(build_vector_db가 만든 것과 같은 청크)로 BM25 색인을 만듭니다 (원격 호출 없음)."""
+    data = vectorstore._collection.get(include=["documents", "metadatas"])
+    return BM25Index(
+        list(data["ids"]),
+        [text or "" for text in data["documents"]],
+        [metadata or {} for metadata in data["metadatas"]],
+    )
+
+
+_index: Optional[BM25Index] = None
+_index_source = None
+_index_lock = threading.Lock()
+
+
+def get_lexical_index(vectorstore) -> Optional[BM25Index]:
+    """vectorstore 핸들별로 한 번 만든 BM25 색인 (만들 수 없으면 None)."""
+    global _index, _index_source
+
+    with _index_lock:
+        if _index is None or _index_source is not vectorstore:
+            try:
+                _index = build_index_from_vectorstore(vectorstore)
+                _index_source = vectorstore
+                logging.info(f"BM25 index built: {len(_index)} chunks")
+            except Exception as e:
+                logging.warning(f"BM25 index unavailable: {e}")
+                return None
+        return _index
+
+
+def invalidate_lexical_index() -> None:
+    global _index, _index_source
+
+    with _index_lock:
+        _index = None
+        _index_source = None
@@ -0,0 +1,220 @@
+# 페이지 단위 병렬 텍스트 추출 (여러 장 업로드 시 1단계: OCR, 2단계: 텍스트 분석)
+
+from __future__ import annotations
+
+import os
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+from cache_store import SQLiteLRUCache
+from gemini_analyzer import CLEANING_RULES, anonymize_personal_info, generate_content_resilient
+from genai_client import get_genai_client
+
+# 텍스트 추출은 분석보다 가벼운 작업이라 빠른 모델을 사용
+OCR_MODEL = os.environ.get("OCR_MODEL", "gemini-2.5-flash")
+# OCR 프롬프트를 수정하면 올려야 페이지 캐시가 갱신됩니다
+OCR_PROMPT_VERSION = "2026-10-17.1"
+OCR_MAX_WORKERS = int(os.environ.get("OCR_MAX_WORKERS", "4"))
+
+# OCR 원문에는 주민번호/전화번호/이름이 그대로 있으므로 기본은 프로세스 메모리에만 짧게 보관
+# (같은 파일을 다시 분석할 때만 재사용, 파일 해시가 키라 같은 파일을 가진 요청만 적중).
+# 디스크 경로를 지정하면 개인정보를 비식별화한 텍스트만 저장합니다.
+PAGE_TEXT_CACHE_PATH = os.environ.get("PAGE_TEXT_CACHE_PATH", ":memory:")
+PAGE_TEXT_CACHE_MAX_ENTRIES = 2000
+PAGE_TEXT_CACHE_TTL_SECONDS = float(os.environ.get("PAGE_TEXT_CACHE_TTL_SECONDS", str(30 * 60)))
+# 이전 버전이 OCR 원문을 7일간 디스크에 남기던 기본 경로 (메모리 캐시로 바뀌면서 지움)
+_LEGACY_PAGE_TEXT_CACHE_PATH = "./.cache/page_text.sqlite3"
+
+OCR_PROMPT = f"""당신은 한국어 계약서 OCR 전문가입니다.
+제공된 계약서 페이지 한 장에서 텍스트만 정확히 추출하세요.
+
+{CLEANING_RULES}
+
+**출력 규칙:**
+- 추출한 본문 텍스트만 출력하세요 (설명, 요약, 마크다운 코드블록 금지).
+- 원본의 조항 번호, 표, 목록 구조는 줄바꿈으로 유지하세요.
+- 글자를 읽을 수 없는 부분은 추측하지 말고 [판독 불가]로 표시하세요."""
+
+
+class PageText(NamedTuple):
+    """
+    한 페이지의 추출 결과. error가 있으면 text는 빈 문자열.
+    source: "text_layer"(PDF 텍스트 레이어, 로컬) / "cache" / "vision"(비전 OCR 호출)
+    """
+    file_index: int
+    page_index: int
+    text: str
+    cached: bool
+    error: Optional[str] = None
+    source: str = "vision"
+
+
+_page_cache: Optional[SQLiteLRUCache] = None
+_page_cache_failed = False
+_page_cache_lock = threading.Lock()
+
+
+def _remove_legacy_page_cache() -> None:
+    for suffix in ("", "-wal", "-shm"):
+        path = _LEGACY_PAGE_TEXT_CACHE_PATH + suffix
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+                logging.info(f"Removed legacy page text cache: {path}")
+        except OSError as e:
+            logging.warning(f"Failed to remove legacy page text cache {path}: {e}")
+
+
+def get_page_text_cache() -> Optional[SQLiteLRUCache]:
+    """페이지별 추출 텍스트 캐시 (열 수 없으면 None, 캐시 없이 동작)."""
+    global _page_cache, _page_cache_failed
+
+    with _page_cache_lock:
+        if _page_cache is None and not _page_cache_failed:
+            if PAGE_TEXT_CACHE_PATH == ":memory:":
+                _remove_legacy_page_cache()
+            try:
+                _page_cache = SQLiteLRUCache(
+                    PAGE_TEXT_CACHE_PATH,
+                    max_entries=PAGE_TEXT_CACHE_MAX_ENTRIES,
+                    ttl_seconds=PAGE_TEXT_CACHE_TTL_SECONDS,
+                )
+            except Exception as e:
+                _page_cache_failed = True
+                logging.warning(f"Page text cache unavailable: {e}")
+        return _page_cache
+
+
+def split_into_pages(file_bytes: bytes, mime_type: str) -> list[tuple[Optional[bytes], str, Optional[str]]]:
+    """
+    파일을 페이지 단위 (bytes, mime_type, text_layer) 리스트로 나눕니다.
+
+    - 이미지: 한 장 그대로 (text_layer=None)
+    - PDF: 텍스트 레이어가 있는 디지털 페이지는 로컬에서 추출한 텍스트만 (bytes=None),
+      스캔본이나 이미지가 많이 덮고 있는 페이지는 한 장짜리 PDF로 분리해 비전 OCR 대상으로 남깁니다.
+      PyMuPDF가 없으면 파일 통째로 한 페이지.
+    """
+    if mime_type != "application/pdf":
+        return [(file_bytes, mime_type, None)]
+
+    try:
+        import pymupdf
+        from pdf_text import page_text_layer
+    except ImportError:
+        return [(file_bytes, mime_type, None)]
+
+    try:
+        with pymupdf.open(stream=file_bytes, filetype="pdf") as source:
+            pages = []
+            for page_number, page in enumerate(source):
+                text_layer = page_text_layer(page)
+                if text_layer is not None:
+                    pages.append((None, mime_type, text_layer))
+                elif source.page_count == 1:
+                    pages.append((file_bytes, mime_type, None))
+                else:
+                    with pymupdf.open() as single:
+                        single.insert_pdf(source, from_page=page_number, to_page=page_number)
+                        pages.append((single.tobytes(garbage=3, deflate=True), mime_type, None))
+            return pages
+    except Exception as e:
+        logging.warning(f"PDF page split failed, sending whole file: {e}")
+        return [(file_bytes, mime_type, None)]
+
+
+def page_cache_key(file_hash: str, page_index: int) -> str:
+    # 분리된 한 장짜리 PDF 바이트는 실행마다 달라질 수 있어, 원본 파일 해시 + 페이지 번호를 키로 사용
+    return f"{OCR_PROMPT_VERSION}:{OCR_MODEL}:{file_hash}:{page_index}"
+
+
+def extract_page_text(page_bytes: bytes, mime_type: str) -> str:
+    """페이지 한 장에서 텍스트를 추출합니다 (일시적 오류는 resilience 계층에서 재시도)."""
+    from google.genai import types
+    from image_preprocess import prepare_image_for_upload
+
+    page_bytes, mime_type = prepare_image_for_upload(page_bytes, mime_type)
+    client = get_genai_client()
+    response = generate_content_resilient(
+        client,
+        OCR_MODEL,
+        [types.Part.from_bytes(data=bytes(page_bytes), mime_type=mime_type), OCR_PROMPT],
+        types.GenerateContentConfig(temperature=0.0),
+    )
+    return (response.text or "").strip()
+
+
+def extract_pages(
+    file_data_list: list[tuple[bytes, str]],
+    max_workers: int = OCR_MAX_WORKERS,
+    use_cache: bool = True,
+) -> list[PageText]:
+    """
+    모든 파일의 모든 페이지에서 텍스트를 병렬로 추출합니다 (최대 max_workers개 동시 호출).
+    텍스트 레이어가 있는 PDF 페이지와 캐시에 있는 페이지는 호출하지 않으며,
+    한 페이지가 실패해도 나머지 결과는 반환합니다.
+
+    Returns:
+        업로드 순서(파일, 페이지)대로 정렬된 PageText 리스트
+    """
+    cache = get_page_text_cache() if use_cache else None
+
+    pages = []
+    jobs = []
+    for file_index, (file_bytes, mime_type) in enumerate(file_data_list):
+        file_hash = hashlib.sha256(file_bytes).hexdigest()
+        for page_index, (page_bytes, page_mime, text_layer) in enumerate(split_into_pages(file_bytes, mime_type)):
+            if text_layer is not None:
+                pages.append(PageText(file_index, page_index, text_layer, cached=False, source="text_layer"))
+                continue
+
+            key = page_cache_key(file_hash, page_index)
+            cached_text = None
+            if cache is not None:
+                try:
+                    cached_text = cache.get(key)
+                except Exception as e:
+                    logging.warning(f"Page text cache read failed: {e}")
+            if cached_text is not None:
+                pages.append(PageText(file_index, page_index, cached_text, cached=True, source="cache"))
+            else:
+                jobs.append((file_index, page_index, key, page_bytes, page_mime))
+
+    def run(job) -> PageText:
+        file_index, page_index, key, page_bytes, page_mime = job
+        try:
+            text = extract_page_text(page_bytes, page_mime)
+        except Exception as e:
+            logging.error(f"Page OCR failed (file {file_index + 1}, page {page_index + 1}): {e}")
+            return PageText(file_index, page_index, "", cached=False, error=str(e))
+        if cache is not None and text:
+            try:
+                cache.set(key, text if PAGE_TEXT_CACHE_PATH == ":memory:" else anonymize_personal_info(text))
+            except Exception as e:
+                logging.warning(f"Page text cache write failed: {e}")
+        return PageText(file_index, page_index, text, cached=False)
+
+    if jobs:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs))), thread_name_prefix="page-ocr") as executor:
+            pages.extend(executor.map(run, jobs))
+
+    pages.sort(key=lambda page: (page.file_index, page.page_index))
+    logging.info(
+        f"Extracted {len(pages)} pages "
+        f"({sum(page.source == 'text_layer' for page in pages)} text layer, "
+        f"{sum(page.cached for page in pages)} cached, {sum(page.error is not None for page in pages)} failed)"
+    )
+    return pages
+
+
+def stitch_pages(pages: list[PageText]) -> str:
+    """페이지 텍스트를 순서대로 이어 붙입니다. 실패한 페이지는 자리 표시 문구로 남깁니다."""
+    parts = []
+    for number, page in enumerate(pages, 1):
+        if page.error is not None:
+            parts.append(f"[{number}페이지 텍스트를 읽지 못했어요]")
+        elif page.text:
+            parts.append(page.text)
+    return "\n\n".join(parts)
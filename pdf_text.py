@@ -0,0 +1,129 @@
+# 디지털 PDF 텍스트 레이어 로컬 추출 (스캔본 페이지만 비전 OCR로 보내기 위함)
+
+from __future__ import annotations
+
+import re
+from typing import NamedTuple, Optional
+
+# 이보다 글자가 적은 페이지는 스캔본(이미지)으로 보고 비전 OCR로 보냅니다
+MIN_TEXT_LAYER_CHARS = 20
+# 이미지가 페이지 면적의 이 비율 이상을 덮으면 텍스트 레이어가 있어도 비전 OCR로 보냅니다
+# (스캔 본문 위에 전자서명 스탬프/문서 ID 푸터 텍스트만 얹힌 페이지 등)
+MAX_IMAGE_COVERAGE = 0.3
+# 깨진 글자(�, 제어 문자) 비율이 이보다 높으면 폰트 인코딩이 깨진 PDF로 보고 비전 OCR로 보냅니다
+MAX_GARBLED_RATIO = 0.05
+# 줄바꿈 판정 시 블록 오른쪽 끝 허용 오차 (pt)
+WRAP_TOLERANCE = 2.0
+
+# CLEANING_RULES 2. 구조 유지: 조항/번호/목록으로 시작하는 줄은 항상 새 줄
+_STRUCTURE_RE = re.compile(
+    r"^\s*(?:"
+    r"제\s*\d+\s*[조항호장절]"
+    r"|\d+\s*[.)]"
+    r"|[가-하]\s*[.)]"
+    r"|\(\s*(?:\d+|[가-하])\s*\)"
+    r"|[①-⑳㉠-㉭]"
+    r"|[-•·▪※○●□■◦▶►]"
+    r")"
+)
+# 문장/항목이 끝난 줄 (마침표, 물음표, 콜론 등)
+_LINE_END_RE = re.compile(r"[.。!?:：;]\s*$")
+_GARBLED_RE = re.compile(r"[�\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class TextLine(NamedTuple):
+    text: str
+    x0: float
+    x1: float
+    block_x0: float
+    block_x1: float
+    block: int
+
+
+def _page_lines(page) -> list[TextLine]:
+    """페이지의 텍스트 줄을 읽는 순서대로 (블록/줄 좌표 포함) 반환합니다."""
+    lines = []
+    data = page.get_text("dict", sort=True)
+    for block_number, block in enumerate(data.get("blocks", [])):
+        if block.get("type") != 0:
+            continue
+        block_x0, _, block_x1, _ = block["bbox"]
+        for line in block.get("lines", []):
+            text = "".join(span.get("text", "") for span in line.get("spans", [])).strip()
+            if not text:
+                continue
+            x0, _, x1, _ = line["bbox"]
+            lines.append(TextLine(text, x0, x1, block_x0, block_x1, block_number))
+    return lines
+
+
+def _continues(previous: TextLine, line: TextLine) -> bool:
+    """
+    CLEANING_RULES 1. 문장 연결: 문장이 끝나지 않았고, 다음 줄이 새 조항/목록으로 시작하지 않으며,
+    다음 줄의 첫 어절이 이전 줄 뒤에 들어갈 자리가 없었다면(= 자동 줄바꿈) 같은 문장으로 봅니다.
+    """
+    if previous.block != line.block:
+        return False
+    if _LINE_END_RE.search(previous.text) or _STRUCTURE_RE.match(line.text):
+        return False
+
+    # 다음 줄의 글자 폭으로 첫 어절(+공백) 폭을 추정
+    char_width = (line.x1 - line.x0) / max(len(line.text), 1)
+    first_word = line.text.split()[0]
+    needed = (len(first_word) + 1) * char_width
+    return previous.x1 + needed >= previous.block_x1 - WRAP_TOLERANCE
+
+
+def merge_lines(lines: list[TextLine]) -> str:
+    """줄 목록을 CLEANING_RULES의 줄바꿈 규칙대로 이어 붙입니다. 블록(문단) 사이는 빈 줄."""
+    parts: list[str] = []
+    previous: Optional[TextLine] = None
+    for line in lines:
+        if previous is None:
+            parts.append(line.text)
+        elif _continues(previous, line):
+            parts.append(" " + line.text)
+        elif previous.block != line.block:
+            parts.append("\n\n" + line.text)
+        else:
+            parts.append("\n" + line.text)
+        previous = line
+    return "".join(parts)
+
+
+def is_text_page(text: str) -> bool:
+    """텍스트 레이어만으로 충분한 페이지인지 (글자 수, 깨진 글자 비율)."""
+    visible = re.sub(r"\s", "", text)
+    if len(visible) < MIN_TEXT_LAYER_CHARS:
+        return False
+    return len(_GARBLED_RE.findall(visible)) / len(visible) <= MAX_GARBLED_RATIO
+
+
+def image_coverage(page) -> float:
+    """페이지 면적 중 이미지가 덮는 비율 (0~1, 이미지끼리 겹치는 부분은 중복으로 세고 1에서 자름)."""
+    x0, y0, x1, y1 = page.rect
+    page_area = (x1 - x0) * (y1 - y0)
+    if page_area <= 0:
+        return 0.0
+
+    covered = 0.0
+    for info in page.get_image_info():
+        bx0, by0, bx1, by1 = info["bbox"]
+        width = min(bx1, x1) - max(bx0, x0)
+        height = min(by1, y1) - max(by0, y0)
+        if width > 0 and height > 0:
+            covered += width * height
+    return min(1.0, covered / page_area)
+
+
+def page_text_layer(page) -> Optional[str]:
+    """
+    PyMuPDF Page의 텍스트 레이어를 줄바꿈 정제 후 반환합니다.
+    텍스트 레이어가 없거나 부족한 스캔본 페이지, 이미지가 많이 덮고 있는 페이지(스캔 본문 + 스탬프 텍스트 등)면
+    None (비전 OCR 대상).
+    """
+    if image_coverage(page) >= MAX_IMAGE_COVERAGE:
+        return None
+    text = merge_lines(_page_lines(page))
+    return text if is_text_page(text) else None
+
@@ -0,0 +1,187 @@
+# 고정 시스템 프롬프트의 Gemini 명시적 컨텍스트 캐시 (요청마다 수천 토큰의 프롬프트를 다시 보내지 않음)
+
+from __future__ import annotations
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+PROMPT_CACHE_ENABLED = os.environ.get("PROMPT_CACHE_ENABLED", "1") != "0"
+PROMPT_CACHE_TTL_SECONDS = int(os.environ.get("PROMPT_CACHE_TTL_SECONDS", "3600"))
+# 만료까지 이 시간보다 적게 남으면 TTL을 연장 (요청 도중 만료되지 않도록)
+PROMPT_CACHE_REFRESH_MARGIN_SECONDS = int(os.environ.get("PROMPT_CACHE_REFRESH_MARGIN_SECONDS", "300"))
+# 캐시 생성이 실패하면(모델 미지원, 최소 토큰 수 미달, 할당량 등) 이 시간 동안은 다시 시도하지 않고 프롬프트를 그대로 보냄
+PROMPT_CACHE_RETRY_SECONDS = float(os.environ.get("PROMPT_CACHE_RETRY_SECONDS", "600"))
+
+
+class PromptPrefixCache:
+    """
+    시스템 프롬프트 하나를 Gemini 컨텍스트 캐시(client.caches)에 올려두고 이름을 돌려주는 관리자.
+
+    - get(client): 유효한 캐시 이름 (없으면 생성, 만료가 가까우면 TTL 연장)
+    - 캐시를 쓸 수 없으면 None → 호출 측은 system_instruction으로 프롬프트를 그대로 보냄
+    - 클라이언트(API 키)나 프롬프트가 바뀌면 새로 생성 (교체된 캐시는 지움)
+    - 생성/연장은 한 요청만 잠금 밖에서 수행하고, 그동안 다른 요청은 기존 캐시나 인라인 프롬프트를 씀
+    """
+
+    def __init__(
+        self,
+        model: str,
+        system_prompt: str,
+        ttl_seconds: int = PROMPT_CACHE_TTL_SECONDS,
+        refresh_margin: int = PROMPT_CACHE_REFRESH_MARGIN_SECONDS,
+        retry_seconds: float = PROMPT_CACHE_RETRY_SECONDS,
+        enabled: bool = PROMPT_CACHE_ENABLED,
+    ):
+        self.model = model
+        self.system_prompt = system_prompt
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self.retry_seconds = retry_seconds
+        self.enabled = enabled
+        self.prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+        self._lock = threading.Lock()
+        self._client = None
+        self._name: Optional[str] = None
+        self._expires_at = 0.0
+        self._retry_after = 0.0
+        # 생성/연장 요청은 한 번에 하나만 (네트워크 호출은 잠금 밖에서), 클라이언트가 바뀌면 세대 증가
+        self._renewing = False
+        self._generation = 0
+
+        self._hits = 0
+        self._creates = 0
+        self._refreshes = 0
+        self._fallbacks = 0
+
+    def _ttl(self) -> str:
+        return f"{self.ttl_seconds}s"
+
+    def _create(self, client) -> str:
+        from google.genai import types
+
+        cached = client.caches.create(
+            model=self.model,
+            config=types.CreateCachedContentConfig(
+                display_name=f"contract-analysis-{self.prompt_hash}",
+                system_instruction=self.system_prompt,
+                ttl=self._ttl(),
+            ),
+        )
+        logging.info(f"Prompt cache created: {cached.name} ({self.model}, ttl {self.ttl_seconds}s)")
+        return cached.name
+
+    def _refresh(self, client, name: str) -> None:
+        from google.genai import types
+
+        client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=self._ttl()))
+
+    @staticmethod
+    def _delete(client, name: str) -> None:
+        """더 이상 쓰지 않는 캐시를 지웁니다 (실패해도 TTL이 지나면 서버에서 사라짐)."""
+        try:
+            client.caches.delete(name=name)
+        except Exception as e:
+            logging.warning(f"Prompt cache delete failed for {name}: {e}")
+
+    def get(self, client) -> Optional[str]:
+        """요청에 넣을 cached_content 이름 (캐시를 쓸 수 없으면 None)."""
+        if not self.enabled:
+            return None
+
+        replaced, renew = None, None
+        with self._lock:
+            now = time.monotonic()
+            if self._client is not client:
+                # API 키가 바뀌어 클라이언트가 새로 만들어졌으면 이전 캐시는 다른 프로젝트 소유일 수 있음
+                if self._client is not None and self._name is not None:
+                    replaced = (self._client, self._name)
+                self._client, self._name, self._expires_at, self._retry_after = client, None, 0.0, 0.0
+                self._renewing = False
+                self._generation += 1
+
+            if self._name is not None and now < self._expires_at - self.refresh_margin:
+                self._hits += 1
+                name = self._name
+            elif self._renewing or (self._name is None and now < self._retry_after):
+                # 다른 요청이 생성/연장 중이면 아직 유효한 캐시를 쓰고, 없으면 프롬프트를 그대로 보냄
+                if self._name is not None and now < self._expires_at:
+                    self._hits += 1
+                    name = self._name
+                else:
+                    self._fallbacks += 1
+                    name = None
+            else:
+                self._renewing = True
+                renew = (self._name if now < self._expires_at else None, self._generation)
+
+        if replaced is not None:
+            self._delete(*replaced)
+        if renew is not None:
+            return self._renew(client, *renew)
+        return name
+
+    def _renew(self, client, current: Optional[str], generation: int) -> Optional[str]:
+        """get()에서 생성/연장을 맡은 요청만 잠금 밖에서 호출합니다. current가 있으면 TTL 연장, 없거나 실패하면 새로 생성."""
+        name, refreshed, stale = None, False, None
+        try:
+            if current is not None:
+                try:
+                    self._refresh(client, current)
+                    name, refreshed = current, True
+                except Exception as e:
+                    # 서버 쪽에서 지워졌거나 이미 만료된 경우 새로 생성 (남아 있으면 지움)
+                    logging.warning(f"Prompt cache refresh failed, recreating: {e}")
+                    stale = current
+            if name is None:
+                name = self._create(client)
+        except Exception as e:
+            logging.warning(f"Prompt cache unavailable, sending system prompt inline: {e}")
+            name = None
+
+        orphan = None
+        with self._lock:
+            if generation == self._generation:
+                self._renewing = False
+                if name is not None:
+                    self._name = name
+                    self._expires_at = time.monotonic() + self.ttl_seconds
+                    if refreshed:
+                        self._refreshes += 1
+                    else:
+                        self._creates += 1
+                else:
+                    self._name = None
+                    self._retry_after = time.monotonic() + self.retry_seconds
+                    self._fallbacks += 1
+            elif name is not None:
+                # 기다리는 동안 클라이언트가 바뀜 → 이전 클라이언트로 만든 캐시는 쓰지 않음
+                orphan, name = name, None
+
+        if stale is not None:
+            self._delete(client, stale)
+        if orphan is not None:
+            self._delete(client, orphan)
+        return name
+
+    def invalidate(self) -> None:
+        """현재 캐시 이름을 버립니다 (요청이 캐시를 찾지 못했다고 실패한 경우 등). 다음 get()에서 새로 생성."""
+        with self._lock:
+            self._name = None
+            self._expires_at = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "model": self.model,
+                "cache_name": self._name,
+                "expires_in": max(0.0, self._expires_at - time.monotonic()) if self._name else 0.0,
+                "hits": self._hits,
+                "creates": self._creates,
+                "refreshes": self._refreshes,
+                "fallbacks": self._fallbacks,
+            }
@@ -0,0 +1,273 @@
+# Gemini 호출 복원력 계층 (오류 분류 재시도, 지수 백오프 + 지터, 호출 마감 시간, 헤지 요청)
+
+from __future__ import annotations
+
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import Callable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+GEMINI_MAX_ATTEMPTS = int(os.environ.get("GEMINI_MAX_ATTEMPTS", "3"))
+GEMINI_BACKOFF_BASE_SECONDS = float(os.environ.get("GEMINI_BACKOFF_BASE_SECONDS", "1.0"))
+GEMINI_BACKOFF_MAX_SECONDS = float(os.environ.get("GEMINI_BACKOFF_MAX_SECONDS", "16"))
+# 재시도까지 포함한 호출 하나의 전체 마감 시간
+GEMINI_CALL_DEADLINE_SECONDS = float(os.environ.get("GEMINI_CALL_DEADLINE_SECONDS", "180"))
+# 헤지 요청: 응답이 최근 지연 시간 p95를 넘기면 같은 요청을 하나 더 보내고 먼저 온 응답을 사용
+# (토큰 비용이 늘어나므로 기본값은 꺼짐)
+GEMINI_HEDGE_ENABLED = os.environ.get("GEMINI_HEDGE_ENABLED", "").lower() in ("1", "true", "yes")
+GEMINI_HEDGE_PERCENTILE = float(os.environ.get("GEMINI_HEDGE_PERCENTILE", "0.95"))
+GEMINI_HEDGE_MIN_SAMPLES = int(os.environ.get("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+# call_with_timeout 전용 스레드 수 (타임아웃으로 버려진 호출이 끝날 때까지 스레드를 하나씩 잡고 있음)
+CALL_TIMEOUT_WORKERS = int(os.environ.get("CALL_TIMEOUT_WORKERS", "8"))
+
+# 일시적 오류로 보고 재시도하는 HTTP 상태 코드
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(TimeoutError):
+    """재시도를 포함한 전체 마감 시간을 넘긴 경우."""
+
+
+def _error_chain(error: BaseException) -> Iterator[BaseException]:
+    """error와 그 원인(__cause__, 없으면 __context__)을 바깥쪽부터 차례로 (순환 방지)."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    for attribute in ("code", "status_code"):
+        code = getattr(error, attribute, None)
+        if isinstance(code, int) and not isinstance(code, bool):
+            return int(code)
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    재시도해도 되는 일시적 오류인지 분류합니다.
+
+    - 재시도: 429/5xx/408 응답, 연결/읽기 타임아웃, 연결 끊김
+    - 즉시 실패: 400/401/403/404 등 요청 자체의 문제, 응답 파싱 오류
+
+    langchain 임베딩처럼 원래 오류를 감싸서 다시 던지는 경우를 위해 원인 체인을 따라가며
+    상태 코드나 전송 오류가 처음 보이는 곳에서 판정합니다.
+    """
+    try:
+        import httpx
+        transport_errors = (httpx.TimeoutException, httpx.TransportError, TimeoutError, ConnectionError)
+    except ImportError:
+        transport_errors = (TimeoutError, ConnectionError)
+
+    for link in _error_chain(error):
+        code = _status_code(link)
+        if code is not None:
+            return code in RETRYABLE_STATUS_CODES
+        if isinstance(link, transport_errors):
+            return True
+    return False
+
+
+def backoff_delay(attempt: int, base: float = GEMINI_BACKOFF_BASE_SECONDS, cap: float = GEMINI_BACKOFF_MAX_SECONDS) -> float:
+    """attempt번째(0부터) 재시도 전 대기 시간 (full jitter: 0 ~ min(cap, base × 2^attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class LatencyTracker:
+    """최근 성공한 호출의 지연 시간으로 백분위수를 계산합니다 (헤지 기준)."""
+
+    def __init__(self, max_samples: int = 200, min_samples: int = GEMINI_HEDGE_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: deque[float] = deque(maxlen=max_samples)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """표본이 min_samples개 미만이면 None."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class TokenBucket:
+    """
+    토큰 버킷 요청 제한기. 초당 rate개씩 채워지고 최대 capacity개까지 모입니다.
+    acquire(n)은 토큰 n개가 모일 때까지 기다립니다 (여러 스레드가 공유 가능).
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill_locked(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """토큰을 가져가고 기다린 시간(초)을 반환합니다. capacity보다 큰 요청은 capacity만큼만 기다립니다."""
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill_locked(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_trackers: dict[str, LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="gemini-hedge")
+# 버려진 임베딩 호출이 헤지 요청 스레드를 차지하지 않도록 실행기를 분리
+_timeout_executor = ThreadPoolExecutor(max_workers=CALL_TIMEOUT_WORKERS, thread_name_prefix="call-timeout")
+
+
+def get_latency_tracker(name: str) -> LatencyTracker:
+    """호출 종류(모델/용도)별 LatencyTracker."""
+    with _trackers_lock:
+        tracker = _trackers.get(name)
+        if tracker is None:
+            tracker = _trackers[name] = LatencyTracker()
+        return tracker
+
+
+def with_call_timeout(config, seconds: float):
+    """GenerateContentConfig 사본에 요청 타임아웃(http_options.timeout, ms)을 넣어 반환합니다."""
+    from google.genai import types
+
+    timeout_ms = max(1000, int(seconds * 1000))
+    http_options = config.http_options.model_copy() if config.http_options else types.HttpOptions()
+    http_options.timeout = timeout_ms
+    return config.model_copy(update={"http_options": http_options})
+
+
+def call_with_timeout(fn: Callable[[], T], seconds: float) -> T:
+    """
+    타임아웃 옵션이 없는 동기 호출 fn()을 seconds초까지만 기다립니다 (넘으면 TimeoutError → 재시도 대상).
+    늦게 끝나는 호출은 뒤에서 마저 끝나고 결과는 버려집니다.
+    """
+    future = _timeout_executor.submit(fn)
+    try:
+        return future.result(timeout=max(0.0, seconds))
+    except FutureTimeoutError:
+        future.cancel()
+        raise TimeoutError(f"{seconds:.1f}초 안에 응답을 받지 못했어요") from None
+
+
+def _hedged(attempt_fn: Callable[[float], T], timeout: float, hedge_after: float) -> T:
+    """첫 요청이 hedge_after초 안에 끝나지 않으면 같은 요청을 하나 더 보내고 먼저 성공한 결과를 반환합니다."""
+    primary = _hedge_executor.submit(attempt_fn, timeout)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        return primary.result()
+
+    logging.info(f"Sending hedged Gemini request after {hedge_after:.1f}s")
+    hedge = _hedge_executor.submit(attempt_fn, max(1.0, timeout - hedge_after))
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                # 늦게 끝나는 쪽은 백그라운드에서 마저 끝나고 결과는 버려집니다
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def call_with_resilience(
+    attempt_fn: Callable[[float], T],
+    *,
+    name: str = "gemini",
+    deadline: float = GEMINI_CALL_DEADLINE_SECONDS,
+    max_attempts: int = GEMINI_MAX_ATTEMPTS,
+    hedge: bool = GEMINI_HEDGE_ENABLED,
+) -> T:
+    """
+    attempt_fn(남은 시간 초)을 일시적 오류에 한해 재시도하며 호출합니다.
+
+    Args:
+        attempt_fn: 한 번의 호출. 인자로 받은 시간을 요청 타임아웃으로 사용해야 합니다.
+        name: 지연 시간 통계(헤지 기준) 구분용 이름
+        deadline: 재시도/백오프를 포함한 전체 마감 시간 (초)
+        max_attempts: 최대 시도 횟수
+        hedge: True이면 최근 p95 지연 시간을 넘긴 요청에 헤지 요청을 추가로 보냄
+
+    Raises:
+        DeadlineExceeded: 마감 시간 안에 성공하지 못함
+        재시도할 수 없는 오류는 그대로 전달
+    """
+    tracker = get_latency_tracker(name)
+    started = time.monotonic()
+    last_error: Optional[BaseException] = None
+
+    for attempt in range(max_attempts):
+        remaining = deadline - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+
+        hedge_after = tracker.percentile(GEMINI_HEDGE_PERCENTILE) if hedge else None
+        call_started = time.monotonic()
+        try:
+            if hedge_after is not None and hedge_after < remaining:
+                result = _hedged(attempt_fn, remaining, hedge_after)
+            else:
+                result = attempt_fn(remaining)
+            tracker.record(time.monotonic() - call_started)
+            return result
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            last_error = e
+
+        if attempt + 1 < max_attempts:
+            delay = min(backoff_delay(attempt), max(0.0, deadline - (time.monotonic() - started)))
+            logging.warning(f"{name} call failed (attempt {attempt + 1}/{max_attempts}), retrying in {delay:.1f}s: {last_error}")
+            time.sleep(delay)
+
+    if last_error is not None and time.monotonic() - started < deadline:
+        raise last_error
+    raise DeadlineExceeded(f"{deadline:.0f}초 안에 응답을 받지 못했어요 (마지막 오류: {last_error})")
+
+
+def stream_with_resilience(
+    open_stream: Callable[[float], Iterator[T]],
+    *,
+    name: str = "gemini-stream",
+    deadline: float = GEMINI_CALL_DEADLINE_SECONDS,
+    max_attempts: int = GEMINI_MAX_ATTEMPTS,
+) -> Iterator[T]:
+    """
+    스트리밍 호출용 재시도. 첫 조각을 받기 전의 일시적 오류만 재시도합니다.
+    (이미 조각을 내보낸 뒤에 끊기면 앞부분이 중복되므로 그대로 오류를 전달)
+    """
+    def first_chunk(timeout: float):
+        stream = iter(open_stream(timeout))
+        return stream, next(stream, None)
+
+    stream, chunk = call_with_resilience(
+        first_chunk, name=name, deadline=deadline, max_attempts=max_attempts, hedge=False
+    )
+    if chunk is None:
+        return
+    yield chunk
+    yield from stream
@@ -0,0 +1,298 @@
+# MANDATORY_RISK_CLAUSES 로컬 규칙 엔진 (LLM 호출 전에 위반 후보를 찾아 모델에 확인을 맡기고, 모델 장애 시 대체 결과로 사용)
+
+from __future__ import annotations
+
+import re
+from typing import Callable, Optional
+
+from gemini_analyzer import (
+    AnalysisItem,
+    ContractAnalysisResult,
+    MANDATORY_RISK_CLAUSES,
+    MINIMUM_WAGE_BY_YEAR,
+    MINIMUM_WAGE_YEAR,
+)
+
+# 주 40시간 기준 월 소정근로시간 계산용 (365일 / 7일 / 12개월)
+WEEKS_PER_MONTH = 365 / 7 / 12
+
+_SENTENCE_RE = re.compile(r"[^\n]+?(?:[가-힣)][.。](?=\s)|$)", re.MULTILINE)
+_YEAR_RE = re.compile(r"(20\d{2})\s*년")
+_AMOUNT = r"(\d{1,3}(?:,\d{3})+|\d+)\s*(만\s*)?원"
+
+# 키워드 뒤 같은 구절의 끝 (쉼표, 연결 어미)
+_CLAUSE_BREAK_RE = re.compile(r"[,，;]|(?:하며|하고|하되|이며|으며)\s")
+
+_PENALTY_RE = re.compile(r"위약금|벌금|페널티|패널티")
+_DAMAGES_RE = re.compile(r"손해\s*배상|배상금")
+# "위약금이나 벌금을 부과하지 않는다", "위약금 약정은 무효로 한다"
+_PENALTY_NEGATION_RE = re.compile(
+    r"(?:부과|청구|요구|공제|징수|예정|약정|정)\s*(?:하지|되지)\s*(?:않|아니)|(?:두지|받지)\s*(?:않|아니)"
+    r"|없(?:다|음|으며|고|는)|무효|금지|불가"
+)
+_PENALTY_TRIGGER_RE = re.compile(r"퇴사|퇴직|그만|중도\s*해지|계약\s*(?:위반|불이행|해지)|지각|결근|무단")
+_AMOUNT_RE = re.compile(_AMOUNT)
+_PREDETERMINED_RE = re.compile(r"위약금|벌금|" + _AMOUNT + r"|월급의?\s*\d+\s*%|\d+\s*개월\s*분")
+
+_OVERTIME_RE = re.compile(r"(연장|야간|휴일|초과)\s*(근로|근무|수당)|야근|주말\s*근무")
+_PREMIUM_RE = re.compile(r"50\s*%|150\s*%|1\.5\s*배|가산")
+_SAME_PAY_RE = re.compile(r"통상\s*임금|기본\s*시급|동일한?\s*(시급|임금)|추가\s*수당\s*(없|미지급)|별도\s*수당\s*(없|미지급)")
+_INCLUSIVE_WAGE_RE = re.compile(r"포괄\s*임금|포괄\s*산정|제\s*수당\s*(을\s*)?포함|(연장|야간|휴일)[^.\n]{0,20}수당[^.\n]{0,10}포함")
+
+_HOURLY_WAGE_RE = re.compile(r"(?:시급|시간급|시간당)\s*[:：]?\s*" + _AMOUNT)
+_MONTHLY_WAGE_RE = re.compile(r"(?:월급|월\s*임금|월\s*급여|기본급)\s*[:：]?\s*" + _AMOUNT)
+_WEEKLY_HOURS_RE = re.compile(r"(?:1\s*)?주(?:당|일)?\s*(?:에\s*)?(\d{1,2}(?:\.\d+)?)\s*시간")
+# 소정근로시간은 근로시간 조항(제목 줄에 근로시간이 있는 조항)에서 찾고, 연장근로 한도 등은 제외
+_ARTICLE_HEADING_RE = re.compile(r"^\s*제\s*\d+\s*조", re.MULTILINE)
+_WORKING_HOURS_TOPIC_RE = re.compile(r"(?:소정\s*)?근로\s*시간|근무\s*시간|근무\s*일\s*(?:및|과|/)\s*시간")
+_HOURS_LIMIT_RE = re.compile(r"연장|초과|한도|최대|야간|휴일")
+
+# 휴게시간 자체를 없애거나 미루는 문구만 ("휴게시간 중 업무 지시는 없음"은 제외)
+_BREAK_VIOLATION_RE = re.compile(
+    r"휴게\s*(?:시간)?\s*(?:은|는|이|을)?\s*(?:없(?:음|다|이|으며|고)|미부여|부여하지\s*않|주지\s*않|별도\s*협의|알아서)"
+    r"|휴게[^.\n]{0,20}?(?:손님이\s*없을\s*때|틈틈이|한가할\s*때)"
+)
+
+_SEVERANCE_DENIAL_RE = re.compile(
+    r"퇴직금[^.,\n]{0,15}?(?:없(?:음|다|으며|고|이)|지급하지\s*않|지급\s*안|미지급|지급\s*불가|청구하지\s*않|청구할\s*수\s*없)"
+)
+# "퇴직금은 월급에 포함", "월 급여에는 퇴직금이 포함되어"
+_SEVERANCE_INCLUDED_RE = re.compile(
+    r"퇴직금[^.\n]{0,20}?(?:월급|급여|임금|연봉|시급|기본급)[^.\n]{0,6}?포함"
+    r"|(?:월급|급여|임금|연봉|시급|기본급)[^.\n]{0,10}?퇴직금[^.\n]{0,6}?포함"
+)
+# 1년 미만 근무자 미지급(법정 요건), 퇴직금 산정 기준 설명은 위반이 아님
+_SEVERANCE_UNDER_ONE_YEAR_RE = re.compile(r"1\s*년\s*미만")
+_SEVERANCE_CALCULATION_RE = re.compile(r"산정|평균\s*임금")
+
+_REVISION_RE = re.compile(r"수정|재작업|보완")
+_UNLIMITED_REVISION_RE = re.compile(r"무한|무제한|횟수\s*제한\s*(없|無)|제한\s*없이|만족할\s*때까지|요구하는\s*대로|무상으로\s*계속")
+# 무상 수정 횟수를 정하고 이후는 유상으로 하는 문구 (권장 대응 그대로)
+_REVISION_LIMIT_RE = re.compile(r"\d+\s*(?:회|번|차)\s*(?:까지|이내|한도|로\s*제한)|유상|추가\s*(?:비용|대금|보수|요금)")
+
+
+def _parse_amount(number: str, man: Optional[str]) -> int:
+    value = int(number.replace(",", ""))
+    return value * 10000 if man else value
+
+
+def _minimum_wage_for(text: str) -> tuple[int, int]:
+    """계약서에 적힌 연도(없으면 프롬프트와 같은 MINIMUM_WAGE_YEAR)의 최저시급을 반환합니다."""
+    years = [int(y) for y in _YEAR_RE.findall(text)]
+    year = max(years) if years else MINIMUM_WAGE_YEAR
+    known = sorted(MINIMUM_WAGE_BY_YEAR)
+    year = min(max(year, known[0]), known[-1])
+    return year, MINIMUM_WAGE_BY_YEAR[year]
+
+
+def _negated_after(sentence: str, match: re.Match, negation_re: re.Pattern) -> bool:
+    """키워드 뒤 같은 구절(쉼표/연결 어미 전까지)에 부정/금지 표현이 있는지."""
+    tail = sentence[match.end():]
+    cut = _CLAUSE_BREAK_RE.search(tail)
+    return bool(negation_re.search(tail[:cut.start()] if cut else tail))
+
+
+def _asserted(keyword_re: re.Pattern, sentence: str, negation_re: re.Pattern) -> bool:
+    """키워드가 부정되지 않은 채로 한 번이라도 쓰였는지."""
+    return any(not _negated_after(sentence, match, negation_re) for match in keyword_re.finditer(sentence))
+
+
+def _check_penalty(sentence: str, context: dict) -> Optional[str]:
+    has_trigger = _PENALTY_TRIGGER_RE.search(sentence)
+    if _asserted(_PENALTY_RE, sentence, _PENALTY_NEGATION_RE) and (has_trigger or _AMOUNT_RE.search(sentence)):
+        return "위약금/벌금을 미리 정해둔 문구예요."
+    if (
+        has_trigger
+        and _PREDETERMINED_RE.search(sentence)
+        and _asserted(_DAMAGES_RE, sentence, _PENALTY_NEGATION_RE)
+    ):
+        return "퇴사·지각 등에 대한 손해배상액을 미리 정해둔 문구예요."
+    return None
+
+
+def _check_overtime(sentence: str, context: dict) -> Optional[str]:
+    if _INCLUSIVE_WAGE_RE.search(sentence):
+        return "포괄임금 문구로 연장·야간·휴일 가산수당이 사라질 수 있어요."
+    if _OVERTIME_RE.search(sentence) and not _PREMIUM_RE.search(sentence) and _SAME_PAY_RE.search(sentence):
+        return "연장·야간·휴일근로에 50% 가산 없이 통상임금만 주는 문구예요."
+    return None
+
+
+def _check_minimum_wage(sentence: str, context: dict) -> Optional[str]:
+    year, minimum = context["minimum_wage"]
+
+    match = _HOURLY_WAGE_RE.search(sentence)
+    if match:
+        hourly = _parse_amount(match.group(1), match.group(2))
+        if 0 < hourly < minimum:
+            return f"시급 {hourly:,}원은 {year}년 최저시급 {minimum:,}원보다 {minimum - hourly:,}원 적어요."
+        return None
+
+    match = _MONTHLY_WAGE_RE.search(sentence)
+    weekly_hours = context["weekly_hours"]
+    if match and weekly_hours:
+        monthly = _parse_amount(match.group(1), match.group(2))
+        # 주 15시간 이상이면 주휴시간(주 소정근로시간 / 40 × 8, 최대 8시간) 포함
+        paid_weekly_hours = weekly_hours
+        if weekly_hours >= 15:
+            paid_weekly_hours += min(weekly_hours / 40 * 8, 8)
+        monthly_hours = paid_weekly_hours * WEEKS_PER_MONTH
+        hourly = monthly / monthly_hours
+        if 0 < hourly < minimum:
+            return (
+                f"월급 {monthly:,}원 ÷ 월 {monthly_hours:.0f}시간(주휴 포함) = 시급 약 {hourly:,.0f}원으로, "
+                f"{year}년 최저시급 {minimum:,}원보다 낮아요."
+            )
+    return None
+
+
+def _check_break_time(sentence: str, context: dict) -> Optional[str]:
+    if _BREAK_VIOLATION_RE.search(sentence):
+        return "휴게시간이 명확히 보장되지 않는 문구예요."
+    return None
+
+
+def _check_severance(sentence: str, context: dict) -> Optional[str]:
+    if _SEVERANCE_DENIAL_RE.search(sentence) and not _SEVERANCE_UNDER_ONE_YEAR_RE.search(sentence):
+        return "퇴직금을 주지 않는 문구예요."
+    if _SEVERANCE_INCLUDED_RE.search(sentence) and not _SEVERANCE_CALCULATION_RE.search(sentence):
+        return "퇴직금을 월급에 포함시키는 문구예요."
+    return None
+
+
+def _check_unlimited_revision(sentence: str, context: dict) -> Optional[str]:
+    if (
+        _REVISION_RE.search(sentence)
+        and _UNLIMITED_REVISION_RE.search(sentence)
+        and not _REVISION_LIMIT_RE.search(sentence)
+    ):
+        return "수정 횟수에 제한이 없는 문구예요."
+    return None
+
+
+# clause_id -> 판정 함수 (문장, 문서 컨텍스트) -> 근거 문자열 또는 None
+RULE_CHECKS: dict[str, Callable[[str, dict], Optional[str]]] = {
+    "mandatory_labor_01": _check_penalty,
+    "mandatory_labor_02": _check_overtime,
+    "mandatory_wage_01": _check_minimum_wage,
+    "mandatory_labor_03": _check_break_time,
+    "mandatory_retirement_01": _check_severance,
+    "mandatory_subcontract_01": _check_unlimited_revision,
+}
+
+_CLAUSES_BY_ID = {clause["clause_id"]: clause for clause in MANDATORY_RISK_CLAUSES}
+
+
+def split_sentences(text: str) -> list[str]:
+    """줄/문장 단위로 나눕니다. 각 문장은 text의 정확한 부분 문자열입니다 (하이라이트용)."""
+    sentences = []
+    for match in _SENTENCE_RE.finditer(text):
+        sentence = match.group(0).strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+def _weekly_working_hours(text: str) -> Optional[float]:
+    """
+    근로시간 조항의 "주 N시간" (소정근로시간).
+    제목 줄에 근로시간이 있는 조항에서 찾고, 그런 조항이 없으면 근로시간을 언급한 문장에서 찾습니다.
+    연장근로 한도("연장근로는 주 12시간 이내") 같은 문장은 건너뜁니다.
+    """
+    starts = [match.start() for match in _ARTICLE_HEADING_RE.finditer(text)]
+    sections = [text[start:end] for start, end in zip(starts, starts[1:] + [len(text)])]
+    topic_sections = [section for section in sections if _WORKING_HOURS_TOPIC_RE.search(section.strip().split("\n", 1)[0])]
+    if topic_sections:
+        candidates = [sentence for section in topic_sections for sentence in split_sentences(section)]
+    else:
+        candidates = [sentence for sentence in split_sentences(text) if _WORKING_HOURS_TOPIC_RE.search(sentence)]
+
+    for sentence in candidates:
+        if _HOURS_LIMIT_RE.search(sentence):
+            continue
+        match = _WEEKLY_HOURS_RE.search(sentence)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def check_mandatory_rules(text: str) -> list[AnalysisItem]:
+    """
+    계약서 텍스트를 MANDATORY_RISK_CLAUSES 규칙으로 검사합니다.
+
+    Args:
+        text: 추출된 계약서 텍스트
+
+    Returns:
+        위반 의심 문장별 AnalysisItem 리스트 (original_text는 text의 부분 문자열)
+    """
+    if not text:
+        return []
+
+    context = {
+        "minimum_wage": _minimum_wage_for(text),
+        "weekly_hours": _weekly_working_hours(text),
+    }
+
+    hits = []
+    seen = set()
+    for sentence in split_sentences(text):
+        for clause_id, check in RULE_CHECKS.items():
+            detail = check(sentence, context)
+            if not detail or (clause_id, sentence) in seen:
+                continue
+            seen.add((clause_id, sentence))
+
+            clause = _CLAUSES_BY_ID[clause_id]
+            hits.append(AnalysisItem(
+                category=clause["category"],
+                original_text=sentence,
+                explanation=f"{detail} {clause['explanation']} ({clause['legal_reference']})",
+                script=clause["script"],
+            ))
+
+    return hits
+
+
+def merge_rule_hits(result: ContractAnalysisResult, hits: list[AnalysisItem]) -> ContractAnalysisResult:
+    """
+    규칙 엔진 결과 중 LLM이 이미 짚은 문장과 겹치지 않는 것만 risk_clauses에 추가합니다.
+    """
+    for hit in hits:
+        covered = any(
+            hit.original_text in clause.original_text or clause.original_text in hit.original_text
+            for clause in result.risk_clauses
+            if clause.original_text
+        )
+        if not covered:
+            result.risk_clauses.append(hit)
+    return result
+
+
+def confirmed_rule_hits(hits: list[AnalysisItem], numbers) -> list[AnalysisItem]:
+    """모델이 위반으로 확인한 후보 번호(1부터)의 규칙 엔진 결과만 골라냅니다 (범위 밖/중복 번호는 무시)."""
+    confirmed = []
+    for number in dict.fromkeys(numbers or []):
+        if isinstance(number, int) and not isinstance(number, bool) and 1 <= number <= len(hits):
+            confirmed.append(hits[number - 1])
+    return confirmed
+
+
+def build_rule_based_result(text: str, hits: Optional[list[AnalysisItem]] = None) -> ContractAnalysisResult:
+    """
+    LLM 없이 규칙 엔진만으로 분석 결과를 만듭니다 (API 장애/지연 시 오프라인 대체용).
+    hits: 이미 계산한 check_mandatory_rules(text) 결과 (없으면 새로 검사)
+    """
+    if hits is None:
+        hits = check_mandatory_rules(text)
+    if hits:
+        summary = f"🚨 기본 규칙 검사에서 위반이 의심되는 조항 {len(hits)}개를 찾았어요. AI가 확인하기 전 결과이니 자세한 분석은 잠시 후 다시 시도해주세요."
+    else:
+        summary = "기본 규칙 검사에서는 명백한 위반 조항이 보이지 않았어요. 자세한 AI 분석은 잠시 후 다시 시도해주세요."
+
+    return ContractAnalysisResult(
+        extracted_text=text,
+        risk_clauses=hits,
+        missing_clauses=[],
+        summary=summary,
+    )
@@ -0,0 +1,89 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import analysis_pipeline
+import gemini_analyzer
+import legal_citations
+
+CONTRACT_TEXT = "근로계약서\n제1조 지각 시 벌금 10만원을 공제한다.\n제2조 근무 장소는 본사로 한다."
+
+
+class FakeModels:
+    def __init__(self, fail=False, confirmed=(1,)):
+        self.fail = fail
+        self.confirmed = list(confirmed)
+        self.prompts = []
+
+    def generate_content(self, model, contents, config):
+        self.prompts.append(contents[0])
+        if self.fail:
+            raise ValueError("model unavailable")
+        return SimpleNamespace(text=json.dumps({
+            "confirmed_rule_candidates": self.confirmed,
+            "risk_clauses": [],
+            "missing_clauses": [],
+            "summary": "ok",
+        }))
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    models = FakeModels()
+    monkeypatch.setattr(gemini_analyzer, "get_genai_client", lambda: SimpleNamespace(models=models))
+    monkeypatch.setattr(gemini_analyzer, "extract_contract_text", lambda files: CONTRACT_TEXT)
+    monkeypatch.setattr(gemini_analyzer._analysis_prompt_cache, "enabled", False)
+    monkeypatch.setattr(legal_citations, "RAG_CITATIONS_ENABLED", False)
+    return models
+
+
+def run_pdf(pipeline=None):
+    pipeline = pipeline or analysis_pipeline.get_analysis_pipeline()
+    context = analysis_pipeline.AnalysisContext([(b"%PDF-1.4", "application/pdf")], use_cache=False)
+    return pipeline.run(context), context
+
+
+def test_default_stage_order():
+    assert [stage.name for stage in analysis_pipeline.DEFAULT_STAGES] == [
+        "ingest", "preprocess", "extract", "rule_check", "llm", "anonymize", "post_process", "store",
+    ]
+
+
+def test_rule_check_runs_on_extracted_text_before_llm(fake_gemini):
+    result, context = run_pdf()
+
+    assert [name for name, _ in context.timings] == [stage.name for stage in analysis_pipeline.DEFAULT_STAGES]
+    # 규칙 엔진 결과가 후보로 모델 요청에 이미 들어 있어야 함 (모델 호출 전에 검사)
+    assert context.rule_hits
+    assert "1. [" in fake_gemini.prompts[0] and "지각 시 벌금 10만원을 공제한다." in fake_gemini.prompts[0].split("계약서 텍스트:")[0]
+    assert any(clause.original_text == "제1조 지각 시 벌금 10만원을 공제한다." for clause in result.risk_clauses)
+
+
+def test_rule_candidates_rejected_by_model_are_dropped(fake_gemini):
+    fake_gemini.confirmed = []
+
+    result, context = run_pdf()
+
+    assert context.rule_hits
+    assert result.risk_clauses == []
+
+
+def test_llm_failure_falls_back_to_rule_based_result(fake_gemini):
+    fake_gemini.fail = True
+
+    result, context = run_pdf()
+
+    assert context.degraded
+    assert result.extracted_text == CONTRACT_TEXT
+    assert [clause.original_text for clause in result.risk_clauses] == ["제1조 지각 시 벌금 10만원을 공제한다."]
+
+
+def test_stage_hooks_and_replacement(fake_gemini):
+    seen = []
+    pipeline = analysis_pipeline.AnalysisPipeline(analysis_pipeline.DEFAULT_STAGES, hooks=[lambda name, seconds, context: seen.append(name)])
+    pipeline = pipeline.without("store").insert_after("extract", analysis_pipeline.Stage("marker", lambda context: None))
+
+    run_pdf(pipeline)
+
+    assert seen == ["ingest", "preprocess", "extract", "marker", "rule_check", "llm", "anonymize", "post_process"]
@@ -0,0 +1,49 @@
+from gemini_analyzer import AnalysisItem, find_highlight_spans, highlight_text_with_risks
+
+TEXT = "제5조 지각 시 벌금 10만원을 공제하고 퇴직금은 지급하지 않는다."
+
+
+def item(original_text, category="위약금 예정", start=None, end=None):
+    return AnalysisItem(category=category, original_text=original_text, explanation="", script="", start=start, end=end)
+
+
+def test_find_highlight_spans_keeps_nested_patterns():
+    spans = find_highlight_spans(TEXT, ["지각 시 벌금 10만원을 공제", "벌금 10만원"])
+
+    assert [(TEXT[start:end], pattern) for start, end, pattern in spans] == [
+        ("지각 시 벌금 10만원을 공제", "지각 시 벌금 10만원을 공제"),
+        ("벌금 10만원", "벌금 10만원"),
+    ]
+
+
+def test_nested_clause_keeps_its_own_highlight():
+    clauses = [item("지각 시 벌금 10만원을 공제하고 퇴직금은 지급하지 않는다", "퇴직금 미지급"), item("벌금 10만원")]
+    highlighted, modals = highlight_text_with_risks(TEXT, clauses)
+
+    assert {modal["category"] for modal in modals} == {"퇴직금 미지급", "위약금 예정"}
+    assert highlighted.count('for="modal-toggle-1"') == 2  # 바깥 조항은 안쪽 조항 앞뒤로 이어짐
+    assert highlighted.count('for="modal-toggle-2"') == 1
+    assert "box-shadow" in highlighted
+
+
+def test_fully_covered_clause_gets_a_badge():
+    clauses = [item("벌금 10만원", "위약금 예정"), item("벌금 10만원", "임금 공제")]
+    highlighted, modals = highlight_text_with_risks(TEXT, clauses)
+
+    assert len(modals) == 2
+    assert highlighted.count("risk-nested-badge") == 1
+    assert 'for="modal-toggle-1"' in highlighted and 'for="modal-toggle-2"' in highlighted
+
+
+def test_text_outside_highlights_is_escaped_once():
+    highlighted, _ = highlight_text_with_risks("<b>" + TEXT, [item("벌금 10만원")])
+
+    assert highlighted.startswith("&lt;b&gt;제5조")
+    assert highlighted.endswith("지급하지 않는다.")
+
+
+def test_find_highlight_spans_keeps_pattern_crossing_a_longer_match():
+    spans = find_highlight_spans(TEXT, ["벌금 10만원을 공제하고 퇴직금", "퇴직금은 지급하지", "없는 문구"])
+
+    assert [pattern for _, _, pattern in spans] == ["벌금 10만원을 공제하고 퇴직금", "퇴직금은 지급하지"]
+    assert all(TEXT[start:end] == pattern for start, end, pattern in spans)
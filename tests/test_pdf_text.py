@@ -0,0 +1,35 @@
+import pytest
+
+pymupdf = pytest.importorskip("pymupdf")
+
+from pdf_text import image_coverage, page_text_layer
+
+BODY = "Article {} The employee shall work forty hours per week at the head office."
+
+
+def scanned_image_bytes():
+    pixmap = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 60, 80), False)
+    pixmap.set_rect(pixmap.irect, (240, 240, 240))
+    return pixmap.tobytes("png")
+
+
+def test_digital_page_uses_text_layer():
+    with pymupdf.open() as document:
+        page = document.new_page()
+        for line in range(10):
+            page.insert_text((72, 72 + 14 * line), BODY.format(line + 1))
+        # 작은 로고 이미지는 디지털 판정에 영향 없음
+        page.insert_image(pymupdf.Rect(500, 20, 560, 60), stream=scanned_image_bytes())
+
+        assert image_coverage(page) < 0.05
+        assert "Article 1 The employee" in page_text_layer(page)
+
+
+def test_scanned_page_with_stamp_text_goes_to_vision():
+    with pymupdf.open() as document:
+        page = document.new_page()
+        page.insert_image(page.rect, stream=scanned_image_bytes())
+        page.insert_text((72, 820), "Document ID 3F2A-91C7-55D0 signed electronically by both parties")
+
+        assert image_coverage(page) > 0.9
+        assert page_text_layer(page) is None
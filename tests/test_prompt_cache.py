@@ -0,0 +1,103 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import prompt_cache
+from prompt_cache import PromptPrefixCache
+
+
+class FakeCaches:
+    def __init__(self):
+        self.created = []
+        self.updated = []
+        self.deleted = []
+        self.fail_update = False
+        self.create_gate = None
+
+    def create(self, model, config):
+        if self.create_gate is not None:
+            self.create_gate.wait(5)
+        self.created.append(config.ttl)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    def update(self, name, config):
+        if self.fail_update:
+            raise ValueError("not found")
+        self.updated.append(name)
+
+    def delete(self, name):
+        self.deleted.append(name)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prompt_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_cache():
+    return PromptPrefixCache("model", "system prompt", ttl_seconds=600, refresh_margin=60, retry_seconds=30, enabled=True)
+
+
+def test_reuses_cache_until_refresh_margin(clock):
+    cache, client = make_cache(), SimpleNamespace(caches=FakeCaches())
+
+    assert cache.get(client) == "cachedContents/1"
+    clock[0] += 500
+    assert cache.get(client) == "cachedContents/1"
+    assert client.caches.created == ["600s"] and client.caches.updated == []
+
+    # 만료 60초 전부터는 같은 캐시의 TTL을 연장
+    clock[0] += 60
+    assert cache.get(client) == "cachedContents/1"
+    assert client.caches.updated == ["cachedContents/1"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["refreshes"] == 1
+
+
+def test_recreates_after_expiry(clock):
+    cache, client = make_cache(), SimpleNamespace(caches=FakeCaches())
+
+    cache.get(client)
+    clock[0] += 601
+    assert cache.get(client) == "cachedContents/2"
+    assert client.caches.updated == [] and client.caches.deleted == []
+
+
+def test_failed_refresh_recreates_and_deletes_old_cache(clock):
+    cache, client = make_cache(), SimpleNamespace(caches=FakeCaches())
+
+    cache.get(client)
+    clock[0] += 570
+    client.caches.fail_update = True
+    assert cache.get(client) == "cachedContents/2"
+    assert client.caches.deleted == ["cachedContents/1"]
+
+
+def test_new_client_deletes_cache_of_previous_client(clock):
+    cache = make_cache()
+    old, new = SimpleNamespace(caches=FakeCaches()), SimpleNamespace(caches=FakeCaches())
+
+    cache.get(old)
+    assert cache.get(new) == "cachedContents/1"
+    assert old.caches.deleted == ["cachedContents/1"] and new.caches.created == ["600s"]
+
+
+def test_concurrent_requests_create_once_without_waiting(clock):
+    cache, client = make_cache(), SimpleNamespace(caches=FakeCaches())
+    client.caches.create_gate = threading.Event()
+    results = []
+
+    leader = threading.Thread(target=lambda: results.append(cache.get(client)))
+    leader.start()
+    while not cache._renewing:
+        pass
+    # 생성 중에는 기다리지 않고 프롬프트를 그대로 보냄
+    assert cache.get(client) is None
+    client.caches.create_gate.set()
+    leader.join()
+
+    assert results == ["cachedContents/1"]
+    assert cache.get(client) == "cachedContents/1"
+    assert len(client.caches.created) == 1
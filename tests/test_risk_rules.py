@@ -0,0 +1,80 @@
+import pytest
+
+from gemini_analyzer import MINIMUM_WAGE, MINIMUM_WAGE_YEAR
+from risk_rules import build_rule_based_result, check_mandatory_rules, confirmed_rule_hits
+
+
+def details(text):
+    # explanation 앞부분의 규칙별 판정 문장 ("...문구예요.")
+    return [hit.explanation.split("예요.")[0] for hit in check_mandatory_rules(text)]
+
+
+@pytest.mark.parametrize("sentence, detail", [
+    ("지각 시 벌금 10만원을 공제한다.", "위약금/벌금"),
+    ("1년 이내 퇴사 시 위약금 100만원을 지급한다.", "위약금/벌금"),
+    ("중도 퇴사 시 손해배상으로 월급의 50%를 배상한다.", "손해배상액"),
+    ("퇴직금은 월급에 포함하여 지급한다.", "월급에 포함"),
+    ("월 급여에는 퇴직금이 포함되어 있다.", "월급에 포함"),
+    ("퇴직금은 지급하지 않는다.", "퇴직금을 주지 않는"),
+    ("휴게시간은 별도 협의한다.", "휴게시간"),
+    ("휴게시간은 손님이 없을 때 틈틈이 사용한다.", "휴게시간"),
+    ("수정은 만족할 때까지 무상으로 계속 진행한다.", "수정 횟수"),
+    ("연장근로 시에도 통상임금만 지급하며 추가 수당은 없다.", "가산"),
+])
+def test_violations_are_detected(sentence, detail):
+    assert any(detail in found for found in details(sentence)), details(sentence)
+
+
+@pytest.mark.parametrize("sentence", [
+    "회사는 근로자에게 위약금이나 벌금을 부과하지 않는다.",
+    "위약금 약정은 무효로 한다.",
+    "퇴직금 산정 시 평균임금에는 정기 상여금을 포함한다.",
+    "1년 미만 근무 시 퇴직금은 지급하지 않는다.",
+    "퇴직금은 근로자퇴직급여 보장법에 따라 지급한다.",
+    "휴게시간 중 업무 지시는 없음.",
+    "휴게시간은 근로자가 자유롭게 이용한다.",
+    "수정은 2회까지 무상으로 하며 이후 제한 없이 유상으로 진행한다.",
+    "총 매출 1조원 달성 시 성과급을 지급한다.",
+])
+def test_compliant_sentences_are_not_flagged(sentence):
+    assert details(sentence) == []
+
+
+def test_penalty_negation_only_applies_to_its_own_clause():
+    assert details("지각 시 벌금 10만원을 공제하며, 이의 제기는 불가하다.")
+
+
+def test_weekly_hours_come_from_working_hours_clause():
+    text = (
+        "제1조(목적) 회사는 주 52시간 근무제를 준수한다.\n"
+        "제2조(근로시간) 근로시간은 1일 8시간, 주 40시간으로 한다. 연장근로는 주 12시간을 넘지 않는다.\n"
+        "제3조(임금) 월급 200만원을 지급한다.\n"
+    )
+    # 주 40시간 + 주휴 8시간 기준 월 209시간 → 시급 약 9,569원
+    hits = [hit for hit in check_mandatory_rules(text) if "최저임금" in hit.category]
+    assert len(hits) == 1
+    assert "209시간" in hits[0].explanation
+
+
+def test_monthly_wage_without_working_hours_clause_is_not_checked():
+    assert details("제1조(목적) 회사는 주 52시간 근무제를 준수한다.\n제2조(임금) 월급 200만원을 지급한다.") == []
+
+
+def test_minimum_wage_defaults_to_prompt_year():
+    hourly = MINIMUM_WAGE - 10
+    hits = check_mandatory_rules(f"시급 {hourly:,}원으로 한다.")
+    assert hits and f"{MINIMUM_WAGE_YEAR}년 최저시급 {MINIMUM_WAGE:,}원" in hits[0].explanation
+
+    assert check_mandatory_rules("2024년 근로계약서\n시급 9,900원으로 한다.") == []
+
+
+def test_confirmed_rule_hits_ignores_invalid_numbers():
+    hits = check_mandatory_rules("지각 시 벌금 10만원을 공제한다.\n휴게시간은 별도 협의한다.")
+
+    assert confirmed_rule_hits(hits, [2, 2, 0, 5, True, "1"]) == [hits[1]]
+
+
+def test_rule_based_result_reports_candidates():
+    result = build_rule_based_result("지각 시 벌금 10만원을 공제한다.")
+
+    assert len(result.risk_clauses) == 1 and "의심" in result.summary
@@ -0,0 +1,35 @@
+import random
+
+from text_alignment import _semi_global_distance, align_clause
+
+
+def test_band_matches_full_matrix_inside_band():
+    rng = random.Random(7)
+    for _ in range(200):
+        window = "".join(rng.choice("가나다라*") for _ in range(rng.randint(5, 30)))
+        pattern = "".join(rng.choice("가나다라") for _ in range(rng.randint(1, 12)))
+        full = _semi_global_distance(pattern, window)
+        banded = _semi_global_distance(pattern, window, 0, len(window) + len(pattern))
+        assert banded == full
+
+
+def test_band_rejects_alignment_outside_diagonal():
+    # 밴드 밖(열 10 이후)에 있는 일치는 보지 않습니다
+    window = "가" * 10 + "나다라마바"
+    assert _semi_global_distance("나다라마바", window)[0] == 0
+    distance, _, _ = _semi_global_distance("나다라마바", window, 0, 2)
+    assert distance >= 2
+
+
+def test_align_clause_with_typos():
+    rng = random.Random(1)
+    syllables = [chr(code) for code in range(0xAC00, 0xAC00 + 300)]
+    text = "".join(rng.choice(syllables) for _ in range(5000))
+    start = 3000
+    clause = list(text[start:start + 200])
+    for position in (20, 80, 150):
+        clause[position] = "가"
+    del clause[100:102]
+    span = align_clause(text, "".join(clause))
+    assert span is not None
+    assert abs(span[0] - start) <= 1 and abs(span[1] - (start + 200)) <= 1
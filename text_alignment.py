@@ -0,0 +1,211 @@
+# 위험 조항 문구(original_text)를 추출 텍스트(extracted_text)의 문자 위치에 근사 정렬
+
+from __future__ import annotations
+
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Optional
+
+# 허용 편집 거리 비율 (정규화된 조항 길이 대비)
+MAX_ERROR_RATE = 0.2
+NGRAM_SIZE = 3
+MAX_CANDIDATES = 3
+
+
+def _normalize_char(ch: str) -> str:
+    """공백/문장부호는 버리고(빈 문자열), 나머지는 NFKC + 소문자로 통일합니다. '*'(마스킹)는 유지."""
+    if ch == "*":
+        return ch
+    ch = unicodedata.normalize("NFKC", ch)
+    if not ch or ch.isspace():
+        return ""
+    category = unicodedata.category(ch[0])
+    if category[0] in ("P", "Z", "C") or category in ("Sm", "Sk", "So"):
+        return ""
+    return ch.lower()
+
+
+def normalize_with_offsets(text: str) -> tuple[str, list[int]]:
+    """
+    정규화된 문자열과, 정규화 문자 i가 원문의 몇 번째 문자에서 왔는지를 담은 offsets를 반환합니다.
+    """
+    chars = []
+    offsets = []
+    for i, ch in enumerate(text):
+        normalized = _normalize_char(ch)
+        for n in normalized:
+            chars.append(n)
+            offsets.append(i)
+    return "".join(chars), offsets
+
+
+class AlignmentIndex:
+    """한 문서에 대해 한 번만 만드는 정규화 텍스트 + n-gram 위치 인덱스."""
+
+    def __init__(self, text: str, ngram_size: int = NGRAM_SIZE):
+        self.text = text
+        self.ngram_size = ngram_size
+        self.normalized, self.offsets = normalize_with_offsets(text)
+        self._ngrams: Optional[dict[str, list[int]]] = None
+
+    @property
+    def ngrams(self) -> dict[str, list[int]]:
+        if self._ngrams is None:
+            index = defaultdict(list)
+            k = self.ngram_size
+            normalized = self.normalized
+            for i in range(len(normalized) - k + 1):
+                index[normalized[i:i + k]].append(i)
+            self._ngrams = index
+        return self._ngrams
+
+    def to_original(self, start: int, end: int) -> tuple[int, int]:
+        """정규화 구간 [start, end)를 원문 구간으로 변환합니다."""
+        return self.offsets[start], self.offsets[end - 1] + 1
+
+
+def _semi_global_distance(
+    pattern: str, window: str, diagonal: int = 0, band: Optional[int] = None
+) -> tuple[int, int, int]:
+    """
+    pattern 전체를 window의 임의 부분 문자열에 맞추는 편집 거리(semi-global).
+    pattern의 i번째 문자는 window의 diagonal + i ± band 열 안에서만 계산합니다(밴드 DP).
+    band가 None이면 전체 행렬을 채웁니다. 밴드 안에서 맞출 수 없으면 거리는 len(pattern) + len(window)보다 큽니다.
+
+    Returns:
+        (거리, window 내 시작 위치, window 내 끝 위치)
+    """
+    n = len(window)
+    if band is None:
+        diagonal, band = 0, n + len(pattern)
+    unreachable = len(pattern) + n + 1
+    previous = [unreachable] * (n + 1)
+    previous_start = list(range(n + 1))
+    for j in range(max(0, diagonal - band), min(n, diagonal + band) + 1):
+        previous[j] = 0
+
+    for i, pattern_char in enumerate(pattern, 1):
+        low = max(0, diagonal + i - band)
+        high = min(n, diagonal + i + band)
+        current = [unreachable] * (n + 1)
+        current_start = [0] * (n + 1)
+        if low == 0:
+            current[0] = i
+            low = 1
+        for j in range(low, high + 1):
+            window_char = window[j - 1]
+            # '*'는 비식별화로 가려진 문자이므로 어떤 문자와도 일치로 봅니다
+            mismatch = pattern_char != window_char and window_char != "*" and pattern_char != "*"
+            best = previous[j - 1] + mismatch
+            start = previous_start[j - 1]
+            skip_pattern = previous[j] + 1
+            if skip_pattern < best:
+                best = skip_pattern
+                start = previous_start[j]
+            skip_window = current[j - 1] + 1
+            if skip_window < best:
+                best = skip_window
+                start = current_start[j - 1]
+            current[j] = best
+            current_start[j] = start
+        previous, previous_start = current, current_start
+
+    end = min(range(n + 1), key=lambda j: (previous[j], -j))
+    return previous[end], previous_start[end], end
+
+
+def _candidate_starts(index: AlignmentIndex, pattern: str) -> list[int]:
+    """조항의 n-gram이 문서에서 나타나는 위치로 정렬 대각선(시작 위치)을 투표합니다."""
+    k = index.ngram_size
+    votes = Counter()
+    ngrams = index.ngrams
+    for offset in range(len(pattern) - k + 1):
+        for position in ngrams.get(pattern[offset:offset + k], ()):
+            votes[position - offset] += 1
+
+    # 인접한 대각선은 같은 후보로 취급 (삽입/삭제로 조금씩 밀린 경우)
+    candidates = []
+    for start, _ in votes.most_common():
+        if all(abs(start - other) > k for other in candidates):
+            candidates.append(start)
+        if len(candidates) >= MAX_CANDIDATES:
+            break
+    return candidates
+
+
+def align_clause(
+    text: str,
+    clause: str,
+    index: Optional[AlignmentIndex] = None,
+    max_error_rate: float = MAX_ERROR_RATE,
+) -> Optional[tuple[int, int]]:
+    """
+    clause가 text의 어디에 해당하는지 원문 문자 구간 (start, end)을 반환합니다.
+
+    1. 정확히 일치하는 부분 문자열
+    2. 공백/문장부호를 무시한 정규화 텍스트에서 정확히 일치
+    3. n-gram 시드로 후보 위치를 고른 뒤 밴드 편집 거리로 근사 정렬
+
+    max_error_rate 이내로 맞출 수 없으면 None.
+    """
+    if not text or not clause:
+        return None
+
+    position = text.find(clause)
+    if position >= 0:
+        return position, position + len(clause)
+
+    if index is None:
+        index = AlignmentIndex(text)
+
+    pattern, _ = normalize_with_offsets(clause)
+    if not pattern or not index.normalized:
+        return None
+
+    position = index.normalized.find(pattern)
+    if position >= 0:
+        return _extend_to_clause_edges(text, clause, *index.to_original(position, position + len(pattern)))
+
+    max_distance = int(len(pattern) * max_error_rate)
+    if max_distance == 0 or len(pattern) < index.ngram_size:
+        return None
+
+    best = None
+    for diagonal in _candidate_starts(index, pattern):
+        window_start = max(0, diagonal - max_distance)
+        window_end = min(len(index.normalized), diagonal + len(pattern) + max_distance)
+        window = index.normalized[window_start:window_end]
+        distance, start, end = _semi_global_distance(pattern, window, diagonal - window_start, max_distance)
+        if end > start and distance <= max_distance and (best is None or distance < best[0]):
+            best = (distance, window_start + start, window_start + end)
+            if distance == 0:
+                break
+
+    if best is None:
+        return None
+    return _extend_to_clause_edges(text, clause, *index.to_original(best[1], best[2]))
+
+
+def _extend_to_clause_edges(text: str, clause: str, start: int, end: int) -> tuple[int, int]:
+    """정규화에서 버려진 앞뒤 문장부호(괄호, 마침표 등)가 조항에도 있으면 구간에 포함시킵니다."""
+    stripped = clause.strip()
+    if stripped and start > 0 and text[start - 1] == stripped[0] and not text[start - 1].isspace():
+        start -= 1
+    if stripped and end < len(text) and text[end] == stripped[-1] and not text[end].isspace():
+        end += 1
+    return start, end
+
+
+def align_clauses(text: str, clauses: list[str]) -> list[Optional[tuple[int, int]]]:
+    """여러 조항을 같은 인덱스로 정렬합니다 (인덱스는 필요할 때 문서당 한 번만 생성)."""
+    index = None
+    spans = []
+    for clause in clauses:
+        position = text.find(clause) if text and clause else -1
+        if position >= 0:
+            spans.append((position, position + len(clause)))
+            continue
+        if index is None and text:
+            index = AlignmentIndex(text)
+        spans.append(align_clause(text, clause, index=index))
+    return spans
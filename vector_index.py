@@ -0,0 +1,340 @@
+# 법령 코퍼스 벡터 DB 증분 색인 (파일/청크 해시 매니페스트, 프로세스 풀 PDF 파싱, 배치 병렬 임베딩)
+
+from __future__ import annotations
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Optional
+
+from cache_store import SQLiteLRUCache
+from resilience import TokenBucket, call_with_resilience, call_with_timeout
+
+# 청크 분할 설정 (바꾸면 모든 문서를 다시 분할/임베딩합니다)
+CHUNKER = "legal"
+CHUNKER_VERSION = 1
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+INDEX_MANIFEST_NAME = "index_manifest.json"
+INDEX_MANIFEST_VERSION = 1
+INDEX_PARSE_WORKERS = int(os.environ.get("INDEX_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Chroma에 한 번에 추가/삭제하는 청크 수
+INDEX_WRITE_BATCH_SIZE = 256
+
+# 문서 임베딩: 배치 크기(Gemini batchEmbedContents 요청당 최대 100개), 동시 배치 수, 분당 임베딩 텍스트 수 제한
+EMBED_BATCH_SIZE = 100
+EMBED_MAX_CONCURRENCY = int(os.environ.get("EMBED_MAX_CONCURRENCY", "4"))
+EMBED_RATE_LIMIT_PER_MINUTE = int(os.environ.get("EMBED_RATE_LIMIT_PER_MINUTE", "1500"))
+# 끝난 배치의 벡터를 저장해 두는 체크포인트 (중단 후 다시 실행하거나 --full로 다시 구축해도 재사용)
+EMBEDDING_CHECKPOINT_PATH = os.environ.get("EMBEDDING_CHECKPOINT_PATH", "./.cache/index_embeddings.sqlite3")
+EMBEDDING_CHECKPOINT_MAX_ENTRIES = 200000
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunking_signature() -> dict:
+    return {"chunker": CHUNKER, "version": CHUNKER_VERSION, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+
+
+def load_and_split(pdf_path: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> list[tuple[str, dict]]:
+    """
+    PDF 하나를 읽어 조/항/호 구조에 맞춘 (청크 텍스트, 메타데이터) 리스트로 나눕니다 (legal_chunker).
+    프로세스 풀에서 실행되므로 모듈 최상위 함수이고, 피클하기 쉬운 튜플을 반환합니다.
+    """
+    import pymupdf
+    from legal_chunker import chunk_pages
+
+    with pymupdf.open(pdf_path) as document:
+        pages = [page.get_text() for page in document]
+    chunks = chunk_pages(pages, pdf_path, max_chars=chunk_size, overlap=chunk_overlap)
+    return [(chunk.text, chunk.metadata) for chunk in chunks]
+
+
+def chunk_ids(file_name: str, chunks: list[tuple[str, dict]]) -> list[str]:
+    """
+    청크 내용(페이지 + 텍스트) 해시로 결정적인 ID를 만듭니다.
+    문서가 바뀌어도 내용이 같은 청크는 같은 ID가 되어 다시 임베딩하지 않습니다.
+    """
+    ids = []
+    seen: dict[str, int] = {}
+    for text, metadata in chunks:
+        digest = hashlib.sha256(f"{metadata.get('page', '')}\n{text}".encode("utf-8")).hexdigest()[:24]
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(f"{file_name}:{digest}:{occurrence}")
+    return ids
+
+
+def load_manifest(persist_directory: str) -> Optional[dict]:
+    """색인 매니페스트 (없거나 읽을 수 없으면 None)."""
+    path = os.path.join(persist_directory, INDEX_MANIFEST_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Index manifest unreadable, rebuilding: {e}")
+        return None
+    if manifest.get("version") != INDEX_MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(persist_directory: str, manifest: dict) -> None:
+    """매니페스트를 임시 파일에 쓴 뒤 교체합니다 (중간에 중단되어도 이전 상태 유지)."""
+    path = os.path.join(persist_directory, INDEX_MANIFEST_NAME)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, path)
+
+
+def _parse_documents(paths: list[str], max_workers: int) -> dict[str, list[tuple[str, dict]]]:
+    """PDF들을 프로세스 풀에서 병렬로 분할합니다 (풀을 만들 수 없으면 순서대로). 실패한 파일은 결과에서 빠집니다."""
+    results: dict[str, list[tuple[str, dict]]] = {}
+    if not paths:
+        return results
+
+    executor = None
+    if max_workers > 1 and len(paths) > 1:
+        try:
+            executor = ProcessPoolExecutor(max_workers=min(max_workers, len(paths)))
+        except Exception as e:
+            logging.warning(f"Index parse pool unavailable, parsing inline: {e}")
+
+    try:
+        if executor is not None:
+            futures = {path: executor.submit(load_and_split, path, CHUNK_SIZE, CHUNK_OVERLAP) for path in paths}
+            for path, future in futures.items():
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    print(f"      ✗ Error loading {os.path.basename(path)}: {e}")
+        else:
+            for path in paths:
+                try:
+                    results[path] = load_and_split(path, CHUNK_SIZE, CHUNK_OVERLAP)
+                except Exception as e:
+                    print(f"      ✗ Error loading {os.path.basename(path)}: {e}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return results
+
+
+def _batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def open_embedding_checkpoint() -> Optional[SQLiteLRUCache]:
+    """임베딩 체크포인트 저장소 (열 수 없으면 None, 체크포인트 없이 진행)."""
+    try:
+        return SQLiteLRUCache(EMBEDDING_CHECKPOINT_PATH, max_entries=EMBEDDING_CHECKPOINT_MAX_ENTRIES, ttl_seconds=None)
+    except Exception as e:
+        logging.warning(f"Embedding checkpoint unavailable: {e}")
+        return None
+
+
+def _with_request_timeout(embeddings, seconds: float):
+    """request_options를 지원하는 임베딩 클라이언트(GoogleGenerativeAIEmbeddings)면 HTTP 타임아웃을 넣은 사본을 반환합니다."""
+    if not hasattr(embeddings, "request_options") or not hasattr(embeddings, "model_copy"):
+        return embeddings
+    options = dict(embeddings.request_options or {})
+    options["timeout"] = max(1.0, seconds)
+    return embeddings.model_copy(update={"request_options": options})
+
+
+def embed_texts(
+    embeddings,
+    texts: list[str],
+    model_name: str = "",
+    checkpoint: Optional[SQLiteLRUCache] = None,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_concurrency: int = EMBED_MAX_CONCURRENCY,
+    rate_limit_per_minute: int = EMBED_RATE_LIMIT_PER_MINUTE,
+) -> list[list[float]]:
+    """
+    문서 텍스트를 배치로 나눠 최대 max_concurrency개 배치를 동시에 임베딩합니다.
+
+    - 분당 rate_limit_per_minute개 텍스트를 넘지 않도록 토큰 버킷으로 배치 시작을 늦춤
+    - 일시적 오류(429/5xx 등)는 resilience 계층에서 백오프 후 재시도
+    - 끝난 배치의 벡터는 바로 checkpoint에 기록하고, 이미 기록된 텍스트는 호출하지 않음
+      (할당량 오류로 중단되어도 다음 실행에서 남은 배치부터 이어서 진행)
+
+    Returns:
+        texts와 같은 순서의 벡터 리스트
+    """
+    def checkpoint_key(text: str) -> str:
+        return hashlib.sha256(f"{model_name}\n{text}".encode("utf-8")).hexdigest()
+
+    vectors: list[Optional[list[float]]] = [None] * len(texts)
+    missing = []
+    for index, text in enumerate(texts):
+        raw = None
+        if checkpoint is not None:
+            try:
+                raw = checkpoint.get(checkpoint_key(text))
+            except Exception as e:
+                logging.warning(f"Embedding checkpoint read failed: {e}")
+        if raw is not None:
+            vectors[index] = json.loads(raw)
+        else:
+            missing.append(index)
+
+    if not missing:
+        return vectors
+
+    batches = list(_batches(missing, batch_size))
+    print(f"🧮 Embedding {len(missing)} chunks in {len(batches)} batches ({len(texts) - len(missing)} from checkpoint)")
+    bucket = TokenBucket(rate_limit_per_minute / 60.0, capacity=batch_size)
+
+    def run(batch: list[int]) -> tuple[list[int], list[list[float]]]:
+        bucket.acquire(len(batch))
+        batch_texts = [texts[index] for index in batch]
+        result = call_with_resilience(
+            lambda timeout: call_with_timeout(lambda: _with_request_timeout(embeddings, timeout).embed_documents(batch_texts), timeout),
+            name="embedding",
+        )
+        if len(result) != len(batch):
+            raise ValueError(f"Embedding count mismatch: expected {len(batch)}, got {len(result)}")
+        if checkpoint is not None:
+            for text, vector in zip(batch_texts, result):
+                try:
+                    checkpoint.set(checkpoint_key(text), json.dumps(list(vector)))
+                except Exception as e:
+                    logging.warning(f"Embedding checkpoint write failed: {e}")
+        return batch, result
+
+    done = 0
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches))), thread_name_prefix="embed")
+    try:
+        futures = [executor.submit(run, batch) for batch in batches]
+        for future in as_completed(futures):
+            batch, result = future.result()
+            for index, vector in zip(batch, result):
+                vectors[index] = list(vector)
+            done += len(batch)
+            print(f"   🧮 {done}/{len(missing)} chunks embedded")
+    except BaseException:
+        # 남은 배치는 취소 (이미 끝난 배치는 체크포인트에 남아 있음)
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    executor.shutdown()
+    return vectors
+
+
+def update_vector_db(
+    vectorstore_factory,
+    embeddings,
+    data_folder: str = "./data",
+    persist_directory: str = "./chroma_db",
+    full_rebuild: bool = False,
+    max_workers: int = INDEX_PARSE_WORKERS,
+):
+    """
+    data_folder의 PDF를 벡터 DB에 증분 반영합니다.
+
+    - 파일 해시가 매니페스트와 같은 문서는 읽지도 않음
+    - 새 문서/바뀐 문서만 (프로세스 풀에서) 다시 분할하고, 그중 내용이 바뀐 청크만 임베딩 (embed_texts)
+    - 사라진 문서와 바뀐 문서의 옛 청크는 벡터 DB에서 삭제
+    - 매니페스트가 없거나(이전 방식으로 만든 DB) 분할 설정이 바뀌었으면 처음부터 다시 구축
+
+    Args:
+        vectorstore_factory: persist_directory를 받아 Chroma를 여는 함수
+        embeddings: embed_documents()를 제공하는 문서 임베딩 클라이언트
+        full_rebuild: True이면 기존 DB를 지우고 처음부터 구축
+
+    Returns:
+        (vectorstore, 통계 dict)
+    """
+    manifest = None if full_rebuild else load_manifest(persist_directory)
+    if manifest is not None and manifest.get("chunking") != chunking_signature():
+        print("🔁 Chunking settings changed, rebuilding every document")
+        manifest = None
+
+    if manifest is None:
+        if os.path.exists(persist_directory):
+            shutil.rmtree(persist_directory)
+        manifest = {"version": INDEX_MANIFEST_VERSION, "chunking": chunking_signature(), "files": {}}
+    os.makedirs(persist_directory, exist_ok=True)
+
+    pdf_files = sorted(f for f in os.listdir(data_folder) if f.endswith(".pdf"))
+    indexed = manifest["files"]
+    stats = {"files": len(pdf_files), "unchanged": 0, "updated": 0, "removed": 0, "chunks_added": 0, "chunks_deleted": 0}
+
+    changed: dict[str, str] = {}
+    for pdf_file in pdf_files:
+        file_hash = file_sha256(os.path.join(data_folder, pdf_file))
+        if indexed.get(pdf_file, {}).get("sha256") == file_hash:
+            stats["unchanged"] += 1
+        else:
+            changed[pdf_file] = file_hash
+    removed = [pdf_file for pdf_file in indexed if pdf_file not in pdf_files]
+
+    print(f"📂 {len(pdf_files)} PDF files: {stats['unchanged']} unchanged, {len(changed)} new/changed, {len(removed)} removed")
+
+    vectorstore = vectorstore_factory(persist_directory)
+    if not changed and not removed:
+        return vectorstore, stats
+
+    for pdf_file in removed:
+        stale_ids = indexed.pop(pdf_file).get("chunks", [])
+        for batch in _batches(stale_ids, INDEX_WRITE_BATCH_SIZE):
+            vectorstore.delete(ids=batch)
+        stats["removed"] += 1
+        stats["chunks_deleted"] += len(stale_ids)
+        save_manifest(persist_directory, manifest)
+        print(f"   🗑️  {pdf_file}: {len(stale_ids)} chunks deleted")
+
+    print(f"🔪 Splitting {len(changed)} documents ({max_workers} workers)...")
+    paths = [os.path.join(data_folder, pdf_file) for pdf_file in changed]
+    parsed = _parse_documents(paths, max_workers)
+
+    plans = []
+    for pdf_file, file_hash in changed.items():
+        chunks = parsed.get(os.path.join(data_folder, pdf_file))
+        if chunks is None:
+            continue
+
+        ids = chunk_ids(pdf_file, chunks)
+        old_ids = set(indexed.get(pdf_file, {}).get("chunks", []))
+        stale_ids = sorted(old_ids - set(ids))
+        to_add = [(chunk_id, text, metadata) for chunk_id, (text, metadata) in zip(ids, chunks) if chunk_id not in old_ids]
+        plans.append((pdf_file, file_hash, ids, stale_ids, to_add))
+
+    # 모든 문서의 새 청크를 한 번에 배치 임베딩 (문서 경계와 무관하게 배치를 꽉 채움)
+    texts = [text for *_, to_add in plans for _, text, _ in to_add]
+    vectors = iter(embed_texts(embeddings, texts, model_name=getattr(embeddings, "model", ""), checkpoint=open_embedding_checkpoint()))
+
+    for pdf_file, file_hash, ids, stale_ids, to_add in plans:
+        for batch in _batches(stale_ids, INDEX_WRITE_BATCH_SIZE):
+            vectorstore.delete(ids=batch)
+        for batch in _batches(to_add, INDEX_WRITE_BATCH_SIZE):
+            vectorstore._collection.add(
+                ids=[chunk_id for chunk_id, _, _ in batch],
+                embeddings=[next(vectors) for _ in batch],
+                documents=[text for _, text, _ in batch],
+                metadatas=[metadata for _, _, metadata in batch],
+            )
+
+        # 문서 하나가 끝날 때마다 기록해 두어 중간에 중단되어도 다음 실행에서 이어서 진행
+        indexed[pdf_file] = {"sha256": file_hash, "chunks": ids}
+        save_manifest(persist_directory, manifest)
+
+        stats["updated"] += 1
+        stats["chunks_added"] += len(to_add)
+        stats["chunks_deleted"] += len(stale_ids)
+        print(f"   📄 {pdf_file}: {len(ids)} chunks ({len(to_add)} embedded, {len(stale_ids)} deleted)")
+
+    return vectorstore, stats